@@ -0,0 +1,33 @@
+"""
+Embeds per second built by the EmbedFactory for its hot paths.
+
+Usage:
+    python -m benchmarks.embed_factory
+"""
+
+from types import SimpleNamespace
+
+from src.utils.embed import EmbedFactory
+
+from benchmarks.queue_memory import make_playlist
+from benchmarks.timing import rate
+
+
+def main() -> None:
+    factory = EmbedFactory()
+    tracks = make_playlist(100).tracks
+    for track in tracks:
+        track.extras = {'requester_name': 'Requester', 'requester_avatar': 'https://cdn.discordapp.com/avatar.png'}
+    author = SimpleNamespace(display_name='Requester', display_avatar='https://cdn.discordapp.com/avatar.png')
+
+    results = {
+        'now_playing': rate(lambda: factory.now_playing(tracks[0])),
+        'added_to_queue (100 tracks)': rate(lambda: factory.added_to_queue(tracks, author)),
+        'error': rate(lambda: factory.error('Canzone non trovata')),
+    }
+    for name, embeds_per_second in results.items():
+        print(f'{name:<28} {embeds_per_second:12,.0f} embeds/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,402 @@
+"""
+A local stand-in for a Lavalink v4 node, to load test the bot without Lavalink and YouTube.
+
+It serves the REST endpoints wavelink uses and the websocket with the ready, stats, playerUpdate
+and track events. Tracks are synthetic and play on a virtual clock: with --speed 60 a three minute
+track ends after three seconds.
+
+Queries are answered by their shape:
+    - an URL with list= loads a playlist of --playlist-size tracks;
+    - any other URL loads a single track;
+    - anything else is a search returning --search-size tracks.
+
+With --kill-after the node crashes that many seconds after the bot connected: the process exits without
+closing its sockets, so the websocket drops and the requests are refused, the way a dead node fails.
+
+Usage:
+    python -m benchmarks.fake_lavalink [--port 2333] [--password youshallnotpass] [--speed 60] [--kill-after 0]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Any, Optional
+
+from aiohttp import web
+
+from src.voice.compact_queue.track_codec import decode_track, encode_track
+
+
+def make_track(key: str, length: int = 180000) -> dict[str, Any]:
+    """
+    A deterministic track payload, the same key always gives the same track.
+    """
+    identifier = hashlib.blake2b(key.encode(), digest_size=8).hexdigest()[:11]
+    info = {
+        'identifier': identifier,
+        'isSeekable': True,
+        'author': f'Artist {identifier[:2]} - Topic',
+        'length': length,
+        'isStream': False,
+        'position': 0,
+        'title': f'Track {key}',
+        'uri': f'https://www.youtube.com/watch?v={identifier}',
+        'artworkUrl': f'https://i.ytimg.com/vi/{identifier}/maxresdefault.jpg',
+        'isrc': None,
+        'sourceName': 'youtube',
+    }
+    return {'encoded': encode_track(info), 'info': info, 'pluginInfo': {}, 'userData': {}}
+
+
+class FakePlayer:
+    def __init__(self, guild_id: str) -> None:
+        self.guild_id: str = guild_id
+        self.track: Optional[dict[str, Any]] = None
+        self.voice: dict[str, Any] = {}
+        self.volume: int = 100
+        self.paused: bool = False
+        self.filters: dict[str, Any] = {}
+        # Virtual position of the track when last started or paused, and when that happened in real time.
+        self.offset: int = 0
+        self.since: float = time.monotonic()
+        self.end_task: Optional[asyncio.Task] = None
+
+    def position(self, speed: float) -> int:
+        if self.track is None:
+            return 0
+        if self.paused:
+            return self.offset
+        return min(self.offset + int((time.monotonic() - self.since) * 1000 * speed), self.track['info']['length'])
+
+    def as_dict(self, speed: float) -> dict[str, Any]:
+        return {
+            'guildId': self.guild_id,
+            'track': self.track,
+            'volume': self.volume,
+            'paused': self.paused,
+            'state': {
+                'time': int(time.time() * 1000),
+                'position': self.position(speed),
+                'connected': bool(self.voice),
+                'ping': 1,
+            },
+            'voice': self.voice,
+            'filters': self.filters,
+        }
+
+
+class FakeLavalink:
+    """
+    The fake node. A single session is served per websocket, players live in their session.
+    """
+    def __init__(self, password: str = 'youshallnotpass', speed: float = 60, playlist_size: int = 100,
+                 search_size: int = 10, track_length: int = 180000, load_delay: float = 0.05,
+                 update_interval: float = 5, stats_interval: float = 60, kill_after: float = 0) -> None:
+        self.__password: str = password
+        self.__speed: float = speed
+        self.__playlist_size: int = playlist_size
+        self.__search_size: int = search_size
+        self.__track_length: int = track_length
+        self.__load_delay: float = load_delay
+        self.__update_interval: float = update_interval
+        self.__stats_interval: float = stats_interval
+        self.__kill_after: float = kill_after
+        self.__kill_task: Optional[asyncio.Task] = None
+        self.__started: float = time.monotonic()
+
+        self.__sessions: dict[str, dict[str, FakePlayer]] = {}
+        self.__sockets: dict[str, web.WebSocketResponse] = {}
+        # Loading the uri of a track served before gives the same track back, as on Lavalink.
+        self.__served: dict[str, dict[str, Any]] = {}
+
+        self.requests: int = 0
+        self.events: int = 0
+
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self.__authorize])
+        app.add_routes([
+            web.get('/v4/websocket', self.websocket),
+            web.get('/v4/info', self.info),
+            web.get('/v4/stats', self.stats),
+            web.get('/version', self.version),
+            web.get('/v4/loadtracks', self.load_tracks),
+            web.post('/v4/decodetracks', self.decode_tracks),
+            web.patch('/v4/sessions/{session_id}', self.update_session),
+            web.get('/v4/sessions/{session_id}/players', self.get_players),
+            web.get('/v4/sessions/{session_id}/players/{guild_id}', self.get_player),
+            web.patch('/v4/sessions/{session_id}/players/{guild_id}', self.update_player),
+            web.delete('/v4/sessions/{session_id}/players/{guild_id}', self.destroy_player),
+        ])
+        return app
+
+    @web.middleware
+    async def __authorize(self, request: web.Request, handler) -> web.StreamResponse:
+        if request.headers.get('Authorization') != self.__password:
+            return self.__error(401, 'Unauthorized', request.path)
+        self.requests += 1
+        return await handler(request)
+
+    @staticmethod
+    def __error(status: int, message: str, path: str) -> web.Response:
+        return web.json_response({
+            'timestamp': int(time.time() * 1000),
+            'status': status,
+            'error': message,
+            'message': message,
+            'path': path,
+        }, status=status)
+
+    # --- websocket --- #
+
+    async def websocket(self, request: web.Request) -> web.WebSocketResponse:
+        socket = web.WebSocketResponse(heartbeat=30)
+        await socket.prepare(request)
+
+        if self.__kill_after and self.__kill_task is None:
+            self.__kill_task = asyncio.create_task(self.__kill())
+
+        session_id = uuid.uuid4().hex[:16]
+        self.__sessions[session_id] = {}
+        self.__sockets[session_id] = socket
+        await socket.send_json({'op': 'ready', 'resumed': False, 'sessionId': session_id})
+
+        updates = asyncio.create_task(self.__send_updates(session_id))
+        try:
+            async for _ in socket:
+                pass
+        finally:
+            updates.cancel()
+            for player in self.__sessions.pop(session_id).values():
+                if player.end_task:
+                    player.end_task.cancel()
+            self.__sockets.pop(session_id, None)
+        return socket
+
+    async def __kill(self) -> None:
+        await asyncio.sleep(self.__kill_after)
+        logging.warning('Killing the fake node with %d players',
+                        sum(len(session) for session in self.__sessions.values()))
+        os._exit(1)
+
+    async def __send(self, session_id: str, payload: dict[str, Any]) -> None:
+        socket = self.__sockets.get(session_id)
+        if socket is not None and not socket.closed:
+            self.events += 1
+            await socket.send_str(json.dumps(payload))
+
+    async def __event(self, session_id: str, player: FakePlayer, event: str, **data: Any) -> None:
+        await self.__send(session_id, {'op': 'event', 'type': event, 'guildId': player.guild_id, **data})
+
+    async def __send_updates(self, session_id: str) -> None:
+        last_stats = 0.0
+        while True:
+            await asyncio.sleep(self.__update_interval)
+            for player in list(self.__sessions.get(session_id, {}).values()):
+                if player.track is not None:
+                    state = player.as_dict(self.__speed)['state']
+                    await self.__send(session_id, {'op': 'playerUpdate', 'guildId': player.guild_id, 'state': state})
+
+            if time.monotonic() - last_stats >= self.__stats_interval:
+                last_stats = time.monotonic()
+                await self.__send(session_id, {'op': 'stats', **self.__stats()})
+
+    # --- playback --- #
+
+    async def __start(self, session_id: str, player: FakePlayer, track: dict[str, Any], position: int) -> None:
+        if player.track is not None:
+            await self.__stop(session_id, player, 'replaced')
+
+        player.track = track
+        player.offset = position
+        player.since = time.monotonic()
+        await self.__event(session_id, player, 'TrackStartEvent', track=track)
+        self.__schedule_end(session_id, player)
+
+    async def __stop(self, session_id: str, player: FakePlayer, reason: str) -> None:
+        if player.end_task:
+            player.end_task.cancel()
+            player.end_task = None
+        track, player.track = player.track, None
+        if track is not None:
+            await self.__event(session_id, player, 'TrackEndEvent', track=track, reason=reason)
+
+    def __schedule_end(self, session_id: str, player: FakePlayer) -> None:
+        if player.end_task:
+            player.end_task.cancel()
+            player.end_task = None
+        if player.track is None or player.paused:
+            return
+
+        remaining = (player.track['info']['length'] - player.position(self.__speed)) / 1000 / self.__speed
+
+        async def finish() -> None:
+            await asyncio.sleep(remaining)
+            player.end_task = None
+            await self.__stop(session_id, player, 'finished')
+
+        player.end_task = asyncio.create_task(finish())
+
+    # --- REST --- #
+
+    async def info(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            'version': {'semver': '4.0.8', 'major': 4, 'minor': 0, 'patch': 8, 'preRelease': None, 'build': None},
+            'buildTime': int(self.__started * 1000),
+            'git': {'branch': 'fake', 'commit': 'fake', 'commitTime': int(self.__started * 1000)},
+            'jvm': 'none',
+            'lavaplayer': 'none',
+            'sourceManagers': ['youtube'],
+            'filters': [],
+            'plugins': [],
+        })
+
+    def __stats(self) -> dict[str, Any]:
+        players = [player for session in self.__sessions.values() for player in session.values()]
+        return {
+            'players': len(players),
+            'playingPlayers': sum(1 for player in players if player.track is not None and not player.paused),
+            'uptime': int((time.monotonic() - self.__started) * 1000),
+            'memory': {'free': 0, 'used': 0, 'allocated': 0, 'reservable': 0},
+            'cpu': {'cores': 1, 'systemLoad': 0.0, 'lavalinkLoad': 0.0},
+            'frameStats': None,
+        }
+
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.__stats())
+
+    async def version(self, request: web.Request) -> web.Response:
+        return web.Response(text='4.0.8')
+
+    async def load_tracks(self, request: web.Request) -> web.Response:
+        identifier = request.query.get('identifier', '')
+        await asyncio.sleep(self.__load_delay)
+
+        if identifier.startswith(('http://', 'https://')):
+            if 'list=' in identifier:
+                name = identifier.rsplit('list=', 1)[1]
+                return web.json_response({'loadType': 'playlist', 'data': {
+                    'info': {'name': f'Playlist {name}', 'selectedTrack': -1},
+                    'pluginInfo': {},
+                    'tracks': [self.__track(f'{name}/{index}') for index in range(self.__playlist_size)],
+                }})
+            track = self.__served.get(identifier) or self.__track(identifier)
+            return web.json_response({'loadType': 'track', 'data': track})
+
+        query = identifier.split(':', 1)[-1]
+        return web.json_response({'loadType': 'search', 'data': [
+            self.__track(f'{query}/{index}') for index in range(self.__search_size)
+        ]})
+
+    def __track(self, key: str) -> dict[str, Any]:
+        track = make_track(key, self.__track_length)
+        self.__served[track['info']['uri']] = track
+        return track
+
+    async def decode_tracks(self, request: web.Request) -> web.Response:
+        return web.json_response([decode_track(encoded) for encoded in await request.json()])
+
+    def __session(self, request: web.Request) -> Optional[dict[str, FakePlayer]]:
+        return self.__sessions.get(request.match_info['session_id'])
+
+    async def update_session(self, request: web.Request) -> web.Response:
+        if self.__session(request) is None:
+            return self.__error(404, 'Session not found', request.path)
+        data = await request.json()
+        return web.json_response({'resuming': data.get('resuming', False), 'timeout': data.get('timeout', 60)})
+
+    async def get_players(self, request: web.Request) -> web.Response:
+        if (session := self.__session(request)) is None:
+            return self.__error(404, 'Session not found', request.path)
+        return web.json_response([player.as_dict(self.__speed) for player in session.values()])
+
+    async def get_player(self, request: web.Request) -> web.Response:
+        session = self.__session(request)
+        player = session.get(request.match_info['guild_id']) if session is not None else None
+        if player is None:
+            return self.__error(404, 'Player not found', request.path)
+        return web.json_response(player.as_dict(self.__speed))
+
+    async def update_player(self, request: web.Request) -> web.Response:
+        session_id = request.match_info['session_id']
+        if (session := self.__session(request)) is None:
+            return self.__error(404, 'Session not found', request.path)
+
+        guild_id = request.match_info['guild_id']
+        player = session.setdefault(guild_id, FakePlayer(guild_id))
+        data = await request.json()
+        no_replace = request.query.get('noReplace', 'false').lower() == 'true'
+
+        if 'voice' in data:
+            player.voice = data['voice']
+        if 'volume' in data:
+            player.volume = data['volume']
+        if 'filters' in data:
+            player.filters = data['filters']
+        if 'paused' in data and data['paused'] != player.paused:
+            player.offset = player.position(self.__speed)
+            player.since = time.monotonic()
+            player.paused = data['paused']
+            self.__schedule_end(session_id, player)
+
+        encoded = data['track'].get('encoded', ...) if 'track' in data else data.get('encodedTrack', ...)
+        if encoded is None:
+            await self.__stop(session_id, player, 'stopped')
+        elif encoded is not ...:
+            if not (no_replace and player.track is not None):
+                try:
+                    track = decode_track(encoded)
+                except ValueError:
+                    return self.__error(400, 'Invalid encoded track', request.path)
+                track['userData'] = data.get('track', {}).get('userData', {})
+                await self.__start(session_id, player, track, data.get('position') or 0)
+        elif 'position' in data and player.track is not None:
+            player.offset = data['position']
+            player.since = time.monotonic()
+            self.__schedule_end(session_id, player)
+
+        return web.json_response(player.as_dict(self.__speed))
+
+    async def destroy_player(self, request: web.Request) -> web.Response:
+        session = self.__session(request)
+        if session is not None and (player := session.pop(request.match_info['guild_id'], None)):
+            if player.end_task:
+                player.end_task.cancel()
+        return web.Response(status=204)
+
+
+def serve(host: str, port: int, **options: Any) -> None:
+    web.run_app(FakeLavalink(**options).app(), host=host, port=port, print=None)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=2333)
+    parser.add_argument('--password', default='youshallnotpass')
+    parser.add_argument('--speed', type=float, default=60, help='Virtual seconds played per real second.')
+    parser.add_argument('--playlist-size', type=int, default=100)
+    parser.add_argument('--search-size', type=int, default=10)
+    parser.add_argument('--load-delay', type=float, default=0.05, help='Simulated latency of a track load, in seconds.')
+    parser.add_argument('--kill-after', type=float, default=0,
+                        help='Crash the node this many seconds after the first connection, 0 to never crash.')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    serve(
+        args.host, args.port,
+        password=args.password,
+        speed=args.speed,
+        playlist_size=args.playlist_size,
+        search_size=args.search_size,
+        load_delay=args.load_delay,
+        kill_after=args.kill_after,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,468 @@
+"""
+End to end load test of the music cog against the fake Lavalink node, with simulated guilds.
+
+Every simulated guild joins, queues a playlist and a few tracks, skips through the player view
+while the tracks play on the virtual clock of the fake node, and leaves. The test is repeated with
+more and more guilds, until the commands stop answering within the interaction deadline.
+
+Reported for every step: the p50/p99 latency of every command, the wavelink events handled per second
+and the peak RSS per guild.
+
+With --kill-node the bot connects to a second fake node, and the first one crashes that many seconds after
+the bot connected: the players it had must be moved to the second one while the guilds keep playing.
+
+Usage:
+    python -m benchmarks.load_test [--guilds 10,100,500,1000] [--duration 30] [--speed 60] [--kill-node 10]
+"""
+
+import os
+
+# The load test must not restore nor overwrite the guilds saved by a real bot.
+os.environ['GUILD_STORE_PATH'] = ''
+
+import argparse
+import asyncio
+import itertools
+import multiprocessing
+import random
+import resource
+import socket
+import statistics
+import time
+from collections import Counter, defaultdict
+from types import SimpleNamespace
+from typing import Any, Optional
+
+import discord
+import wavelink
+from discord import app_commands
+from discord.ext import commands
+
+from src.cogs.music import Music
+from src.music_ui.player.items.buttons.skip import Skip
+
+from benchmarks import fake_lavalink
+
+
+INTERACTION_DEADLINE = 3
+PASSWORD = 'youshallnotpass'
+
+_ids = itertools.count(1 << 40)
+
+
+class FakeMessage:
+    def __init__(self, channel: 'FakeTextChannel', view: Optional[discord.ui.View] = None) -> None:
+        self.id: int = next(_ids)
+        self.channel: FakeTextChannel = channel
+        self.view: Optional[discord.ui.View] = view
+
+    async def edit(self, **kwargs: Any) -> 'FakeMessage':
+        if 'view' in kwargs:
+            self.view = kwargs['view']
+            self.channel.last_view = self.view or self.channel.last_view
+        return self
+
+    async def delete(self, **kwargs: Any) -> None:
+        pass
+
+
+class FakeTextChannel:
+    def __init__(self, guild: 'FakeGuild') -> None:
+        self.id: int = next(_ids)
+        self.guild: FakeGuild = guild
+        self.last_view: Optional[discord.ui.View] = None
+        self.sent: int = 0
+
+    async def send(self, content: Optional[str] = None, **kwargs: Any) -> FakeMessage:
+        self.sent += 1
+        if kwargs.get('view'):
+            self.last_view = kwargs['view']
+        return FakeMessage(self, kwargs.get('view'))
+
+
+class FakeVoiceChannel:
+    def __init__(self, guild: 'FakeGuild', bot: 'LoadTestBot') -> None:
+        self.id: int = next(_ids)
+        self.name: str = f'voice-{guild.id}'
+        self.guild: FakeGuild = guild
+        self.members: list[SimpleNamespace] = []
+        self.__bot: LoadTestBot = bot
+
+    def _get_voice_client_key(self) -> tuple[int, str]:
+        return self.guild.id, 'guild_id'
+
+    async def connect(self, *, cls: Any, timeout: float = 60.0, reconnect: bool = True, self_deaf: bool = False,
+                      self_mute: bool = False) -> discord.VoiceProtocol:
+        # The same steps as discord.abc.Connectable.connect, without a gateway.
+        voice = cls(self.__bot, self)
+        self.__bot._connection._add_voice_client(self.guild.id, voice)
+        await voice.connect(timeout=timeout, reconnect=reconnect, self_deaf=self_deaf, self_mute=self_mute)
+        return voice
+
+
+class FakeGuild:
+    def __init__(self, guild_id: int, bot: 'LoadTestBot') -> None:
+        self.id: int = guild_id
+        self.me: SimpleNamespace = SimpleNamespace(id=bot.user.id, guild=self, voice=None)
+        self.__bot: LoadTestBot = bot
+
+    @property
+    def voice_client(self) -> Optional[discord.VoiceProtocol]:
+        return self.__bot._connection._get_voice_client(self.id)
+
+    async def change_voice_state(self, *, channel: Optional[FakeVoiceChannel], self_mute: bool = False,
+                                 self_deaf: bool = False) -> None:
+        before = self.me.voice or SimpleNamespace(channel=None)
+        self.me.voice = SimpleNamespace(channel=channel) if channel else None
+        if channel is not None:
+            # Discord answers with the voice state and voice server updates once the bot joined.
+            asyncio.create_task(self.__voice_updates(self.voice_client, channel))
+        self.__bot.dispatch('voice_state_update', self.me, before, self.me.voice or SimpleNamespace(channel=None))
+
+    async def __voice_updates(self, voice: wavelink.Player, channel: FakeVoiceChannel) -> None:
+        await voice.on_voice_state_update({'session_id': f'session-{self.id}', 'channel_id': channel.id})
+        await voice.on_voice_server_update({'token': 'token', 'endpoint': 'voice.fake', 'guild_id': str(self.id)})
+
+
+class FakeResponse:
+    def __init__(self, session: 'GuildSession') -> None:
+        self.__session: GuildSession = session
+        self.__done: bool = False
+
+    def is_done(self) -> bool:
+        return self.__done
+
+    async def send_message(self, content: Optional[str] = None, **kwargs: Any) -> None:
+        if kwargs.get('view'):
+            self.__session.response_view = kwargs['view']
+        self.__done = True
+
+    async def edit_message(self, **kwargs: Any) -> None:
+        self.__done = True
+
+    async def defer(self, **kwargs: Any) -> None:
+        self.__done = True
+
+
+class FakeInteraction:
+    def __init__(self, session: 'GuildSession', command: Any = None) -> None:
+        self.id: int = next(_ids)
+        self.created_at = discord.utils.utcnow()
+        self.client: LoadTestBot = session.bot
+        self.guild: FakeGuild = session.guild
+        self.guild_id: int = session.guild.id
+        self.channel: FakeTextChannel = session.text_channel
+        self.channel_id: int = session.text_channel.id
+        self.user: SimpleNamespace = session.user
+        self.command: Any = command
+        self.response: FakeResponse = FakeResponse(session)
+
+    async def edit_original_response(self, **kwargs: Any) -> None:
+        pass
+
+    async def delete_original_response(self) -> None:
+        pass
+
+
+class LoadTestBot(commands.Bot):
+    """
+    A bot that never logs in: the channels and voice connections come from the fake guilds.
+    """
+    def __init__(self) -> None:
+        super().__init__(command_prefix='!', intents=discord.Intents.none())
+        self._connection.user = discord.ClientUser(state=self._connection, data={
+            'id': 1, 'username': 'Susano', 'discriminator': '0', 'avatar': None, 'bot': True,
+        })
+        self.fake_channels: dict[int, Any] = {}
+        self.events: Counter = Counter()
+
+    def get_channel(self, channel_id: int, /) -> Any:
+        return self.fake_channels.get(channel_id)
+
+    def dispatch(self, event_name: str, /, *args: Any, **kwargs: Any) -> None:
+        if event_name.startswith('wavelink_'):
+            self.events[event_name] += 1
+        super().dispatch(event_name, *args, **kwargs)
+
+
+class GuildSession:
+    """
+    A simulated guild with one member in a voice channel, using the bot through commands and buttons.
+    """
+    def __init__(self, bot: LoadTestBot, cog: Music, guild_id: int, latencies: dict[str, list[float]],
+                 errors: Counter) -> None:
+        self.bot: LoadTestBot = bot
+        self.guild: FakeGuild = FakeGuild(guild_id, bot)
+        self.text_channel: FakeTextChannel = FakeTextChannel(self.guild)
+        self.voice_channel: FakeVoiceChannel = FakeVoiceChannel(self.guild, bot)
+        self.user: SimpleNamespace = SimpleNamespace(
+            id=guild_id + 1,
+            bot=False,
+            display_name=f'user-{guild_id}',
+            display_avatar=SimpleNamespace(url='https://cdn.discordapp.com/avatar.png'),
+            voice=SimpleNamespace(channel=self.voice_channel),
+        )
+        self.voice_channel.members.append(self.user)
+        # The last view sent as an interaction response, like the search results dropdown.
+        self.response_view: Optional[discord.ui.View] = None
+        bot.fake_channels[self.text_channel.id] = self.text_channel
+        bot.fake_channels[self.voice_channel.id] = self.voice_channel
+
+        self.__cog: Music = cog
+        self.__latencies: dict[str, list[float]] = latencies
+        self.__errors: Counter = errors
+
+    async def command(self, name: str, **params: Any) -> None:
+        """
+        Run an app command the way the command tree does: the cog and command checks, the callback and
+        the completion event, or the error handlers.
+        """
+        command = self.bot.tree.get_command(name)
+        interaction = FakeInteraction(self, command)
+        start = time.perf_counter()
+        try:
+            if not await self.__cog.interaction_check(interaction):
+                raise app_commands.CheckFailure
+            for check in command.checks:
+                if not await discord.utils.maybe_coroutine(check, interaction):
+                    raise app_commands.CheckFailure
+            await command.callback(self.__cog, interaction, **params)
+            self.bot.dispatch('app_command_completion', interaction, command)
+        except app_commands.AppCommandError as error:
+            self.__errors[f'{name}: {type(error).__name__}'] += 1
+            if command.on_error is not None:
+                await command.on_error(self.__cog, interaction, error)
+            await self.__cog.cog_app_command_error(interaction, error)
+        except Exception as error:
+            self.__errors[f'{name}: {type(error).__name__}'] += 1
+        self.__latencies[name].append(time.perf_counter() - start)
+
+    async def press(self, item_type: type[discord.ui.Item], values: int = 1) -> None:
+        """
+        Press a button of the last player view sent in the guild, or pick the first values of the last
+        dropdown sent as a response, the way the view dispatches it.
+        """
+        is_select = issubclass(item_type, discord.ui.Select)
+        view = self.response_view if is_select else self.text_channel.last_view
+        item = next((child for child in view.children if isinstance(child, item_type)), None) if view else None
+        if item is None:
+            self.__errors[f'{item_type.__name__}: missing'] += 1
+            return
+        if is_select:
+            item._values = [option.value for option in item.options[:values]]
+
+        interaction = FakeInteraction(self)
+        start = time.perf_counter()
+        try:
+            if await view.interaction_check(interaction):
+                await item.callback(interaction)
+        except Exception as error:
+            self.__errors[f'{item_type.__name__}: {type(error).__name__}'] += 1
+            await view.on_error(interaction, error, item)
+        self.__latencies[item_type.__name__.lower()].append(time.perf_counter() - start)
+
+    async def run(self, duration: float, skips: int) -> None:
+        await self.command('join')
+        await self.command('play', search=f'https://www.youtube.com/playlist?list=guild{self.guild.id}')
+        for index in range(3):
+            await self.command('play', search=f'https://www.youtube.com/watch?v=guild{self.guild.id}-{index}')
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + duration
+        for _ in range(skips):
+            await asyncio.sleep(random.uniform(0, duration / skips))
+            await self.press(Skip)
+        await asyncio.sleep(max(deadline - loop.time(), 0))
+
+        await self.command('leave')
+
+
+def report(latencies: dict[str, list[float]], errors: Counter) -> float:
+    """
+    Print the latency percentiles of every command and the errors.
+
+    Returns:
+        float: The worst p99 latency, in seconds.
+    """
+    worst = 0.0
+    for name, values in sorted(latencies.items()):
+        p50, p99 = percentile(values, 50), percentile(values, 99)
+        worst = max(worst, p99)
+        print(f'  {name:<12} {len(values):6d} calls  p50 {p50 * 1000:8.1f} ms  p99 {p99 * 1000:8.1f} ms')
+    for error, count in errors.most_common():
+        print(f'  error {error}: {count}')
+    return worst
+
+
+def report_stages(summary: dict[str, dict[str, float]]) -> None:
+    """
+    Print the p50/p99 of the traced stages of the last commands, up to the first audio.
+    """
+    for stage, stats in summary.items():
+        print(f'  stage {stage:<19} {stats["count"]:6d} spans  p50 {stats["p50"] * 1000:8.1f} ms  '
+              f'p99 {stats["p99"] * 1000:8.1f} ms')
+
+
+def percentile(values: list[float], percent: float) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0
+    return statistics.quantiles(values, n=100, method='inclusive')[percent - 1]
+
+
+def peak_rss() -> float:
+    # Kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+async def run_step(bot: LoadTestBot, cog: Music, guilds: int, first_guild: int, args: argparse.Namespace) -> bool:
+    latencies: dict[str, list[float]] = defaultdict(list)
+    errors: Counter = Counter()
+    sessions = [GuildSession(bot, cog, first_guild + index, latencies, errors) for index in range(guilds)]
+
+    async def start(index: int, session: GuildSession) -> None:
+        await asyncio.sleep(args.ramp * index / guilds)
+        await session.run(args.duration, args.skips)
+
+    bot.events.clear()
+    rss_before = peak_rss()
+    started = time.perf_counter()
+    await asyncio.gather(*(start(index, session) for index, session in enumerate(sessions)))
+    elapsed = time.perf_counter() - started
+
+    events = sum(bot.events.values())
+    print(f'\n{guilds} guilds in {elapsed:.1f}s: {events / elapsed:,.0f} wavelink events/s, '
+          f'{(peak_rss() - rss_before) / guilds / 1024:,.1f} KiB peak RSS per guild')
+    worst = report(latencies, errors)
+    if cog.tracer:
+        report_stages(cog.tracer.summary())
+    return worst < INTERACTION_DEADLINE
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def wait_for_port(port: int, timeout: float = 10) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection('127.0.0.1', port)
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.1)
+        else:
+            writer.close()
+            return
+
+
+def start_fake_node(port: int, **options: Any) -> multiprocessing.Process:
+    """
+    Start the fake Lavalink node in its own process, so its work is not measured as the bot's.
+    """
+    multiprocessing.set_start_method('spawn', force=True)
+    server = multiprocessing.Process(
+        target=fake_lavalink.serve,
+        args=('127.0.0.1', port),
+        kwargs={'password': PASSWORD, **options},
+        daemon=True,
+    )
+    server.start()
+    return server
+
+
+async def start_bot(ports: list[int]) -> tuple[LoadTestBot, Music]:
+    """
+    Connect a bot to the fake nodes and load the music cog, stop_bot undoes it.
+    """
+    for port in ports:
+        await wait_for_port(port)
+
+    bot = LoadTestBot()
+    await bot.__aenter__()
+    nodes = [
+        wavelink.Node(identifier=f'fake-{index}', uri=f'http://127.0.0.1:{port}', password=PASSWORD)
+        for index, port in enumerate(ports)
+    ]
+    await wavelink.Pool.connect(nodes=nodes, client=bot)
+    while any(node.status is not wavelink.NodeStatus.CONNECTED for node in nodes):
+        await asyncio.sleep(0.05)
+
+    cog = Music(bot)
+    await bot.add_cog(cog)
+    return bot, cog
+
+
+async def stop_bot(bot: LoadTestBot, cog: Music) -> None:
+    await bot.remove_cog(cog.qualified_name)
+    await wavelink.Pool.close()
+    await bot.close()
+
+
+async def watch_failover(killed: wavelink.Node, survivor: wavelink.Node, timeout: float = 30) -> None:
+    """
+    Wait for the killed node to go down and report how many of its players were moved to the survivor.
+    """
+    loop = asyncio.get_running_loop()
+    while killed.status is wavelink.NodeStatus.CONNECTED:
+        await asyncio.sleep(0.05)
+    down = loop.time()
+    guild_ids = set(killed.players)
+
+    while killed.players and loop.time() - down < timeout:
+        await asyncio.sleep(0.05)
+    moved = sum(1 for guild_id in guild_ids if guild_id in survivor.players)
+    print(f'\nNode {killed.identifier} killed with {len(guild_ids)} players: {moved} moved to '
+          f'{survivor.identifier} in {loop.time() - down:.2f}s, {len(guild_ids) - moved} lost')
+
+
+async def load_test(args: argparse.Namespace, ports: list[int]) -> None:
+    bot, cog = await start_bot(ports)
+    watcher = None
+    if args.kill_node:
+        nodes = list(wavelink.Pool.nodes.values())
+        watcher = asyncio.create_task(watch_failover(nodes[0], nodes[1]))
+    try:
+        first_guild = 1 << 32
+        for guilds in args.guilds:
+            if not await run_step(bot, cog, guilds, first_guild, args):
+                print(f'\nThe p99 latency went over the {INTERACTION_DEADLINE}s interaction deadline '
+                      f'at {guilds} guilds')
+                break
+            first_guild += guilds
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+        await stop_bot(bot, cog)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--guilds', type=lambda value: [int(step) for step in value.split(',')],
+                        default=[10, 100, 500, 1000], help='Comma separated numbers of guilds, one step each.')
+    parser.add_argument('--duration', type=float, default=30, help='How long every guild stays connected.')
+    parser.add_argument('--ramp', type=float, default=5, help='The time over which the guilds join.')
+    parser.add_argument('--skips', type=int, default=3, help='How many times every guild presses skip.')
+    parser.add_argument('--speed', type=float, default=60, help='Virtual seconds played per real second.')
+    parser.add_argument('--playlist-size', type=int, default=100)
+    parser.add_argument('--load-delay', type=float, default=0.05)
+    parser.add_argument('--kill-node', type=float, default=0,
+                        help='Crash the first of two fake nodes this many seconds after the bot connected.')
+    args = parser.parse_args()
+
+    options = {'speed': args.speed, 'playlist_size': args.playlist_size, 'load_delay': args.load_delay}
+    ports = [free_port() for _ in range(2 if args.kill_node else 1)]
+    servers = [start_fake_node(ports[0], kill_after=args.kill_node, **options)]
+    servers += [start_fake_node(port, **options) for port in ports[1:]]
+    try:
+        asyncio.run(load_test(args, ports))
+    finally:
+        for server in servers:
+            server.terminate()
+            server.join()
+
+
+if __name__ == '__main__':
+    main()
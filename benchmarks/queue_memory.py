@@ -0,0 +1,81 @@
+"""
+Per-track memory of a queued playlist, with the plain wavelink.Queue and with the CompactQueue.
+
+Usage:
+    python -m benchmarks.queue_memory [--tracks 600] [--guilds 10]
+"""
+
+import argparse
+import gc
+import tracemalloc
+
+import wavelink
+
+from src.voice.compact_queue.compact_queue import CompactQueue
+from src.voice.compact_queue.track_codec import encode_track
+
+
+def make_playlist(size: int) -> wavelink.Playlist:
+    tracks = []
+    for index in range(size):
+        info = {
+            'identifier': f'{index:011d}',
+            'isSeekable': True,
+            'author': f'Artist {index % 50} - Topic',
+            'length': 180000 + index,
+            'isStream': False,
+            'position': 0,
+            'title': f'Track number {index} (Official Video)',
+            'uri': f'https://www.youtube.com/watch?v={index:011d}',
+            'artworkUrl': f'https://i.ytimg.com/vi/{index:011d}/maxresdefault.jpg',
+            'isrc': None,
+            'sourceName': 'youtube',
+        }
+        tracks.append({'encoded': encode_track(info), 'info': info, 'pluginInfo': {}, 'userData': {}})
+
+    return wavelink.Playlist({
+        'info': {'name': 'Benchmark playlist', 'selectedTrack': -1},
+        'pluginInfo': {},
+        'tracks': tracks,
+    })
+
+
+def queued_bytes(queue_cls: type[wavelink.Queue], tracks: int, guilds: int) -> int:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+
+    queues = []
+    for _ in range(guilds):
+        playlist = make_playlist(tracks)
+        for track in playlist:
+            track.extras = {'requester_name': 'Requester', 'requester_avatar': 'https://cdn.discordapp.com/avatar.png'}
+        queue = queue_cls()
+        queue.put(playlist)
+        queues.append(queue)
+        del playlist
+    gc.collect()
+
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    return sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tracks', type=int, default=600)
+    parser.add_argument('--guilds', type=int, default=10)
+    args = parser.parse_args()
+
+    total = args.tracks * args.guilds
+    results = {
+        'wavelink.Queue': queued_bytes(wavelink.Queue, args.tracks, args.guilds),
+        'CompactQueue': queued_bytes(CompactQueue, args.tracks, args.guilds),
+    }
+    for name, size in results.items():
+        print(f'{name:<16} {size / 1024:10.1f} KiB  {size / total:8.1f} B/track')
+    print(f'ratio            {results["wavelink.Queue"] / results["CompactQueue"]:10.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Replay a trace recorded with TRACE_PATH against the fake Lavalink node.
+
+Every recorded guild becomes a simulated guild that runs its commands and presses its buttons at
+the recorded times, divided by --speed. The fake node plays the tracks at the same speed, so the
+replayed workload keeps the shape of the recorded one. The recorded wavelink events are only used
+to compare with the events the replay produced.
+
+Components the trace could not name (the queue pages) are not replayed.
+
+Usage:
+    python -m benchmarks.replay trace.jsonl [--speed 10] [--playlist-size 100]
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter, defaultdict
+from typing import Any
+
+import discord
+
+from src.music_ui.player.items.buttons.back import Back
+from src.music_ui.player.items.buttons.loop import Loop
+from src.music_ui.player.items.buttons.queue import Queue
+from src.music_ui.player.items.buttons.reset import Reset
+from src.music_ui.player.items.buttons.resume_pause import ResumePause
+from src.music_ui.player.items.buttons.skip import Skip
+from src.music_ui.track_select.items.dropdowns.tracks import Tracks
+
+from benchmarks.load_test import GuildSession, free_port, report, start_bot, start_fake_node, stop_bot
+
+
+ITEMS: dict[str, type[discord.ui.Item]] = {
+    item.__name__: item for item in (Back, Loop, Queue, Reset, ResumePause, Skip, Tracks)
+}
+
+
+def load_trace(path: str) -> list[dict[str, Any]]:
+    with open(path, encoding='utf-8') as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+async def replay_guild(session: GuildSession, records: list[dict[str, Any]], speed: float, started: float,
+                       skipped: Counter) -> None:
+    loop = asyncio.get_running_loop()
+    for record in records:
+        await asyncio.sleep(max(started + record['t'] / speed - loop.time(), 0))
+
+        if record['type'] == 'command':
+            await session.command(record['name'], **record.get('options', {}))
+        elif (item := ITEMS.get(record['name'])) is not None:
+            await session.press(item, record.get('values', 1))
+        else:
+            skipped[record['name']] += 1
+
+    # Leave the guilds the trace ends in, like the inactivity timeout would.
+    if session.bot._connection._get_voice_client(session.guild.id):
+        await session.command('leave')
+
+
+async def replay(trace: list[dict[str, Any]], speed: float, port: int) -> None:
+    per_guild: dict[int, list[dict[str, Any]]] = defaultdict(list)
+    recorded_events: Counter = Counter()
+    for record in trace:
+        if record['type'] in ('command', 'component'):
+            per_guild[record['guild']].append(record)
+        elif record['type'] == 'event':
+            recorded_events[f"wavelink_{record['name']}"] += 1
+
+    bot, cog = await start_bot([port])
+    try:
+        latencies: dict[str, list[float]] = defaultdict(list)
+        errors: Counter = Counter()
+        skipped: Counter = Counter()
+        sessions = {
+            guild_id: GuildSession(bot, cog, (1 << 32) + index, latencies, errors)
+            for index, guild_id in enumerate(per_guild)
+        }
+
+        bot.events.clear()
+        started = asyncio.get_running_loop().time()
+        wall = time.perf_counter()
+        await asyncio.gather(*(
+            replay_guild(sessions[guild_id], records, speed, started, skipped)
+            for guild_id, records in per_guild.items()
+        ))
+        elapsed = time.perf_counter() - wall
+
+        interactions = sum(len(records) for records in per_guild.values())
+        print(f'Replayed {interactions} interactions of {len(per_guild)} guilds in {elapsed:.1f}s '
+              f'(recorded over {trace[-1]["t"] if trace else 0:.1f}s, speed {speed:g}x)')
+        report(latencies, errors)
+        for name, count in skipped.most_common():
+            print(f'  not replayed {name}: {count}')
+
+        print('\n  event                          recorded   replayed')
+        for name in sorted(recorded_events.keys() | bot.events.keys()):
+            print(f'  {name:<30} {recorded_events[name]:8d}   {bot.events[name]:8d}')
+    finally:
+        await stop_bot(bot, cog)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('trace', help='The JSONL trace recorded with TRACE_PATH.')
+    parser.add_argument('--speed', type=float, default=1, help='How much faster than recorded the trace is replayed.')
+    parser.add_argument('--playlist-size', type=int, default=100)
+    parser.add_argument('--load-delay', type=float, default=0.05)
+    args = parser.parse_args()
+
+    trace = load_trace(args.trace)
+    port = free_port()
+    server = start_fake_node(port, speed=args.speed, playlist_size=args.playlist_size, load_delay=args.load_delay)
+    try:
+        asyncio.run(replay(trace, args.speed, port))
+    finally:
+        server.terminate()
+        server.join()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,259 @@
+"""
+Microbenchmarks of the code run on every event or interaction, offline and without Discord or Lavalink.
+
+The results are saved as JSON, so two versions can be compared with --compare.
+
+Every benchmark name starts with the name of its group, and --filter selects the benchmarks by prefix:
+the fixtures of a group are only built when the filter can select some of its benchmarks.
+
+Usage:
+    python -m benchmarks.suite [--output benchmarks.json] [--filter embed] [--compare previous.json]
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import platform
+import subprocess
+import sys
+from math import ceil
+from types import SimpleNamespace
+from typing import Any, Callable, Iterator, Optional
+
+import wavelink
+
+from src.checks.voice_channel_check import check_voice_channel
+from src.music_ui.queue.queue_view import QueueView
+from src.search.track_index import IndexedTrack, TrackIndex
+from src.utils.embed import EmbedFactory, EmbedQueue
+from src.utils.render_cache import RenderCache
+from src.utils.utils import convert_time, convert_time_to_ms, ms_to_time
+from src.voice.compact_queue.compact_queue import CompactQueue
+from src.voice.compact_queue.queue_chain import QueueChain
+from src.voice.guild_data.guild_data import GuildMusicData
+from src.voice.guild_voice_state import GuildVoiceState
+from src.voice.session_registry.session_registry import SessionRegistry
+from src.voice.voice_state.voice_player import VoicePlayer
+
+from benchmarks.queue_memory import make_playlist
+from benchmarks.timing import measure
+
+
+Case = tuple[str, Callable[[], Any]]
+
+EXTRAS = {'requester_name': 'Requester', 'requester_avatar': 'https://cdn.discordapp.com/avatar.png'}
+TRACK_PER_PAGE = 10
+
+
+def make_tracks(size: int) -> list[wavelink.Playable]:
+    tracks = make_playlist(size).tracks
+    for track in tracks:
+        track.extras = EXTRAS
+    return tracks
+
+
+def make_queue(size: int) -> CompactQueue:
+    queue = CompactQueue()
+    queue.put(make_tracks(size))
+    return queue
+
+
+def utils_cases() -> Iterator[Case]:
+    yield 'utils.convert_time', lambda: convert_time(3723000)
+    yield 'utils.convert_time_to_ms', lambda: convert_time_to_ms('1:02:03')
+    yield 'utils.ms_to_time', lambda: ms_to_time(3723000)
+
+
+def embed_cases() -> Iterator[Case]:
+    factory = EmbedFactory()
+    tracks = make_tracks(100)
+    playlist = make_playlist(100)
+    author = SimpleNamespace(display_name='Requester', display_avatar='https://cdn.discordapp.com/avatar.png')
+    embed_queue = EmbedQueue(100, ceil(100 / TRACK_PER_PAGE), TRACK_PER_PAGE)
+
+    yield 'embed.error', lambda: factory.error('Canzone non trovata')
+    yield 'embed.send', lambda: factory.send('Canzone saltata')
+    yield 'embed.now_playing', lambda: factory.now_playing(tracks[0])
+    yield 'embed.added_to_queue.track', lambda: factory.added_to_queue(tracks[:1], author)
+    yield 'embed.added_to_queue.tracks', lambda: factory.added_to_queue(tracks, author)
+    yield 'embed.added_to_queue.playlist', lambda: factory.added_to_queue(playlist, author, added=50)
+    yield 'embed.queue.page', lambda: embed_queue.queue(tracks[:TRACK_PER_PAGE], 1)
+
+
+def tracks_cases() -> Iterator[Case]:
+    # The dropdown uses the 3.12 f-string syntax, it cannot be imported on older interpreters.
+    if sys.version_info < (3, 12):
+        return
+    from src.music_ui.track_select.items.dropdowns.tracks import Tracks
+
+    tracks = make_tracks(25)
+    # Search results often contain the same track more than once.
+    tracks[12:] = tracks[:13]
+
+    yield 'tracks.remove_duplicates', lambda: Tracks._Tracks__remove_duplicates(tracks)
+    yield 'tracks.options', lambda: Tracks(None, None, tracks)
+
+
+def queue_view_cases() -> Iterator[Case]:
+    chain = QueueChain(make_queue(10000), make_queue(20))
+    count = len(chain)
+    pages = ceil(count / TRACK_PER_PAGE)
+
+    view = QueueView(chain, EmbedQueue(count, pages, TRACK_PER_PAGE), RenderCache())
+    uncached = QueueView(chain, EmbedQueue(count, pages, TRACK_PER_PAGE), RenderCache(max_entries=0))
+    uncached.current_page = pages
+
+    yield 'queue_view.get_tracks_by_page.first', lambda: view.get_tracks_by_page(1)
+    yield 'queue_view.get_tracks_by_page.last', lambda: view.get_tracks_by_page(pages)
+    yield 'queue_view.render_page.cached', view.render_page
+    yield 'queue_view.render_page.uncached', uncached.render_page
+
+
+def guild_voice_state_cases() -> Iterator[Case]:
+    voice_state = GuildVoiceState(None, None)
+    player = SimpleNamespace(queue=make_queue(10000), auto_queue=make_queue(20), connected=True)
+    voice_state._GuildVoiceState__set_guild_state(1, player, GuildMusicData(1, VoicePlayer(player), False))
+    interaction = SimpleNamespace(guild_id=1)
+
+    yield 'guild_voice_state.queues', lambda: voice_state.queues(interaction)
+
+
+def connected_guilds(count: int) -> tuple[SessionRegistry, GuildVoiceState]:
+    """
+    A session registry and a voice state with the bot connected in count guilds, guild n in the voice channel n.
+    """
+    sessions = SessionRegistry()
+    voice_state = GuildVoiceState(None, None, sessions=sessions)
+    for guild_id in range(count):
+        player = SimpleNamespace(
+            channel=SimpleNamespace(id=guild_id), queue=CompactQueue(), auto_queue=CompactQueue(), connected=True,
+            paused=False
+        )
+        voice_state._GuildVoiceState__set_guild_state(guild_id, player, GuildMusicData(1, VoicePlayer(player), False))
+    return sessions, voice_state
+
+
+def session_registry_cases() -> Iterator[Case]:
+    for count in (1000, 10000):
+        sessions, voice_state = connected_guilds(count)
+        last = count - 1
+
+        yield f'session_registry.music_data.{count}_guilds', lambda sessions=sessions, last=last: (
+            sessions.music_data(last)
+        )
+        yield f'session_registry.is_paused.{count}_guilds', lambda voice_state=voice_state, last=last: (
+            voice_state.is_paused(last)
+        )
+
+
+def track_index_cases() -> Iterator[Case]:
+    played = [IndexedTrack(track.title, track.author, track.uri) for track in make_tracks(200)]
+    index = TrackIndex()
+    index.add_all(1, played)
+
+    def seed():
+        TrackIndex().add_all(1, played)
+
+    yield 'track_index.add_all.200', seed
+    yield 'track_index.search.empty', lambda: index.search(1, '')
+    yield 'track_index.search.prefix', lambda: index.search(1, played[100].title[:4])
+    yield 'track_index.search.words', lambda: index.search(1, f'{played[100].title} {played[100].author[:2]}')
+
+
+def voice_check_cases() -> Iterator[Case]:
+    @check_voice_channel()
+    async def command(_):
+        pass
+    predicate = command.__discord_app_commands_checks__[0]
+
+    # The bot is connected in thousands of guilds, the interaction comes from the last one.
+    for count in (1000, 10000):
+        sessions, _ = connected_guilds(count)
+        interaction = SimpleNamespace(
+            guild_id=count - 1,
+            user=SimpleNamespace(voice=SimpleNamespace(channel=SimpleNamespace(id=count - 1))),
+            command=SimpleNamespace(name='skip', binding=SimpleNamespace(sessions=sessions)),
+        )
+
+        yield f'check_voice_channel.{count}_guilds', lambda interaction=interaction: predicate(interaction)
+
+
+GROUPS: dict[str, Callable[[], Iterator[Case]]] = {
+    'utils': utils_cases,
+    'embed': embed_cases,
+    'tracks': tracks_cases,
+    'queue_view': queue_view_cases,
+    'guild_voice_state': guild_voice_state_cases,
+    'session_registry': session_registry_cases,
+    'track_index': track_index_cases,
+    'check_voice_channel': voice_check_cases,
+}
+
+
+def selects(name_filter: Optional[str], group: str) -> bool:
+    prefix = f'{group}.'
+    return not name_filter or prefix.startswith(name_filter) or name_filter.startswith(prefix)
+
+
+def run(name_filter: Optional[str] = None) -> dict[str, dict[str, float]]:
+    # The views of discord.py can only be created with an event loop running.
+    return asyncio.run(run_groups(name_filter))
+
+
+async def run_groups(name_filter: Optional[str]) -> dict[str, dict[str, float]]:
+    results = {}
+    for group_name, group in GROUPS.items():
+        if not selects(name_filter, group_name):
+            continue
+        for name, function in group():
+            if name_filter and not name.startswith(name_filter):
+                continue
+            results[name] = measure(function)
+            print(f'{name:<40} {results[name]["mean_us"]:12.2f} us  {results[name]["ops_per_second"]:14,.0f} ops/s')
+    return results
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: dict[str, dict[str, float]], path: str) -> None:
+    with open(path) as file:
+        previous = json.load(file)['results']
+
+    print(f'\nCompared with {path}:')
+    for name, result in results.items():
+        if name in previous:
+            ratio = result['mean_us'] / previous[name]['mean_us']
+            print(f'{name:<40} {ratio:8.2f}x {"slower" if ratio > 1 else "faster"}')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--output', default='benchmarks.json', help='Where the results are saved.')
+    parser.add_argument('--filter', help='Only run the benchmarks whose name starts with this text.')
+    parser.add_argument('--compare', help='The results of a previous run to compare with.')
+    args = parser.parse_args()
+
+    results = run(args.filter)
+    with open(args.output, 'w') as file:
+        json.dump({
+            'revision': git_revision(),
+            'date': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'results': results,
+        }, file, indent=2)
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
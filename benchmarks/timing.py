@@ -0,0 +1,30 @@
+"""
+Timing helpers shared by the benchmarks.
+"""
+
+import timeit
+from typing import Any, Callable
+
+
+def measure(function: Callable[[], Any], repeat: int = 5) -> dict[str, float]:
+    """
+    Time a function, calibrating the number of calls per run to last at least 0.2 seconds.
+
+    Args:
+        function: The function to time, called without arguments.
+        repeat (int): The number of runs, the best one is reported.
+
+    Returns:
+        dict[str, float]: The calls per second and the mean time per call in microseconds, of the best run.
+    """
+    number, _ = timeit.Timer(function).autorange()
+    best = min(timeit.repeat(function, number=number, repeat=repeat))
+    return {
+        'ops_per_second': number / best,
+        'mean_us': best / number * 1e6,
+        'calls': number,
+    }
+
+
+def rate(function: Callable[[], Any]) -> float:
+    return measure(function)['ops_per_second']
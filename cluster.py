@@ -0,0 +1,128 @@
+"""
+This module contains the cluster launcher, which runs the bot on several processes,
+each one owning a contiguous range of shards.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import time
+from multiprocessing.managers import DictProxy
+
+import aiohttp
+
+from config import setup_logging, stop_logging, discord_token, shard_count, clusters, cluster_stats_interval
+
+
+async def fetch_shard_count(token: str) -> int:
+    """
+    Fetch the number of shards recommended by Discord.
+
+    Args:
+        token (str): The token of the bot.
+
+    Returns:
+        int: The recommended shard count.
+    """
+    async with aiohttp.ClientSession() as session:
+        async with session.get(
+            'https://discord.com/api/v10/gateway/bot',
+            headers={'Authorization': f'Bot {token}'}
+        ) as response:
+            response.raise_for_status()
+            return (await response.json())['shards']
+
+
+def shard_ranges(total_shards: int, total_clusters: int) -> list[list[int]]:
+    """
+    Split the shards in contiguous ranges, one per cluster, as even as possible.
+
+    Args:
+        total_shards (int): The total number of shards.
+        total_clusters (int): The number of clusters, capped to the number of shards.
+
+    Returns:
+        list[list[int]]: The shard ids run by every cluster.
+    """
+    total_clusters = max(1, min(total_clusters, total_shards))
+    size, extra = divmod(total_shards, total_clusters)
+    ranges, start = [], 0
+    for cluster_id in range(total_clusters):
+        end = start + size + (1 if cluster_id < extra else 0)
+        ranges.append(list(range(start, end)))
+        start = end
+    return ranges
+
+
+def run_cluster(cluster_id: int, shard_ids: list[int], total_shards: int, shared: DictProxy) -> None:
+    """
+    The entry point of a cluster process.
+    """
+    # Imported here so the launcher itself never loads discord.py and the cogs.
+    from main import SusanoMusicBot
+    from src.cluster.cluster_stats import ClusterStats
+
+    bot = SusanoMusicBot(
+        shard_ids=shard_ids,
+        shard_count=total_shards,
+        cluster_stats=ClusterStats(cluster_id, shared, cluster_stats_interval)
+    )
+    try:
+        bot.run(discord_token, log_handler=None)
+    finally:
+        stop_logging()
+
+
+def start_cluster(cluster_id: int, shard_ids: list[int], total_shards: int,
+                  shared: DictProxy) -> multiprocessing.Process:
+    process = multiprocessing.Process(
+        target=run_cluster,
+        args=(cluster_id, shard_ids, total_shards, shared),
+        name=f'cluster-{cluster_id}',
+    )
+    process.start()
+    logging.info('Started cluster %s with shards %s (pid %s)', cluster_id, shard_ids, process.pid)
+    return process
+
+
+def main() -> None:
+    setup_logging()
+    total_shards = shard_count or asyncio.run(fetch_shard_count(discord_token))
+    ranges = shard_ranges(total_shards, clusters)
+    logging.info('Launching %d clusters for %d shards', len(ranges), total_shards)
+
+    multiprocessing.set_start_method('spawn')
+    with multiprocessing.Manager() as manager:
+        shared = manager.dict()
+        processes = {
+            cluster_id: start_cluster(cluster_id, shard_ids, total_shards, shared)
+            for cluster_id, shard_ids in enumerate(ranges)
+        }
+
+        try:
+            while True:
+                time.sleep(cluster_stats_interval)
+                for cluster_id, process in processes.items():
+                    if not process.is_alive():
+                        logging.error('Cluster %s exited with code %s, restarting it', cluster_id, process.exitcode)
+                        shared.pop(cluster_id, None)
+                        processes[cluster_id] = start_cluster(cluster_id, ranges[cluster_id], total_shards, shared)
+
+                stats = shared.copy()
+                logging.info(
+                    'Clusters %d/%d, guilds %d, players %d',
+                    len(stats), len(processes),
+                    sum(cluster['guilds'] for cluster in stats.values()),
+                    sum(cluster['players'] for cluster in stats.values())
+                )
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for process in processes.values():
+                process.terminate()
+            for process in processes.values():
+                process.join()
+
+
+if __name__ == '__main__':
+    main()
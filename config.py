@@ -2,20 +2,70 @@
 This module configures the logging and loads environment variables for the Discord bot.
 
 Functions:
-    setup_logging(): Configures logging to use a TimedRotatingFileHandler.
+    setup_logging(cluster_id): Configures logging to write through a queue to a TimedRotatingFileHandler.
+    stop_logging(): Writes the queued log records and stops the writer thread.
 
 Environment Variables:
     DISCORD_TOKEN: The token for the Discord bot.
+    LOG_LEVEL: The level of the root logger.
+    LOG_LEVELS: Optional comma separated list of per logger levels, as logger=LEVEL
+        (e.g. discord.gateway=WARNING,src.cogs.music=DEBUG).
+    SHARD_COUNT: Optional total number of shards, the one recommended by Discord when unset.
+    SHARD_IDS: Optional comma separated list of the shards run by main.py, every shard when unset.
+    CLUSTERS: The number of processes started by cluster.py.
+    CLUSTER_STATS_INTERVAL: How often every cluster publishes its stats, in seconds.
+    INTENTS_PROFILE: minimal to only request and cache what the music cog uses, all for every intent.
+    MESSAGE_CACHE_SIZE: How many messages discord.py keeps in its cache, 0 to disable it.
+    CHUNK_GUILDS_AT_STARTUP: Whether the members of every guild are requested at startup.
     LAVA_HOST: The host for the LavaLink server.
     LAVA_PORT: The port for the LavaLink server.
     LAVA_PASSWORD: The password for the LavaLink server.
+    LAVA_NODES: Optional comma separated list of LavaLink nodes, as identifier@host:port.
+        Defaults to a single node built from LAVA_HOST and LAVA_PORT.
+    LAVA_DRAINING_NODES: Optional comma separated list of node identifiers that must not get new players.
+    LAVA_STATS_INTERVAL: How often the load of the nodes is refreshed, in seconds.
+    LAVA_HEALTH_INTERVAL: How often the nodes are checked for a lost websocket, in seconds. The players of
+        a node that is down are moved to the other nodes.
+    NOW_PLAYING_EDIT: Whether the now playing message is edited in place instead of sent again for every track.
+    NOW_PLAYING_MAX_MESSAGES: How many messages can follow the now playing message before it is sent again.
+    ENQUEUE_BATCH_SIZE: How many tracks of a playlist are enqueued at a time while the first one is already playing.
+    PREFETCH_DEPTH: How many upcoming tracks have their format checked by the node while the current one plays,
+        only the tracks it rejects are searched again, 0 to disable.
+    RECOMMEND_DEPTH: How many recommendations are kept in the auto queue ahead of time, 0 to let wavelink fetch them.
+    RECOMMEND_SEEDS: How many tracks of the history seed the recommendations, besides the current one.
+    METRICS_HOST: The address the Prometheus metrics are served on.
+    METRICS_PORT: The port of the Prometheus /metrics endpoint, 0 to disable it. Cluster n uses METRICS_PORT + n.
+    LOOP_LAG_INTERVAL: How often the lag of the event loop is sampled, in seconds, 0 to disable the loop monitor.
+    SLOW_CALLBACK_THRESHOLD: How long, in seconds, a callback can block the event loop before it is logged.
+    LATENCY_TRACE_BUFFER: How many latency traces of the interactions are kept in memory, 0 to disable tracing.
+    LATENCY_TRACE_PATH: Optional JSONL file the latency traces are appended to, disabled when unset.
+    TRACE_PATH: Optional JSONL file the handled interactions and wavelink events are recorded to, disabled when unset.
+    RENDER_CACHE_SIZE: How many queue pages and now playing embeds are kept rendered per guild.
+    OUTBOX_MAX_DEPTH: How many messages can wait to be sent in a guild before the oldest is dropped.
+    OUTBOX_MERGE_WINDOW: The window, in seconds, in which identical errors are merged in a single message.
+    GUILD_STORE_PATH: The SQLite database the guild states are saved to, empty to disable persistence.
+        Every cluster shares it and only restores and writes the guilds of its own shards.
+    GUILD_STORE_FLUSH_INTERVAL: How often the changed guild states are written, in seconds.
+    GUILD_STORE_HISTORY: How many tracks of the history are saved per guild.
+    GUILD_STORE_RESTORE_CONCURRENCY: How many guilds are restored at the same time on startup.
+    SEARCH_CACHE_SIZE: The maximum number of searches kept in the search cache.
+    SEARCH_CACHE_TRACKS: The maximum number of tracks kept in the search cache.
+    SEARCH_CACHE_TTL: How long a search result is cached, in seconds.
+    SEARCH_CACHE_NEGATIVE_TTL: How long a search without results is cached, in seconds.
+    TRACK_INDEX_GUILDS: How many guilds keep the index of their played tracks /play is autocompleted from.
+    TRACK_INDEX_TRACKS: How many played tracks are indexed per guild, the least recently played are dropped.
 """
 
 from datetime import datetime
+import atexit
 import logging
 import os
+import queue
+import re
+import sys
 
-from logging.handlers import TimedRotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+from typing import Optional
 from dotenv import load_dotenv
 
 
@@ -23,33 +73,153 @@ load_dotenv()
 
 discord_token = os.getenv('DISCORD_TOKEN')
 
+log_level = os.getenv('LOG_LEVEL', 'INFO').upper()
+log_levels = dict(
+    (name.strip(), level.strip().upper())
+    for name, _, level in (entry.partition('=') for entry in os.getenv('LOG_LEVELS', '').split(','))
+    if name.strip() and level.strip()
+)
+
+shard_count = int(os.getenv('SHARD_COUNT')) if os.getenv('SHARD_COUNT') else None
+shard_ids = [int(shard) for shard in os.getenv('SHARD_IDS').split(',')] if os.getenv('SHARD_IDS') else None
+clusters = int(os.getenv('CLUSTERS', str(os.cpu_count() or 1)))
+cluster_stats_interval = float(os.getenv('CLUSTER_STATS_INTERVAL', '30'))
+
+intents_profile = os.getenv('INTENTS_PROFILE', 'minimal').lower()
+message_cache_size = int(os.getenv('MESSAGE_CACHE_SIZE', '100'))
+chunk_guilds_at_startup = os.getenv('CHUNK_GUILDS_AT_STARTUP', 'false').lower() in ('1', 'true', 'yes')
+
 lava_host = os.getenv('LAVA_HOST')
 lava_port = os.getenv('LAVA_PORT')
 lava_password = os.getenv('LAVA_PASSWORD')
 
 
-def setup_logging():
+def __parse_nodes(nodes: str) -> list[tuple[str, str]]:
+    parsed = []
+    for node in filter(None, (node.strip() for node in nodes.split(','))):
+        identifier, _, address = node.rpartition('@')
+        parsed.append((identifier or address, address))
+    return parsed
+
+
+lava_nodes = __parse_nodes(os.getenv('LAVA_NODES') or f'{lava_host}:{lava_port}')
+lava_draining_nodes = [node.strip() for node in os.getenv('LAVA_DRAINING_NODES', '').split(',') if node.strip()]
+lava_stats_interval = float(os.getenv('LAVA_STATS_INTERVAL', '30'))
+lava_health_interval = float(os.getenv('LAVA_HEALTH_INTERVAL', '2'))
+
+now_playing_edit = os.getenv('NOW_PLAYING_EDIT', 'true').lower() in ('1', 'true', 'yes')
+now_playing_max_messages = int(os.getenv('NOW_PLAYING_MAX_MESSAGES', '5'))
+
+enqueue_batch_size = int(os.getenv('ENQUEUE_BATCH_SIZE', '50'))
+prefetch_depth = int(os.getenv('PREFETCH_DEPTH', '3'))
+recommend_depth = int(os.getenv('RECOMMEND_DEPTH', '22'))
+recommend_seeds = int(os.getenv('RECOMMEND_SEEDS', '3'))
+render_cache_size = int(os.getenv('RENDER_CACHE_SIZE', '10'))
+trace_path = os.getenv('TRACE_PATH', '')
+latency_trace_buffer = int(os.getenv('LATENCY_TRACE_BUFFER', '500'))
+latency_trace_path = os.getenv('LATENCY_TRACE_PATH', '')
+loop_lag_interval = float(os.getenv('LOOP_LAG_INTERVAL', '0.1'))
+slow_callback_threshold = float(os.getenv('SLOW_CALLBACK_THRESHOLD', '0.1'))
+metrics_host = os.getenv('METRICS_HOST', '127.0.0.1')
+metrics_port = int(os.getenv('METRICS_PORT', '0'))
+
+outbox_max_depth = int(os.getenv('OUTBOX_MAX_DEPTH', '10'))
+outbox_merge_window = float(os.getenv('OUTBOX_MERGE_WINDOW', '3'))
+
+guild_store_path = os.getenv('GUILD_STORE_PATH', os.path.join('data', 'guild_state.db'))
+guild_store_flush_interval = float(os.getenv('GUILD_STORE_FLUSH_INTERVAL', '5'))
+guild_store_history = int(os.getenv('GUILD_STORE_HISTORY', '50'))
+guild_store_restore_concurrency = int(os.getenv('GUILD_STORE_RESTORE_CONCURRENCY', '25'))
+
+search_cache_size = int(os.getenv('SEARCH_CACHE_SIZE', '512'))
+search_cache_tracks = int(os.getenv('SEARCH_CACHE_TRACKS', '20000'))
+search_cache_ttl = float(os.getenv('SEARCH_CACHE_TTL', '3600'))
+search_cache_negative_ttl = float(os.getenv('SEARCH_CACHE_NEGATIVE_TTL', '60'))
+track_index_guilds = int(os.getenv('TRACK_INDEX_GUILDS', '250'))
+track_index_tracks = int(os.getenv('TRACK_INDEX_TRACKS', '200'))
+
+
+# The attributes every LogRecord has, the others come from extra= and are the structured fields.
+_RECORD_ATTRIBUTES = frozenset(logging.LogRecord('', 0, '', 0, '', (), None).__dict__) | {'message', 'asctime'}
+
+
+class KeyValueFormatter(logging.Formatter):
     """
-    Configures logging to use a TimedRotatingFileHandler.
+    Appends the structured fields of a record, passed with extra=, to its message as key=value pairs:
+        logger.info('Track ended', extra={'guild_id': 1, 'track': 'dQw4w9WgXcQ', 'event': 'track_end'})
+        -> Track ended guild_id=1 track=dQw4w9WgXcQ event=track_end
+    """
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        message = super().formatMessage(record)
+        fields = ' '.join(
+            f'{key}={value!r}' if isinstance(value, str) and (not value or ' ' in value) else f'{key}={value}'
+            for key, value in record.__dict__.items() if key not in _RECORD_ATTRIBUTES
+        )
+        return f'{message} {fields}' if fields else message
+
+
+_listener: Optional[QueueListener] = None
+
+
+def setup_logging(cluster_id: int | None = None):
+    """
+    Configures logging to write through a queue to a TimedRotatingFileHandler.
 
     Creates a log directory if it does not exist, sets up a log file with a
-    timestamp, and configures the logger to use a TimedRotatingFileHandler
-    that rotates logs at midnight and keeps backups for 30 days.
+    timestamp, and configures a TimedRotatingFileHandler that rotates logs
+    at midnight and keeps backups for 30 days.
+    The loggers only put the formatted records in a queue, the file and the console are written
+    by the thread of a QueueListener, so logging never does I/O on the event loop.
+    In cluster mode every process logs to its own file, so they never rotate the same one.
     """
+    global _listener
+
     log_dir = 'logs'
     if not os.path.exists(log_dir):
         os.makedirs(log_dir)
 
-    log_file = os.path.join(log_dir, f'{datetime.now().strftime("%Y-%m-%d")}.log')
+    cluster = f'-cluster{cluster_id}' if cluster_id is not None else ''
+    log_file = os.path.join(log_dir, f'{datetime.now().strftime("%Y-%m-%d")}{cluster}.log')
 
     logger = logging.getLogger()
-    logger.setLevel(logging.INFO)
+    logger.setLevel(log_level)
+    for name, level in log_levels.items():
+        logging.getLogger(name).setLevel(level)
+
+    # A cluster process forked from the launcher inherits its handlers, but not the thread writing them.
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+    for handler in [handler for handler in logger.handlers if isinstance(handler, QueueHandler)]:
+        logger.removeHandler(handler)
 
     handler = TimedRotatingFileHandler(log_file, when="midnight", interval=1, backupCount=30)
     handler.suffix = "%Y-%m-%d"
-    handler.extMatch = r"^\d{4}-\d{2}-\d{2}$"
+    handler.extMatch = re.compile(r"^\d{4}-\d{2}-\d{2}$")
 
     formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
     handler.setFormatter(formatter)
 
-    logger.addHandler(handler)
+    console = logging.StreamHandler(sys.stderr)
+    console.setFormatter(formatter)
+
+    records = queue.SimpleQueue()
+    queue_handler = QueueHandler(records)
+    # The message and its fields are formatted by the logger, the writer thread only adds the prefix.
+    queue_handler.setFormatter(KeyValueFormatter('%(message)s'))
+    logger.addHandler(queue_handler)
+
+    _listener = QueueListener(records, handler, console)
+    _listener.start()
+
+
+@atexit.register
+def stop_logging() -> None:
+    """
+    Writes the records still in the queue and stops the writer thread.
+
+    Registered with atexit, and called by the cluster processes that multiprocessing ends without running it.
+    """
+    if _listener is not None:
+        _listener.stop()
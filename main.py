@@ -4,27 +4,57 @@ implementation of a Discord bot using the discord.py library.
 """
 
 import logging
+import math
 import os
+import resource
+from typing import Optional
 
 from wavelink import AuthorizationFailedException, InvalidClientException, NodeException
-from discord import Intents, Object, Status, Activity, ActivityType
+from discord import Intents, MemberCacheFlags, Object, Status, Activity, ActivityType
 from discord.ext import commands
 import wavelink
 
 
-from config import setup_logging, discord_token, lava_host, lava_password, lava_port
+from config import (
+    setup_logging, discord_token, lava_nodes, lava_password, shard_count, shard_ids,
+    intents_profile, message_cache_size, chunk_guilds_at_startup, metrics_host, metrics_port
+)
+from src.cluster.cluster_stats import ClusterStats
+from src.metrics import metrics
+from src.metrics.metrics_server import MetricsServer
 
 
-class SusanoMusicBot(commands.Bot):
+class SusanoMusicBot(commands.AutoShardedBot):
     """
     A custom Discord bot class that handles bot initialization,
     node creation, cog loading, and event handling.
+
+    The bot runs the shards given by shard_ids, or every shard when None.
+    In cluster mode each process runs its own range of shards and publishes its stats through cluster_stats.
+    When METRICS_PORT is set the metrics are served on it, on the following ports for the next clusters.
     """
-    def __init__(self) -> None:
-        setup_logging()
+    def __init__(
+            self,
+            shard_ids: Optional[list[int]] = None,
+            shard_count: Optional[int] = None,
+            cluster_stats: Optional[ClusterStats] = None) -> None:
+        setup_logging(cluster_stats.cluster_id if cluster_stats else None)
+        self.cluster_stats: Optional[ClusterStats] = cluster_stats
+        self.__metrics_server: Optional[MetricsServer] = None
+        if metrics_port:
+            cluster_id = cluster_stats.cluster_id if cluster_stats else 0
+            self.__metrics_server = MetricsServer(metrics_host, metrics_port + cluster_id)
+            metrics.REGISTRY.enabled = True
+        intents, member_cache_flags = self.__create_intents(intents_profile)
         super().__init__(
             command_prefix='!',
-            intents=Intents.all(),
+            intents=intents,
+            member_cache_flags=member_cache_flags,
+            chunk_guilds_at_startup=chunk_guilds_at_startup,
+            max_messages=message_cache_size or None,
+            shard_ids=shard_ids,
+            shard_count=shard_count,
+            http_trace=metrics.http_trace() if metrics_port else None,
             status=Status.do_not_disturb,
             activity=Activity(
                 type=ActivityType.listening,
@@ -33,16 +63,59 @@ class SusanoMusicBot(commands.Bot):
         )
 
     @staticmethod
-    def __create_node() -> wavelink.Node:
+    def __create_intents(profile: str) -> tuple[Intents, MemberCacheFlags]:
+        """
+        Creates the gateway intents and the member cache policy of the profile.
+
+        The minimal profile only asks for what the music cog reads: guilds and channels, voice states,
+        and the guild message events used to tell when the now playing message is buried.
+        Only the members connected to a voice channel are cached.
+        :param profile: minimal or all.
+        :return:
+        """
+        if profile == 'all':
+            return Intents.all(), MemberCacheFlags.all()
+
+        intents = Intents.none()
+        intents.guilds = True
+        intents.voice_states = True
+        intents.guild_messages = True
+        return intents, MemberCacheFlags.from_intents(intents)
+
+    def __log_cache_report(self) -> None:
         """
-        Creates a LavaLink node using the environment variables.
+        Logs the size of the gateway cache and the peak RSS of the process.
         :return:
         """
-        return wavelink.Node(
-            uri=f'http://{lava_host}:{lava_port}',
-            password=lava_password,
+        guilds = len(self.guilds)
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        logging.info(
+            'Cache: %d guilds, %d channels, %d members, %d users, %d voice states, %d messages; '
+            'peak RSS %.1f MiB (%.1f MiB per 1000 guilds)',
+            guilds,
+            sum(len(guild.channels) for guild in self.guilds),
+            sum(len(guild.members) for guild in self.guilds),
+            len(self.users),
+            sum(len(guild.voice_states) for guild in self.guilds),
+            len(self.cached_messages),
+            rss,
+            rss * 1000 / guilds if guilds else 0
         )
 
+    @staticmethod
+    def __create_nodes() -> list[wavelink.Node]:
+        """
+        Creates the LavaLink nodes using the environment variables.
+        :return:
+        """
+        return [
+            wavelink.Node(
+                identifier=identifier,
+                uri=f'http://{address}',
+                password=lava_password,
+            ) for identifier, address in lava_nodes
+        ]
+
     async def __load_cogs(self) -> None:
         """
         Loads all cogs from the src/cogs directory.
@@ -52,7 +125,7 @@ class SusanoMusicBot(commands.Bot):
             if filename.endswith('.py') and filename != '__init__.py':
                 await self.load_extension(f'src.cogs.{filename[:-3]}')
 
-    async def __connect_nodes(self, nodes: wavelink.Node) -> None:
+    async def __connect_nodes(self, nodes: wavelink.Node | list[wavelink.Node]) -> None:
         """
         Connects the bot to the specified LavaLink nodes.
         :param nodes:
@@ -72,26 +145,60 @@ class SusanoMusicBot(commands.Bot):
         except NodeException:
             logging.error('Failed to connect to nodes')
 
+        for node in nodes:
+            if node.status is not wavelink.NodeStatus.CONNECTED:
+                logging.error('Node %s is not connected', node.identifier)
+
     async def on_ready(self) -> None:
         """
         Event handler for when the bot is ready.
         :return:
         """
-        await self.tree.sync(
-            guild=Object(id=928785387239915540)
-        )
-        logging.info('Logged in as %s', self.user)
+        if not self.cluster_stats or self.cluster_stats.cluster_id == 0:
+            await self.tree.sync(
+                guild=Object(id=928785387239915540)
+            )
+        logging.info('Logged in as %s on shards %s', self.user, self.shard_ids)
+        self.__log_cache_report()
 
     async def setup_hook(self) -> None:
         """
-        Initializes the bot by creating a node, connecting to the node, and loading cogs.
+        Initializes the bot by creating the nodes, connecting to the nodes, and loading cogs.
         :return:
         """
-        node = self.__create_node()
-        await self.__connect_nodes(node)
+        nodes = self.__create_nodes()
+        await self.__connect_nodes(nodes)
         await self.__load_cogs()
+        if self.cluster_stats:
+            self.cluster_stats.start(self)
+        if self.__metrics_server:
+            metrics.REGISTRY.add_collector(self.__collect_metrics)
+            await self.__metrics_server.start()
+
+    def __collect_metrics(self) -> None:
+        """
+        Refreshes the gauges of the gateway and of the LavaLink nodes before a scrape.
+        :return:
+        """
+        for shard_id, latency in self.latencies:
+            if not math.isnan(latency):
+                metrics.WEBSOCKET_LATENCY.set(latency, shard=shard_id)
+        metrics.GUILDS.set(len(self.guilds))
+        metrics.VOICE_CLIENTS.set(len(self.voice_clients))
+        metrics.PLAYERS.clear()
+        for identifier, node in wavelink.Pool.nodes.items():
+            metrics.PLAYERS.set(len(node.players), node=identifier)
+
+    async def close(self) -> None:
+        """
+        Stops the metrics server before closing the bot.
+        :return:
+        """
+        if self.__metrics_server:
+            await self.__metrics_server.stop()
+        await super().close()
 
 
 if __name__ == '__main__':
-    bot = SusanoMusicBot()
-    bot.run(discord_token)
+    bot = SusanoMusicBot(shard_ids=shard_ids, shard_count=shard_count)
+    bot.run(discord_token, log_handler=None)
@@ -2,14 +2,19 @@
 This module contains the voice channel check functions for the SusanoMusicBot.
 """
 
-from discord import app_commands, utils, Interaction
+from typing import Optional
 
+from discord import app_commands, Interaction
+
+from src.utils import tracing
+from src.voice.session_registry.session_registry import GuildSession
 from src.exceptions.voice_channel_exceptions import (UserNotInVoiceChannel,
     BotAlreadyInVoiceChannel, BotNotInVoiceChannel, UserNotInSameVoiceChannel)
 
 
-def __channel_connected_to(interaction: Interaction):
-    return utils.get(interaction.client.voice_clients, guild=interaction.guild)
+def __session_of(interaction: Interaction) -> Optional[GuildSession]:
+    # The cog of the command owns the session registry.
+    return interaction.command.binding.sessions.get(interaction.guild_id)
 
 
 def check_voice_channel():
@@ -18,20 +23,25 @@ def check_voice_channel():
     :return:
     """
     def predicate(interaction: Interaction) -> bool:
+        with tracing.span('check_voice_channel'):
+
+            if not interaction.user.voice:
+                raise UserNotInVoiceChannel
 
-        if not interaction.user.voice:
-            raise UserNotInVoiceChannel
+            session = __session_of(interaction)
+            voice_channel_id = session.voice_channel_id if session else None
 
-        if interaction.command.name == 'join':
-            if __channel_connected_to(interaction):
-                raise BotAlreadyInVoiceChannel
+            if interaction.command.name == 'join':
+                if voice_channel_id is not None:
+                    raise BotAlreadyInVoiceChannel
 
-        else:
-            if not __channel_connected_to(interaction):
-                raise BotNotInVoiceChannel
+            else:
+                if voice_channel_id is None:
+                    raise BotNotInVoiceChannel
 
-            if not interaction.user.voice.channel == __channel_connected_to(interaction).channel:
-                raise UserNotInSameVoiceChannel
+                user_channel = interaction.user.voice.channel
+                if user_channel is None or user_channel.id != voice_channel_id:
+                    raise UserNotInSameVoiceChannel
 
         return True
     return app_commands.check(predicate)
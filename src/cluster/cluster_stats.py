@@ -0,0 +1,73 @@
+"""
+This module contains the stats every cluster shares with the others through the launcher.
+"""
+
+import asyncio
+import logging
+from typing import Any, MutableMapping, Optional
+
+from discord.ext import commands
+
+
+logger = logging.getLogger(__name__)
+
+
+class ClusterStats:
+    """
+    Publishes the stats of this cluster in the mapping shared by the cluster launcher,
+    and reads back the stats of every cluster.
+
+    The shared mapping is a multiprocessing manager proxy, every access is a blocking
+    round trip to the launcher so it is always done off the event loop.
+    """
+    def __init__(self, cluster_id: int, shared: MutableMapping[int, dict[str, Any]], interval: float = 30) -> None:
+        self.cluster_id: int = cluster_id
+        self.__shared: MutableMapping[int, dict[str, Any]] = shared
+        self.__interval: float = interval
+        self.__task: Optional[asyncio.Task] = None
+
+    def start(self, bot: commands.Bot) -> None:
+        if self.__task is None or self.__task.done():
+            self.__task = asyncio.create_task(self.__publish_loop(bot))
+
+    def stop(self) -> None:
+        if self.__task is not None:
+            self.__task.cancel()
+            self.__task = None
+
+    def collect(self, bot: commands.Bot) -> dict[str, Any]:
+        return {
+            'shards': list(getattr(bot, 'shard_ids', None) or []),
+            'guilds': len(bot.guilds),
+            'players': len(bot.voice_clients),
+            'latency': bot.latency,
+        }
+
+    async def publish(self, bot: commands.Bot) -> None:
+        await asyncio.to_thread(self.__shared.__setitem__, self.cluster_id, self.collect(bot))
+
+    async def clusters(self) -> dict[int, dict[str, Any]]:
+        """
+        The last stats published by every cluster.
+        """
+        return await asyncio.to_thread(self.__shared.copy)
+
+    @staticmethod
+    def totals(clusters: dict[int, dict[str, Any]]) -> dict[str, int]:
+        """
+        The totals of the stats returned by clusters().
+        """
+        return {
+            'clusters': len(clusters),
+            'guilds': sum(stats['guilds'] for stats in clusters.values()),
+            'players': sum(stats['players'] for stats in clusters.values()),
+        }
+
+    async def __publish_loop(self, bot: commands.Bot) -> None:
+        await bot.wait_until_ready()
+        while True:
+            try:
+                await self.publish(bot)
+            except (OSError, EOFError) as error:
+                logger.warning('Failed to publish the stats of cluster %s: %s', self.cluster_id, error)
+            await asyncio.sleep(self.__interval)
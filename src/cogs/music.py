@@ -2,22 +2,69 @@
 This module contains the music commands and event listeners for the SusanoMusicBot.
 """
 
+import asyncio
+import logging
+import time
+from functools import partial
+from typing import Optional
+
 from discord import Object, Interaction, app_commands, ext
 from discord.ext import commands
 import wavelink
 import discord
 
+from config import (
+    now_playing_edit,
+    now_playing_max_messages,
+    search_cache_size,
+    search_cache_tracks,
+    search_cache_ttl,
+    search_cache_negative_ttl,
+    track_index_guilds,
+    track_index_tracks,
+    lava_draining_nodes,
+    lava_stats_interval,
+    lava_health_interval,
+    outbox_max_depth,
+    outbox_merge_window,
+    guild_store_path,
+    guild_store_flush_interval,
+    guild_store_history,
+    guild_store_restore_concurrency,
+    render_cache_size,
+    enqueue_batch_size,
+    prefetch_depth,
+    recommend_depth,
+    recommend_seeds,
+    trace_path,
+    latency_trace_buffer,
+    latency_trace_path,
+    loop_lag_interval,
+    slow_callback_threshold
+)
+
 from src.music_ui.player.player_view import PlayerView
 from src.music_ui.track_select.track_select_view import SelectTrackView
 
 from src.utils.utils import check_player
 from src.utils.embed import EmbedFactory
+from src.utils.outbox import Outbox
 
 from src.checks.voice_channel_check import check_voice_channel
 
+from src.search.search_cache import SearchCache
+from src.search.track_index import TrackIndex, IndexedTrack
+from src.metrics import metrics
+from src.utils.trace_recorder import TraceRecorder
+from src.utils.loop_monitor import LoopMonitor
+from src.utils import tracing
+
 from src.voice.guild_voice_state import GuildVoiceState
+from src.voice.guild_store.guild_store import GuildStore
+from src.voice.node_pool.node_pool import NodePool
+from src.voice.session_registry.session_registry import SessionRegistry
 
-from src.exceptions.player_exceptions import TrackNotFound, IllegalState
+from src.exceptions.player_exceptions import TrackNotFound, IllegalState, NoNodeAvailable
 from src.exceptions.voice_channel_exceptions import (
     UserNotInVoiceChannel,
     BotAlreadyInVoiceChannel,
@@ -25,18 +72,370 @@ from src.exceptions.voice_channel_exceptions import (
     UserNotInSameVoiceChannel
 )
 
+
+logger = logging.getLogger(__name__)
+
+
 class Music(ext.commands.Cog):
     """
     The Music cog for the SusanoMusicBot.
     """
     def __init__(self, bot: commands.Bot):
         self.__bot: commands.Bot = bot
-        self.__voice_state = GuildVoiceState()
+        self.__node_pool = NodePool(
+            refresh_interval=lava_stats_interval,
+            draining=lava_draining_nodes,
+            health_interval=lava_health_interval,
+            on_node_down=self.__on_node_down
+        )
+        self.__guild_store = GuildStore(
+            guild_store_path,
+            flush_interval=guild_store_flush_interval
+        )
+        self.__search_cache = SearchCache(
+            max_entries=search_cache_size,
+            max_tracks=search_cache_tracks,
+            ttl=search_cache_ttl,
+            negative_ttl=search_cache_negative_ttl
+        )
+        self.__track_index = TrackIndex(
+            max_guilds=track_index_guilds,
+            max_tracks=track_index_tracks
+        )
+        self.__sessions = SessionRegistry()
+        self.__voice_state = GuildVoiceState(
+            self.__node_pool,
+            self.__guild_store,
+            saved_history=guild_store_history,
+            render_cache_size=render_cache_size,
+            enqueue_batch_size=enqueue_batch_size,
+            prefetch_depth=prefetch_depth,
+            search_cache=self.__search_cache,
+            recommend_depth=recommend_depth,
+            recommend_seeds=recommend_seeds,
+            sessions=self.__sessions
+        )
+        self.__restored = False
         self.__embed = EmbedFactory()
+        self.__outbox = Outbox(
+            max_depth=outbox_max_depth,
+            merge_window=outbox_merge_window
+        )
+        self.__recorder: Optional[TraceRecorder] = TraceRecorder(trace_path) if trace_path else None
+        self.__tracer: Optional[tracing.Tracer] = tracing.Tracer(
+            buffer_size=latency_trace_buffer,
+            path=latency_trace_path
+        ) if latency_trace_buffer > 0 else None
+        self.__loop_monitor: Optional[LoopMonitor] = LoopMonitor(
+            interval=loop_lag_interval,
+            threshold=slow_callback_threshold
+        ) if loop_lag_interval > 0 else None
+
+    @property
+    def search_cache(self) -> SearchCache:
+        """
+        The search cache shared by every guild, exposed for its hit/miss/eviction counters.
+        """
+        return self.__search_cache
+
+    @property
+    def sessions(self) -> SessionRegistry:
+        """
+        The voice sessions of the guilds, the voice channel checks of the commands resolve from it.
+        """
+        return self.__sessions
+
+    @property
+    def track_index(self) -> TrackIndex:
+        """
+        The index of the tracks played in every guild, /play is autocompleted from it.
+        """
+        return self.__track_index
+
+    @property
+    def outbox(self) -> Outbox:
+        """
+        The outbox every message sent by the bot on its own goes through.
+        """
+        return self.__outbox
+
+    @property
+    def tracer(self) -> Optional[tracing.Tracer]:
+        """
+        The latency tracer of the interactions, None when disabled.
+        """
+        return self.__tracer
+
+    @property
+    def loop_monitor(self) -> Optional[LoopMonitor]:
+        """
+        The monitor of the event loop lag and of the callbacks blocking it, None when disabled.
+        """
+        return self.__loop_monitor
+
+    @property
+    def node_pool(self) -> NodePool:
+        """
+        The load-aware pool used to pick the LavaLink node of new players.
+        """
+        return self.__node_pool
+
+    async def cog_load(self) -> None:
+        if self.__loop_monitor:
+            self.__loop_monitor.start()
+        self.__node_pool.start()
+        if guild_store_path:
+            await self.__guild_store.open(self.__voice_state.snapshot)
+        if self.__recorder:
+            await self.__recorder.open()
+        if self.__tracer:
+            await self.__tracer.open()
+        metrics.REGISTRY.add_collector(self.__collect_metrics)
+
+    async def cog_unload(self) -> None:
+        metrics.REGISTRY.remove_collector(self.__collect_metrics)
+        if self.__loop_monitor:
+            self.__loop_monitor.stop()
+        self.__node_pool.stop()
+        await self.__guild_store.close()
+        if self.__recorder:
+            await self.__recorder.close()
+        if self.__tracer:
+            await self.__tracer.close()
+
+    def __collect_metrics(self) -> None:
+        for result, value in self.__search_cache.stats.as_dict().items():
+            metrics.SEARCH_CACHE.set(value, result=result)
+        for result, value in self.__outbox.stats().items():
+            metrics.OUTBOX.set(value, result=result)
+
+        stats = self.__voice_state.stats()
+        metrics.GUILD_STATES.set(stats['guilds'])
+        metrics.QUEUED_TRACKS.set(stats['queued'], queue='queue')
+        metrics.QUEUED_TRACKS.set(stats['auto_queued'], queue='auto_queue')
+        metrics.QUEUE_LENGTH_MAX.set(stats['queue_max'])
+        metrics.LIVE_VIEWS.set(stats['live_views'])
+        metrics.RENDER_CACHE.set(stats['render_hits'], result='hits')
+        metrics.RENDER_CACHE.set(stats['render_misses'], result='misses')
+        metrics.PREFETCHER.set(stats['prefetch_resolved'], result='resolved')
+        metrics.PREFETCHER.set(stats['prefetch_dropped'], result='dropped')
+        metrics.RECOMMENDER.set(stats['recommended'], result='added')
+        metrics.RECOMMENDER.set(stats['recommend_duplicates'], result='duplicates')
+        for kind, value in self.__track_index.stats().items():
+            metrics.TRACK_INDEX.set(value, kind=kind)
+
+        if self.__loop_monitor:
+            for quantile in (50, 99):
+                metrics.LOOP_LAG.set(self.__loop_monitor.percentile(quantile), quantile=quantile / 100)
+
+    @staticmethod
+    def __observe_command(interaction: Interaction, status: str) -> None:
+        if interaction.command is not None:
+            latency = (discord.utils.utcnow() - interaction.created_at).total_seconds()
+            metrics.APP_COMMAND_LATENCY.observe(latency, command=interaction.command.qualified_name, status=status)
+
+    async def interaction_check(self, interaction: Interaction) -> bool:
+        # Run before the checks of every command, the trace covers them.
+        if self.__tracer:
+            self.__tracer.start(interaction)
+        return True
+
+    async def cog_app_command_error(self, interaction: Interaction, error: app_commands.AppCommandError) -> None:
+        self.__observe_command(interaction, 'error')
+        if self.__tracer and (trace := tracing.current()):
+            self.__tracer.finish(trace, 'error')
+
+    @commands.Cog.listener()
+    async def on_app_command_completion(self, interaction: Interaction, command: app_commands.Command) -> None:
+        """
+        Event listener for the app command completion event, measures the latency of the command.
+
+        Args:
+            interaction:
+            command:
+
+        Returns:
+
+        """
+        self.__observe_command(interaction, 'ok')
+        if self.__tracer:
+            self.__tracer.release()
+
+    def __record(self, event: str, player: Optional[wavelink.Player], **data) -> None:
+        metrics.WAVELINK_EVENTS.inc(event=event)
+        if self.__recorder:
+            self.__recorder.event(event, player.guild.id if player and player.guild else None, **data)
+
+    @commands.Cog.listener()
+    async def on_interaction(self, interaction: Interaction) -> None:
+        """
+        Event listener for the interaction event, records the interaction when tracing is enabled.
+
+        Args:
+            interaction:
+
+        Returns:
+
+        """
+        if not self.__recorder:
+            return
+
+        component = None
+        if interaction.type is discord.InteractionType.component and interaction.guild_id:
+            custom_id = (interaction.data or {}).get('custom_id')
+            try:
+                view = self.__voice_state.get_last_view(interaction.guild_id)
+            except IllegalState:
+                view = None
+            item = next((child for child in view.children if getattr(child, 'custom_id', None) == custom_id),
+                        None) if view else None
+            if item is not None:
+                component = type(item).__name__
+            elif (interaction.data or {}).get('component_type') == discord.ComponentType.select.value:
+                # The search results dropdown is the only select of the bot.
+                component = 'Tracks'
+
+        self.__recorder.interaction(interaction, component)
+
+    @commands.Cog.listener()
+    async def on_ready(self) -> None:
+        """
+        Event listener for the ready event, rejoins the voice channels saved before the restart.
+
+        Returns:
+
+        """
+        if self.__restored or not self.__guild_store.is_open:
+            return
+        self.__restored = True
+
+        start = time.perf_counter()
+        snapshots = [
+            snapshot for snapshot in await self.__guild_store.load() if self.__owns_guild(snapshot['guild_id'])
+        ]
+        loaded = time.perf_counter()
+
+        semaphore = asyncio.Semaphore(guild_store_restore_concurrency)
+
+        async def restore(snapshot) -> bool:
+            async with semaphore:
+                try:
+                    restored = await self.__voice_state.restore(self.__bot, snapshot)
+                except Exception as error:
+                    logger.error('Failed to restore guild %s: %s', snapshot['guild_id'], error)
+                    restored = False
+            if not restored:
+                self.__guild_store.delete(snapshot['guild_id'])
+            return restored
+
+        results = await asyncio.gather(*(restore(snapshot) for snapshot in snapshots))
+        logger.info(
+            'Restored %d/%d guilds in %.2fs (load %.3fs)',
+            sum(results), len(snapshots), time.perf_counter() - start, loaded - start
+        )
+
+    def __owns_guild(self, guild_id: int) -> bool:
+        """
+        Whether the guild belongs to one of the shards run by this process.
+        In cluster mode every process shares the store but only restores its own guilds.
+        """
+        shard_ids = getattr(self.__bot, 'shard_ids', None)
+        if not shard_ids or not self.__bot.shard_count:
+            return True
+        return (guild_id >> 22) % self.__bot.shard_count in shard_ids
+
+    async def __get_channel(self, guild_id: int) -> discord.abc.Messageable:
+        """
+        Get the text channel bound to the guild, resolving it from the gateway cache
+        and falling back to the REST API only when it is not cached.
+
+        Args:
+            guild_id (int): The guild id.
+
+        Returns:
+            discord.abc.Messageable: The text channel.
+        """
+        if channel := self.__voice_state.get_channel(guild_id):
+            return channel
+
+        channel_id = self.__voice_state.get_channel_id(guild_id)
+        channel = self.__bot.get_channel(channel_id) or await self.__bot.fetch_channel(channel_id)
+        self.__voice_state.set_channel(guild_id, channel)
+
+        return channel
+
+    @commands.Cog.listener()
+    async def on_voice_state_update(self, member: discord.Member, before: discord.VoiceState,
+                                    after: discord.VoiceState) -> None:
+        """
+        Event listener for the voice state update event, keeps the session of the guild in sync with the
+        voice client of the bot when it joins, is moved or is disconnected.
+
+        Args:
+            member:
+            before:
+            after:
+
+        Returns:
+
+        """
+        if member.id == self.__bot.user.id:
+            self.__sessions.voice_state_update(
+                member.guild.id,
+                after.channel.id if after.channel else None,
+                member.guild.voice_client
+            )
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel) -> None:
+        """
+        Event listener for the guild channel delete event.
+
+        Args:
+            channel:
+
+        Returns:
+
+        """
+        self.__voice_state.invalidate_channel(channel.guild.id, channel.id)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_update(self, before: discord.abc.GuildChannel, after: discord.abc.GuildChannel) -> None:
+        """
+        Event listener for the guild channel update event.
+
+        Args:
+            before:
+            after:
+
+        Returns:
+
+        """
+        if before.overwrites != after.overwrites or before.category_id != after.category_id:
+            self.__voice_state.invalidate_channel(after.guild.id, after.id)
+
+    @commands.Cog.listener()
+    async def on_guild_role_update(self, before: discord.Role, after: discord.Role) -> None:
+        """
+        Event listener for the guild role update event.
+
+        Args:
+            before:
+            after:
+
+        Returns:
+
+        """
+        if before.permissions != after.permissions:
+            self.__voice_state.invalidate_channel(after.guild.id)
 
     async def __clear_last_view(self, _id: int):
-        if last_view := self.__voice_state.get_last_view(_id):
-            if last_mess := self.__voice_state.get_last_mess(_id):
+        await self.__strip_view(self.__voice_state.get_last_view(_id), self.__voice_state.get_last_mess(_id))
+
+    @staticmethod
+    async def __strip_view(last_view: discord.ui.View, last_mess: discord.Message):
+        if last_view:
+            if last_mess:
                 await last_mess.edit(view=None)
             last_view.stop()
 
@@ -51,10 +450,35 @@ class Music(ext.commands.Cog):
         Returns:
 
         """
-        print(f"Websocket chiuso: {payload.code} {payload.reason}")
-        if check_player(payload.player):
+        self.__record('websocket_closed', payload.player, code=payload.code, reason=payload.reason)
+        logger.warning('Voice websocket closed', extra={
+            'event': 'websocket_closed',
+            'guild_id': payload.player.guild.id if payload.player and payload.player.guild else None,
+            'code': payload.code,
+            'reason': payload.reason,
+        })
+        # The old player of a guild moved to another node closes its voice websocket too.
+        if check_player(payload.player) and not self.__voice_state.is_migrating(payload.player.guild.id):
+            self.__outbox.discard(payload.player.guild.id)
+            if self.__tracer:
+                self.__tracer.discard(payload.player.guild.id)
             await self.__voice_state.guild_clean_up(payload.player.guild.id)
 
+    async def __on_node_down(self, node: wavelink.Node) -> None:
+        """
+        Called by the node pool when a node loses its websocket or cannot be reached,
+        moves the players of the node to the surviving nodes.
+
+        Args:
+            node (wavelink.Node): The node that went down.
+
+        Returns:
+            None
+        """
+        self.__record('node_down', None, node=node.identifier)
+        logger.warning('Node down', extra={'event': 'node_down', 'node': node.identifier})
+        await self.__voice_state.failover(node)
+
     @commands.Cog.listener()
     async def on_wavelink_node_ready(self, payload: wavelink.NodeReadyEventPayload) -> None:
         """
@@ -66,7 +490,10 @@ class Music(ext.commands.Cog):
         Returns:
 
         """
-        print(f"Nodo {payload.node!r} is ready!")
+        self.__record('node_ready', None, node=payload.node.identifier, resumed=payload.resumed)
+        logger.info('Node ready', extra={
+            'event': 'node_ready', 'node': payload.node.identifier, 'resumed': payload.resumed
+        })
 
     @commands.Cog.listener()
     async def on_wavelink_track_stuck(self, payload: wavelink.TrackStuckEventPayload) -> None:
@@ -79,8 +506,14 @@ class Music(ext.commands.Cog):
         Returns:
 
         """
+        self.__record('track_stuck', payload.player, track=payload.track.identifier, threshold=payload.threshold)
         if check_player(payload.player):
-            print("Track stuck:", payload.threshold, payload.track.title)
+            logger.warning('Track stuck', extra={
+                'event': 'track_stuck',
+                'guild_id': payload.player.guild.id,
+                'track': payload.track.identifier,
+                'threshold': payload.threshold,
+            })
             await self.__send_error_events(
                 payload.player.guild.id,
                 'Canzone bloccata, passando alla prossima',
@@ -98,8 +531,15 @@ class Music(ext.commands.Cog):
         Returns:
 
         """
+        self.__record('track_exception', payload.player, track=payload.track.identifier)
         if check_player(payload.player):
-            print("Track exception:", payload.exception, payload.track.title)
+            logger.error('Track exception', extra={
+                'event': 'track_exception',
+                'guild_id': payload.player.guild.id,
+                'track': payload.track.identifier,
+                'error': payload.exception.get('message'),
+                'severity': payload.exception.get('severity'),
+            })
             await self.__send_error_events(
                 payload.player.guild.id,
                 'Errore durante la riproduzione della canzone, passando alla prossima',
@@ -117,19 +557,118 @@ class Music(ext.commands.Cog):
         Returns:
 
         """
+        self.__record('track_start', payload.player, track=payload.track.identifier)
         if check_player(payload.player):
+            gap = self.__voice_state.track_started(payload.player.guild.id)
+            if gap is not None:
+                metrics.TRANSITION_GAP.observe(gap)
+                logger.debug('Transition gap', extra={
+                    'event': 'track_start',
+                    'guild_id': payload.player.guild.id,
+                    'track': payload.track.identifier,
+                    'latency': round(gap, 3),
+                })
+            self.__voice_state.mark_changed(payload.player.guild.id)
+            self.__track_index.add(
+                payload.player.guild.id,
+                IndexedTrack(payload.track.title, payload.track.author, payload.track.uri)
+            )
+            trace = self.__tracer.track_started(payload.player.guild.id) if self.__tracer else None
+            self.__outbox.now_playing(
+                payload.player.guild.id,
+                partial(self.__show_now_playing, payload.player.guild.id, payload.track, trace)
+            )
 
-            await self.__clear_last_view(payload.player.guild.id)
+    async def __show_now_playing(self, guild_id: int, track: wavelink.Playable,
+                                 trace: Optional[tracing.Trace] = None) -> None:
+        """
+        Show the now playing message of the guild, run by the outbox.
 
-            channel: discord.TextChannel = await self.__bot.fetch_channel(
-                self.__voice_state.get_channel_id(payload.player.guild.id)
-            )
+        Args:
+            guild_id (int): The guild id.
+            track (wavelink.Playable): The track that started.
+            trace (tracing.Trace): The trace of the command that started the track, finished once the message is shown.
 
-            view = PlayerView(self.__voice_state, payload.player.guild.id)
-            mess = await channel.send(embed=self.__embed.now_playing(payload.track), view=view)
+        Returns:
+            None
+        """
+        with tracing.resumed(trace), tracing.span('now_playing'):
+            if now_playing_edit and await self.__edit_now_playing(guild_id, track):
+                return
+
+            await self.__clear_last_view(guild_id)
 
-            self.__voice_state.set_last_mess(payload.player.guild.id, mess)
-            self.__voice_state.set_last_view(payload.player.guild.id, view)
+            channel = await self.__get_channel(guild_id)
+
+            view = PlayerView(self.__voice_state, guild_id)
+            mess = await channel.send(embed=self.__now_playing_embed(guild_id, track), view=view)
+
+            self.__voice_state.set_last_mess(guild_id, mess)
+            self.__voice_state.set_last_view(guild_id, view)
+
+    def __now_playing_embed(self, guild_id: int, track: wavelink.Playable) -> discord.Embed:
+        return self.__voice_state.get_render_cache(guild_id).now_playing(
+            track,
+            lambda: self.__embed.now_playing(track)
+        )
+
+    async def __edit_now_playing(self, guild_id: int, track: wavelink.Playable) -> bool:
+        """
+        Edit the now playing message of the guild in place, reusing its view.
+
+        Args:
+            guild_id (int): The guild id.
+            track (wavelink.Playable): The track that started.
+
+        Returns:
+            bool: False if the message is gone or buried by newer messages and must be sent again.
+        """
+        last_mess = self.__voice_state.get_last_mess(guild_id)
+        if not last_mess or self.__voice_state.is_last_mess_buried(guild_id, now_playing_max_messages):
+            return False
+
+        view = self.__voice_state.get_last_view(guild_id)
+        if view and not view.is_finished():
+            view.refresh()
+        else:
+            view = PlayerView(self.__voice_state, guild_id)
+
+        try:
+            await last_mess.edit(embed=self.__now_playing_embed(guild_id, track), view=view)
+        except discord.NotFound:
+            self.__voice_state.message_deleted(guild_id, last_mess.id)
+            return False
+
+        self.__voice_state.set_last_view(guild_id, view)
+        return True
+
+    @commands.Cog.listener()
+    async def on_message(self, message: discord.Message) -> None:
+        """
+        Event listener for the message event, used to know when the now playing message has scrolled up.
+
+        Args:
+            message:
+
+        Returns:
+
+        """
+        if message.guild and message.author != self.__bot.user:
+            self.__voice_state.message_sent(message.guild.id, message.channel.id)
+
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent) -> None:
+        """
+        Event listener for the raw message delete event.
+
+        Args:
+            payload:
+
+        Returns:
+
+        """
+        if payload.guild_id:
+            self.__voice_state.message_deleted(payload.guild_id, payload.message_id)
 
 
     @commands.Cog.listener()
@@ -143,10 +682,33 @@ class Music(ext.commands.Cog):
         Returns:
 
         """
+        self.__record('track_end', payload.player, track=payload.track.identifier, reason=payload.reason)
         if check_player(payload.player):
-            print('Fine canzone', payload.track.title, 'Motivo:', payload.reason)
+            logger.info('Track ended', extra={
+                'event': 'track_end',
+                'guild_id': payload.player.guild.id,
+                'track': payload.track.identifier,
+                'reason': payload.reason,
+            })
+            self.__voice_state.track_ended(payload.player.guild.id)
+            self.__voice_state.mark_changed(payload.player.guild.id)
             #await self.__voice_state.play_next(payload.player.guild.id)
 
+    @commands.Cog.listener()
+    async def on_wavelink_player_update(self, payload: wavelink.PlayerUpdateEventPayload) -> None:
+        """
+        Event listener for the wavelink player update event, keeps the saved position up to date.
+
+        Args:
+            payload:
+
+        Returns:
+
+        """
+        self.__record('player_update', payload.player, position=payload.position)
+        if check_player(payload.player):
+            self.__voice_state.mark_position(payload.player.guild.id, payload.position)
+
     @commands.Cog.listener()
     async def on_wavelink_inactive_player(self, player: wavelink.Player):
         """
@@ -158,18 +720,27 @@ class Music(ext.commands.Cog):
         Returns:
 
         """
+        self.__record('inactive_player', player)
         if check_player(player):
-
-            await self.__clear_last_view(player.guild.id)
-
-            channel: discord.TextChannel = await self.__bot.fetch_channel(
-                self.__voice_state.get_channel_id(player.guild.id)
+            guild_id = player.guild.id
+
+            channel = await self.__get_channel(guild_id)
+            self.__outbox.now_playing(
+                guild_id,
+                partial(
+                    self.__strip_view,
+                    self.__voice_state.get_last_view(guild_id),
+                    self.__voice_state.get_last_mess(guild_id)
+                )
             )
-            await channel.send(
-                embed=self.__embed.send('Bot disconnesso per inattività'),
+            self.__outbox.send(
+                guild_id,
+                channel,
+                self.__embed.send('Bot disconnesso per inattività'),
                 delete_after=5
             )
-            await self.__voice_state.inactive_player(player.guild.id)
+            self.__outbox.close(guild_id)
+            await self.__voice_state.inactive_player(guild_id)
 
     def __send_message(self, interaction: Interaction, message: str, ephemeral: bool = False, delete_after: int = 0):
         return interaction.response.send_message(
@@ -180,7 +751,8 @@ class Music(ext.commands.Cog):
 
     async def __send_error_events(self, guild_id: int, mess: str) -> None:
         """
-        Send an error message to the channel.
+        Send an error message to the channel through the outbox,
+        identical errors close in time are merged in a single message.
 
         Args:
             guild_id (int): The guild id.
@@ -189,14 +761,9 @@ class Music(ext.commands.Cog):
         Returns:
             None
         """
-        channel: discord.TextChannel = await self.__bot.fetch_channel(
-            self.__voice_state.get_channel_id(guild_id)
-        )
+        channel = await self.__get_channel(guild_id)
 
-        await channel.send(
-            embed=self.__embed.error(mess),
-            delete_after=5
-        )
+        self.__outbox.error(guild_id, channel, mess)
 
     # --- --- --- --- --- --- #
     #                         #
@@ -250,6 +817,9 @@ class Music(ext.commands.Cog):
         Returns:
 
         """
+        self.__outbox.discard(interaction.guild_id)
+        if self.__tracer:
+            self.__tracer.discard(interaction.guild_id)
         await self.__voice_state.leave(interaction)
         await self.__send_message(
             interaction,
@@ -276,7 +846,8 @@ class Music(ext.commands.Cog):
         Returns:
 
         """
-        tracks: wavelink.Search = await wavelink.Playable.search(search)
+        with tracing.span('search'):
+            tracks: wavelink.Search = await self.__search_cache.search(search)
         if not tracks:
             raise TrackNotFound
 
@@ -289,6 +860,7 @@ class Music(ext.commands.Cog):
                     self.__voice_state,
                     interaction,
                     tracks,
+                    tracing.suspend('select'),
                 ),
                 ephemeral=True
             )
@@ -298,6 +870,117 @@ class Music(ext.commands.Cog):
                 tracks,
             )
 
+    @play.autocomplete('search')
+    async def play_autocomplete(self, interaction: Interaction, current: str) -> list[app_commands.Choice[str]]:
+        """
+        Autocomplete of the search of /play with the tracks played in the guild, without searching on LavaLink.
+        The guilds not indexed yet, after a restart or an eviction, are indexed from their history.
+
+        Args:
+            interaction:
+            current:
+
+        Returns:
+
+        """
+        start = time.perf_counter()
+        guild_id = interaction.guild_id
+        if guild_id is None:
+            return []
+        if guild_id not in self.__track_index:
+            if not (played := self.__voice_state.played_tracks(guild_id, track_index_tracks)):
+                return []
+            self.__track_index.add_all(guild_id, played)
+
+        choices = []
+        for track in self.__track_index.search(guild_id, current):
+            name = f'{track.title} - {track.author}'[:100]
+            # A url is searched as it is, so the track is played without the selection dropdown.
+            value = track.uri if track.uri and len(track.uri) <= 100 else f'{track.title} {track.author}'[:100]
+            choices.append(app_commands.Choice(name=name, value=value))
+        metrics.AUTOCOMPLETE_LATENCY.observe(time.perf_counter() - start)
+        return choices
+
+    @app_commands.command(
+        name='lag',
+        description='Mostra il lag del bot e gli ultimi blocchi'
+    )
+    @app_commands.default_permissions(administrator=True)
+    async def lag(self, interaction: Interaction):
+        """
+        Debug command showing the lag of the event loop and the last callbacks that blocked it.
+
+        Args:
+            interaction:
+
+        Returns:
+
+        """
+        if not self.__loop_monitor:
+            await self.__send_error(interaction, 'Il monitor del lag è disabilitato')
+            return
+
+        await interaction.response.send_message(
+            embed=self.__embed.loop_lag(self.__loop_monitor.stats(), self.__loop_monitor.threshold),
+            ephemeral=True
+        )
+
+    @app_commands.command(
+        name='traces',
+        description='Mostra la latenza delle fasi dei comandi'
+    )
+    @app_commands.default_permissions(administrator=True)
+    async def traces(self, interaction: Interaction):
+        """
+        Debug command showing the p50 and p99 of every traced stage of the last commands.
+
+        Args:
+            interaction:
+
+        Returns:
+
+        """
+        if not self.__tracer:
+            await self.__send_error(interaction, 'Il tracciamento è disabilitato')
+            return
+
+        await interaction.response.send_message(
+            embed=self.__embed.trace_summary(self.__tracer.summary()),
+            ephemeral=True
+        )
+
+    @app_commands.command(
+        name='cluster',
+        description='Mostra i server e i player di ogni cluster'
+    )
+    @app_commands.default_permissions(administrator=True)
+    async def cluster(self, interaction: Interaction):
+        """
+        Debug command showing the stats published by every cluster and their totals.
+
+        Args:
+            interaction:
+
+        Returns:
+
+        """
+        cluster_stats = getattr(self.__bot, 'cluster_stats', None)
+        if not cluster_stats:
+            await self.__send_error(interaction, 'Il bot non è avviato in cluster')
+            return
+
+        try:
+            clusters = await cluster_stats.clusters()
+        except (OSError, EOFError) as error:
+            logger.warning('Failed to read the stats of the clusters: %s', error)
+            await self.__send_error(interaction, 'Le statistiche dei cluster non sono disponibili')
+            return
+
+        await interaction.response.send_message(
+            embed=self.__embed.clusters(clusters, cluster_stats.totals(clusters)),
+            ephemeral=True
+        )
+
     # --- CHECKS --- #
 
     def __send_error(self, interaction: Interaction, error: str):
@@ -349,7 +1032,9 @@ class Music(ext.commands.Cog):
         elif isinstance(error, TrackNotFound):
             await self.__send_error(interaction, 'Canzone non trovata')
         else:
-            print(error)
+            logger.error('Command failed', exc_info=error, extra={
+                'command': interaction.command.name, 'guild_id': interaction.guild_id
+            })
             await self.__send_error(interaction, 'Errore sconosciuto')
 
     @leave.error
@@ -367,7 +1052,9 @@ class Music(ext.commands.Cog):
         if not await self.__check_channel(interaction, error):
             pass
         else:
-            print(error)
+            logger.error('Command failed', exc_info=error, extra={
+                'command': interaction.command.name, 'guild_id': interaction.guild_id
+            })
             await self.__send_error(interaction, 'Errore sconosciuto')
 
     @join.error
@@ -386,8 +1073,12 @@ class Music(ext.commands.Cog):
             await self.__send_error(interaction, 'Devi essere connesso a un canale vocale')
         elif isinstance(error, BotAlreadyInVoiceChannel):
             await self.__send_error(interaction, 'Il bot è già connesso a un canale vocale')
+        elif isinstance(error, NoNodeAvailable):
+            await self.__send_error(interaction, 'Nessun server musicale disponibile, riprova più tardi')
         else:
-            print(error)
+            logger.error('Command failed', exc_info=error, extra={
+                'command': interaction.command.name, 'guild_id': interaction.guild_id
+            })
             await self.__send_error(interaction, 'Errore sconosciuto')
 
 
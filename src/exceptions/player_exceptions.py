@@ -9,6 +9,10 @@ class IllegalState(AppCommandError):
     pass
 
 
+class NoNodeAvailable(AppCommandError):
+    pass
+
+
 class AlreadyPaused(AppCommandError):
     pass
 
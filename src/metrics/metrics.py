@@ -0,0 +1,251 @@
+"""
+This module contains the metrics of the bot, rendered in the Prometheus text format by the metrics server.
+
+The metrics are module level, like the default registry of the Prometheus client: the code being
+measured updates them directly, and the collectors registered with add_collector refresh the gauges
+right before every scrape. The totals kept by the caches and queues themselves are exported as gauges
+by the collectors, since they are read rather than incremented.
+
+Counters and histograms record nothing until the registry is enabled, which the bot does only
+when it serves the metrics (METRICS_PORT is set).
+"""
+
+import bisect
+import logging
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+from typing import Callable, Iterator, Optional
+
+import aiohttp
+
+
+logger = logging.getLogger(__name__)
+
+
+LabelValues = tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind: str = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> None:
+        self.name: str = name
+        self.documentation: str = documentation
+        self.labels: tuple[str, ...] = labels
+        REGISTRY.register(self)
+
+    def _key(self, labels: dict[str, object]) -> LabelValues:
+        if labels.keys() != set(self.labels):
+            raise ValueError(f'{self.name} expects the labels {self.labels}, got {tuple(labels)}')
+        return tuple(str(labels[label]) for label in self.labels)
+
+    def _label_text(self, values: LabelValues, extra: Optional[tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.labels, values)) + ([extra] if extra else [])
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{label}="{_escape(value)}"' for label, value in pairs) + '}'
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}', *self.samples()]
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> None:
+        super().__init__(name, documentation, labels)
+        self.__values: dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: object) -> None:
+        if not REGISTRY.enabled:
+            return
+        key = self._key(labels)
+        self.__values[key] = self.__values.get(key, 0) + amount
+
+    def samples(self) -> Iterator[str]:
+        for key, value in self.__values.items():
+            yield f'{self.name}{self._label_text(key)} {_format(value)}'
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> None:
+        super().__init__(name, documentation, labels)
+        self.__values: dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels: object) -> None:
+        self.__values[self._key(labels)] = value
+
+    def clear(self) -> None:
+        self.__values.clear()
+
+    def samples(self) -> Iterator[str]:
+        for key, value in self.__values.items():
+            yield f'{self.name}{self._label_text(key)} {_format(value)}'
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        super().__init__(name, documentation, labels)
+        self.buckets: tuple[float, ...] = tuple(sorted(buckets)) + (float('inf'),)
+        # Per label values: the count of every bucket (not cumulative), the sum and the count.
+        self.__values: dict[LabelValues, tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, **labels: object) -> None:
+        if not REGISTRY.enabled:
+            return
+        key = self._key(labels)
+        if (entry := self.__values.get(key)) is None:
+            entry = self.__values[key] = ([0] * len(self.buckets), [0.0, 0])
+        counts, totals = entry
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        totals[0] += value
+        totals[1] += 1
+
+    @contextmanager
+    def time(self, **labels: object) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> Iterator[str]:
+        for key, (counts, (total, count)) in self.__values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f'{self.name}_bucket{self._label_text(key, ("le", _format(bound)))} {cumulative}'
+            yield f'{self.name}_sum{self._label_text(key)} {_format(total)}'
+            yield f'{self.name}_count{self._label_text(key)} {count}'
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.__metrics: dict[str, Metric] = {}
+        self.__collectors: list[Callable[[], None]] = []
+        self.enabled: bool = False
+
+    def register(self, metric: Metric) -> None:
+        if metric.name in self.__metrics:
+            raise ValueError(f'The metric {metric.name} is already registered')
+        self.__metrics[metric.name] = metric
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """
+        Register a function refreshing some metrics, called before every scrape.
+        """
+        self.__collectors.append(collector)
+
+    def remove_collector(self, collector: Callable[[], None]) -> None:
+        if collector in self.__collectors:
+            self.__collectors.remove(collector)
+
+    def render(self) -> str:
+        for collector in self.__collectors:
+            try:
+                collector()
+            except Exception as error:
+                logger.error('Metrics collector %r failed: %s', collector, error)
+        return '\n'.join(metric.render() for metric in self.__metrics.values()) + '\n'
+
+
+REGISTRY = Registry()
+
+# --- Interactions and Discord --- #
+
+APP_COMMAND_LATENCY = Histogram(
+    'susano_app_command_latency_seconds',
+    'Time from the creation of an app command interaction to the end of its handling.',
+    ('command', 'status')
+)
+INTERACTION_STAGE_LATENCY = Histogram(
+    'susano_interaction_stage_seconds', 'Duration of the traced stages of the interactions, up to the first audio.',
+    ('stage',)
+)
+DISCORD_REST_LATENCY = Histogram(
+    'susano_discord_rest_latency_seconds', 'Latency of the Discord REST calls.', ('method', 'status')
+)
+DISCORD_RATE_LIMITED = Counter(
+    'susano_discord_rate_limited_total', 'Discord REST calls answered with 429.', ('method',)
+)
+WEBSOCKET_LATENCY = Gauge('susano_websocket_latency_seconds', 'Latency of the gateway websocket.', ('shard',))
+GUILDS = Gauge('susano_guilds', 'Guilds the bot is in.')
+VOICE_CLIENTS = Gauge('susano_voice_clients', 'Voice clients connected.')
+
+# --- Event loop --- #
+
+LOOP_LAG = Gauge('susano_event_loop_lag_seconds', 'Scheduling delay of the event loop.', ('quantile',))
+SLOW_CALLBACKS = Counter('susano_slow_callbacks_total', 'Callbacks that blocked the event loop over the threshold.')
+
+# --- Lavalink --- #
+
+SEARCH_LATENCY = Histogram('susano_search_latency_seconds', 'Latency of wavelink.Playable.search.', ('outcome',))
+WAVELINK_EVENTS = Counter('susano_wavelink_events_total', 'wavelink events handled by the music cog.', ('event',))
+PLAYERS = Gauge('susano_players', 'Players connected to every LavaLink node.', ('node',))
+TRANSITION_GAP = Histogram(
+    'susano_transition_gap_seconds', 'Time between the end of a track and the start of the next one.',
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5)
+)
+
+# --- Music state --- #
+
+GUILD_STATES = Gauge('susano_guild_states', 'Guilds with a music state.')
+QUEUED_TRACKS = Gauge('susano_queued_tracks', 'Tracks waiting in the queues of every guild.', ('queue',))
+QUEUE_LENGTH_MAX = Gauge('susano_queue_length_max', 'Length of the longest queue.')
+LIVE_VIEWS = Gauge('susano_player_views', 'Player views still listening for interactions.')
+SEARCH_CACHE = Gauge('susano_search_cache_events', 'Search cache lookups and removals since the start.', ('result',))
+OUTBOX = Gauge('susano_outbox_messages', 'Outbox messages dropped, merged or superseded since the start.',
+               ('result',))
+RENDER_CACHE = Gauge('susano_render_cache_lookups', 'Render cache lookups of the connected guilds.', ('result',))
+PREFETCHER = Gauge('susano_prefetcher_tracks', 'Queued tracks of the connected guilds resolved again or dropped '
+                   'by the prefetcher.', ('result',))
+RECOMMENDER = Gauge('susano_recommender_tracks', 'Recommendations of the connected guilds queued or skipped '
+                    'as duplicates.', ('result',))
+TRACK_INDEX = Gauge('susano_track_index', 'Guilds and played tracks in the /play autocomplete index.', ('kind',))
+AUTOCOMPLETE_LATENCY = Histogram(
+    'susano_autocomplete_latency_seconds', 'Time to build the /play autocomplete choices.',
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05)
+)
+
+
+def http_trace() -> aiohttp.TraceConfig:
+    """
+    The trace config measuring the Discord REST calls of discord.py, passed as http_trace to the bot.
+    """
+    async def on_request_start(session, context: SimpleNamespace, params: aiohttp.TraceRequestStartParams) -> None:
+        context.start = time.perf_counter()
+
+    async def on_request_end(session, context: SimpleNamespace, params: aiohttp.TraceRequestEndParams) -> None:
+        status = params.response.status
+        DISCORD_REST_LATENCY.observe(
+            time.perf_counter() - context.start, method=params.method, status=f'{status // 100}xx'
+        )
+        if status == 429:
+            DISCORD_RATE_LIMITED.inc(method=params.method)
+
+    trace = aiohttp.TraceConfig()
+    trace.on_request_start.append(on_request_start)
+    trace.on_request_end.append(on_request_end)
+    return trace
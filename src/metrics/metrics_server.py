@@ -0,0 +1,42 @@
+"""
+This module contains the HTTP server exposing the metrics of the bot to Prometheus.
+"""
+
+import logging
+from typing import Optional
+
+from aiohttp import web
+
+from src.metrics.metrics import REGISTRY, Registry
+
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsServer:
+    """
+    Serves /metrics from the event loop of the bot, the metrics are rendered on every scrape.
+    """
+    def __init__(self, host: str, port: int, registry: Registry = REGISTRY) -> None:
+        self.__host: str = host
+        self.__port: int = port
+        self.__registry: Registry = registry
+        self.__runner: Optional[web.AppRunner] = None
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get('/metrics', self.__metrics)
+
+        self.__runner = web.AppRunner(app, access_log=None)
+        await self.__runner.setup()
+        await web.TCPSite(self.__runner, self.__host, self.__port).start()
+        logger.info('Serving the metrics on %s:%d/metrics', self.__host, self.__port)
+
+    async def stop(self) -> None:
+        if self.__runner is not None:
+            await self.__runner.cleanup()
+            self.__runner = None
+
+    async def __metrics(self, request: web.Request) -> web.Response:
+        return web.Response(text=self.__registry.render(), content_type='text/plain', charset='utf-8',
+                            headers={'X-Content-Type-Options': 'nosniff'})
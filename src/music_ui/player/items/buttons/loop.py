@@ -9,6 +9,7 @@ from src.voice.guild_voice_state import GuildVoiceState
 class Loop(Button):
     def __init__(self, voice_state: GuildVoiceState, guild_id: int, row: int):
         self.__voice_state = voice_state
+        self.__guild_id = guild_id
         queue_mode = self.__voice_state.get_queue_mode(guild_id)
 
         super().__init__(
@@ -17,10 +18,17 @@ class Loop(Button):
             row=row
         )
 
+    def refresh(self):
+        self.__show(self.__voice_state.get_queue_mode(self.__guild_id))
+
     async def callback(self, interaction: Interaction):
 
         mode = self.__voice_state.toggle_loop(interaction)
+        self.__show(mode)
+
+        await interaction.response.edit_message(view=self.view)
 
+    def __show(self, mode: wavelink.QueueMode):
         if mode == wavelink.QueueMode.loop_all:
             self.emoji = "🔁"
             self.style = discord.ButtonStyle.success
@@ -30,5 +38,3 @@ class Loop(Button):
         else:
             self.emoji = "🔁"
             self.style = discord.ButtonStyle.secondary
-
-        await interaction.response.edit_message(view=self.view)
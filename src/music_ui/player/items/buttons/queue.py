@@ -1,12 +1,12 @@
 from math import ceil
 
 import discord
-import wavelink
 from discord import Interaction
 from discord.ui import Button
 
 from src.music_ui.queue.queue_view import QueueView
 from src.utils.embed import EmbedQueue, EmbedFactory
+from src.voice.compact_queue.queue_chain import QueueChain
 from src.voice.guild_voice_state import GuildVoiceState
 
 
@@ -22,7 +22,7 @@ class Queue(Button):
         )
 
     async def callback(self, interaction: Interaction):
-        queue: wavelink.Queue = self.__voice_state.queues(interaction)
+        queue: QueueChain = self.__voice_state.queues(interaction)
         track_per_page: int = 10
         max_page: int = ceil(queue.count / track_per_page)
         embed: EmbedQueue = EmbedQueue(
@@ -31,14 +31,14 @@ class Queue(Button):
             track_per_page
         )
 
+        view = QueueView(
+            queue,
+            embed,
+            self.__voice_state.get_render_cache(interaction.guild_id)
+        )
+
         await interaction.response.send_message(
-            embed=embed.queue(
-                queue[:track_per_page],
-                1
-            ),
-            view=QueueView(
-                queue,
-                embed
-            ),
+            embed=view.render_page(),
+            view=view,
             ephemeral=True
         )
@@ -8,6 +8,7 @@ from src.voice.guild_voice_state import GuildVoiceState
 class ResumePause(Button):
     def __init__(self, voice_state: GuildVoiceState, guild_id: int, row: int):
         self.__voice_state = voice_state
+        self.__guild_id = guild_id
         emoji = "▶️" if self.__voice_state.is_paused(guild_id) else "⏸️"
 
         super().__init__(
@@ -16,6 +17,9 @@ class ResumePause(Button):
             row=row
         )
 
+    def refresh(self):
+        self.emoji = "▶️" if self.__voice_state.is_paused(self.__guild_id) else "⏸️"
+
     async def callback(self, interaction: Interaction):
         state = await self.__voice_state.toggle_pause(interaction)
         self.emoji = "▶️" if state else "⏸️"
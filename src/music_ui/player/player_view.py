@@ -1,3 +1,4 @@
+import logging
 from typing import Any
 
 
@@ -21,18 +22,30 @@ from src.utils.embed import EmbedFactory
 from src.voice.guild_voice_state import GuildVoiceState
 
 
+logger = logging.getLogger(__name__)
+
+
 class PlayerView(View):
     def __init__(self, voice_state: GuildVoiceState, guild_id: int):
         super().__init__(timeout=None)
         self.__embed = EmbedFactory()
 
+        self.__resume_pause = ResumePause(voice_state, guild_id, 0)
+        self.__loop = Loop(voice_state, guild_id, 0)
+
         self.add_item(Back(voice_state, 0))
         self.add_item(Reset(voice_state, 0))
-        self.add_item(ResumePause(voice_state, guild_id, 0))
+        self.add_item(self.__resume_pause)
         self.add_item(Skip(voice_state, 0))
-        self.add_item(Loop(voice_state, guild_id, 0))
+        self.add_item(self.__loop)
         self.add_item(Queue(voice_state, 1))
 
+    def refresh(self):
+        """
+        Update the buttons to the current state of the player, so the view can be reused for the next track.
+        """
+        self.__resume_pause.refresh()
+        self.__loop.refresh()
 
     def __send_error(self, interaction: Interaction, error: str):
         return interaction.response.send_message(
@@ -69,4 +82,6 @@ class PlayerView(View):
             await self.__send_error(interaction, 'Coda vuota')
 
         else:
-            print("Errore in playerUI: ", error)
+            logger.error('Player view interaction failed', exc_info=error, extra={
+                'item': type(item).__name__, 'guild_id': interaction.guild_id
+            })
@@ -22,12 +22,9 @@ class Direction(Button):
         elif self.__direction == DirectionButton.FORWARD:
             self.view.current_page += 1
 
-        queue = self.view.get_tracks_by_page(self.view.current_page)
+        embed = self.view.render_page()
         self.view.check()
         await interaction.response.edit_message(
-            embed=self.view.embed.queue(
-                queue,
-                self.view.current_page,
-            ),
+            embed=embed,
             view=self.view,
         )
\ No newline at end of file
@@ -1,17 +1,22 @@
 
-import wavelink
+from math import ceil
+
+import discord
 from discord.ui import Button, View, Item
 
 from src.utils.embed import EmbedFactory, EmbedQueue
 
 from src.music_ui.queue.items.buttons.directions import DirectionButton, Direction
+from src.utils.render_cache import RenderCache
+from src.voice.compact_queue.queue_chain import QueueChain
 
 
 
 class QueueView(View):
-    def __init__(self, queue: wavelink.Queue, embed: EmbedQueue):
+    def __init__(self, queue: QueueChain, embed: EmbedQueue, render_cache: RenderCache):
         super().__init__()
         self.__queue = queue
+        self.__render_cache = render_cache
 
         self.embed = embed
         self.current_page = 1
@@ -26,9 +31,31 @@ class QueueView(View):
         self.check()
 
 
+    def __sync(self) -> None:
+        if self.__queue.is_stale:
+            self.__queue.refresh()
+            self.embed.num_tracks = self.__queue.count
+            self.embed.max_page = max(ceil(self.__queue.count / self.embed.track_per_page), 1)
+            self.current_page = min(self.current_page, self.embed.max_page)
+
     def get_tracks_by_page(self, page: int):
+        self.__sync()
+        page = min(page, self.embed.max_page)
         return self.__queue[(page - 1) * self.embed.track_per_page: page * self.embed.track_per_page]
 
+    def render_page(self) -> discord.Embed:
+        """
+        The embed of the current page, taken from the render cache while the queues do not change.
+        """
+        self.__sync()
+        page = self.current_page
+        return self.__render_cache.queue_page(
+            self.__queue.versions,
+            page,
+            self.embed.track_per_page,
+            lambda: self.embed.queue(self.get_tracks_by_page(page), page)
+        )
+
     def check(self):
         self.back_button.disabled = self.current_page <= 1
         self.forward_button.disabled = self.current_page >= self.embed.max_page
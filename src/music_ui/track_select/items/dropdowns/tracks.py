@@ -8,6 +8,7 @@ import wavelink
 import discord
 
 from src.utils.embed import EmbedFactory
+from src.utils import tracing
 from src.utils.utils import convert_time
 
 class Tracks(Select):
@@ -15,11 +16,13 @@ class Tracks(Select):
             self,
             voice_state: GuildVoiceState,
             interaction: discord.Interaction,
-            tracks: list[wavelink.Playable]):
+            tracks: list[wavelink.Playable],
+            trace: Optional[tracing.Trace] = None):
 
         self.__voice_state: GuildVoiceState = voice_state
         self.__interaction: discord.Interaction = interaction
         self.__tracks: list[wavelink.Playable] = tracks
+        self.__trace: Optional[tracing.Trace] = trace
         self.__embed: EmbedFactory = EmbedFactory()
 
         _format = lambda label: label[:96] + "..." if len(label) >= 100 else label
@@ -63,9 +66,10 @@ class Tracks(Select):
         tracks: list[wavelink.Playable] = [
             track for track in self.__tracks if track.identifier in self.values
         ]
-        await self.__interaction.delete_original_response()
+        with tracing.resumed(self.__trace):
+            await self.__interaction.delete_original_response()
 
-        await self.__voice_state.play_and_send_feedback(
-            interaction,
-            tracks,
-        )
+            await self.__voice_state.play_and_send_feedback(
+                interaction,
+                tracks,
+            )
@@ -1,3 +1,4 @@
+import logging
 from discord import Interaction
 from discord._types import ClientT
 from discord.ui import Button, View, Select, Item
@@ -9,25 +10,36 @@ import discord
 
 from src.exceptions.player_exceptions import IllegalState
 from src.utils.embed import EmbedFactory
+from src.utils import tracing
 from src.music_ui.track_select.items.dropdowns.tracks import Tracks
 
 
+logger = logging.getLogger(__name__)
+
+
 class SelectTrackView(View):
     def __init__(
             self,
             voice_state: GuildVoiceState,
             interaction: discord.Interaction,
-            tracks: list[wavelink.Playable]):
+            tracks: list[wavelink.Playable],
+            trace: Optional[tracing.Trace] = None):
         super().__init__()
         self.add_item(
             Tracks(
                 voice_state,
                 interaction,
-                tracks
+                tracks,
+                trace
             )
         )
+        self.__trace: Optional[tracing.Trace] = trace
         self.__embed = EmbedFactory()
 
+    async def on_timeout(self) -> None:
+        if self.__trace:
+            self.__trace.tracer.finish(self.__trace, 'incomplete')
+
     def __send_error(self, interaction: Interaction, error: str):
         return interaction.response.send_message(
             embed=self.__embed.error(error),
@@ -39,6 +51,6 @@ class SelectTrackView(View):
         if isinstance(error, IllegalState):
             await self.__send_error(interaction, 'Comando non valido')
         else:
-            print(f"SelectTrackView.on_error error: {error}")
+            logger.error('Track selection failed', exc_info=error, extra={'guild_id': interaction.guild_id})
             await self.__send_error(interaction, 'Errore sconosciuto')
 
@@ -0,0 +1,236 @@
+"""
+This module contains the search cache placed in front of the LavaLink track search.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+import wavelink
+import yarl
+
+from src.metrics.metrics import SEARCH_LATENCY
+
+
+class SearchCacheStats:
+    """
+    Counters exposed by the SearchCache.
+    """
+    def __init__(self) -> None:
+        self.hits: int = 0
+        self.misses: int = 0
+        self.negative_hits: int = 0
+        self.coalesced: int = 0
+        self.evictions: int = 0
+        self.expirations: int = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'negative_hits': self.negative_hits,
+            'coalesced': self.coalesced,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+
+class _CacheEntry:
+    __slots__ = ('payload', 'size', 'expires_at')
+
+    def __init__(self, payload: Optional[dict[str, Any]], size: int, expires_at: float) -> None:
+        self.payload: Optional[dict[str, Any]] = payload
+        self.size: int = size
+        self.expires_at: float = expires_at
+
+
+class SearchCache:
+    """
+    A LRU + TTL cache in front of wavelink.Playable.search.
+
+    Results are stored as raw LavaLink payloads and rebuilt into fresh Playable objects on every hit,
+    so callers can freely stamp extras on the returned tracks. Empty results are kept in a short-lived
+    negative cache and concurrent identical searches share a single in-flight request, run in its own task
+    so that a caller being cancelled does not cancel the search the others are waiting for.
+    """
+    def __init__(self, max_entries: int = 512, max_tracks: int = 20000, ttl: float = 3600,
+                 negative_ttl: float = 60) -> None:
+        self.__max_entries: int = max_entries
+        self.__max_tracks: int = max_tracks
+        self.__ttl: float = ttl
+        self.__negative_ttl: float = negative_ttl
+
+        self.__entries: OrderedDict[tuple[str, str], _CacheEntry] = OrderedDict()
+        self.__in_flight: dict[tuple[str, str], asyncio.Task] = {}
+        self.__tracks: int = 0
+
+        self.stats: SearchCacheStats = SearchCacheStats()
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    @property
+    def size(self) -> int:
+        """
+        The number of tracks currently held by the cache.
+        """
+        return self.__tracks
+
+    @staticmethod
+    def make_key(query: str, source: wavelink.TrackSource | str | None = wavelink.TrackSource.YouTubeMusic
+                 ) -> tuple[str, str]:
+        """
+        Build the cache key for a query, mirroring the prefix selection of wavelink.Playable.search.
+
+        Args:
+            query (str): The query as typed by the user.
+            source: The search source used when the query is not a URL.
+
+        Returns:
+            tuple[str, str]: The source prefix and the normalized query.
+        """
+        query = query.strip()
+        # URLs and queries sent without a prefix (like 'sprec:' recommendations) are case sensitive.
+        if yarl.URL(query).host or not source:
+            return '', query
+
+        if isinstance(source, wavelink.TrackSource):
+            source = {
+                wavelink.TrackSource.YouTube: 'ytsearch',
+                wavelink.TrackSource.YouTubeMusic: 'ytmsearch',
+                wavelink.TrackSource.SoundCloud: 'scsearch',
+            }[source]
+
+        return (source or '').removesuffix(':'), ' '.join(query.split()).casefold()
+
+    async def search(self, query: str,
+                     source: wavelink.TrackSource | str | None = wavelink.TrackSource.YouTubeMusic) -> wavelink.Search:
+        """
+        Search tracks, serving the result from the cache when possible.
+
+        Args:
+            query (str): The query as typed by the user.
+            source: The search source used when the query is not a URL.
+
+        Returns:
+            wavelink.Search: A fresh list of Playable or Playlist, empty if nothing was found.
+        """
+        key = self.make_key(query, source)
+
+        entry = self.__lookup(key)
+        if entry is not None:
+            if entry.payload is None:
+                self.stats.negative_hits += 1
+                return []
+            self.stats.hits += 1
+            return self.__decode(entry.payload)
+
+        if task := self.__in_flight.get(key):
+            self.stats.coalesced += 1
+            _, payload = await asyncio.shield(task)
+            return self.__decode(payload) if payload is not None else []
+
+        self.stats.misses += 1
+        task = asyncio.create_task(self.__fetch(key, query, source))
+        task.add_done_callback(self.__retrieve)
+        self.__in_flight[key] = task
+        # The tracks of the search itself go to the caller that started it, the others get copies.
+        tracks, _ = await asyncio.shield(task)
+        return tracks
+
+    async def __fetch(self, key: tuple[str, str], query: str,
+                      source: wavelink.TrackSource | str | None) -> tuple[wavelink.Search, Optional[dict[str, Any]]]:
+        start = time.perf_counter()
+        try:
+            tracks: wavelink.Search = await wavelink.Playable.search(query, source=source)
+        except Exception:
+            SEARCH_LATENCY.observe(time.perf_counter() - start, outcome='error')
+            raise
+        finally:
+            self.__in_flight.pop(key, None)
+
+        SEARCH_LATENCY.observe(time.perf_counter() - start, outcome='found' if tracks else 'empty')
+        payload = self.__encode(tracks)
+        if payload is None or self.__cacheable(tracks):
+            self.__store(key, payload)
+        return tracks, payload
+
+    @staticmethod
+    def __retrieve(task: asyncio.Task) -> None:
+        # Retrieve the exception so it is not reported when every caller was cancelled.
+        if not task.cancelled():
+            task.exception()
+
+    def clear(self) -> None:
+        self.__entries.clear()
+        self.__tracks = 0
+
+    def __lookup(self, key: tuple[str, str]) -> Optional[_CacheEntry]:
+        entry = self.__entries.get(key)
+        if entry is None:
+            return None
+
+        if entry.expires_at <= time.monotonic():
+            self.__remove(key)
+            self.stats.expirations += 1
+            return None
+
+        self.__entries.move_to_end(key)
+        return entry
+
+    def __store(self, key: tuple[str, str], payload: Optional[dict[str, Any]]) -> None:
+        if payload is None:
+            size, ttl = 0, self.__negative_ttl
+        else:
+            size, ttl = len(payload['tracks']), self.__ttl
+            if size > self.__max_tracks:
+                return
+
+        self.__remove(key)
+        self.__entries[key] = _CacheEntry(payload, size, time.monotonic() + ttl)
+        self.__tracks += size
+
+        while len(self.__entries) > self.__max_entries or self.__tracks > self.__max_tracks:
+            oldest = next(iter(self.__entries))
+            self.__remove(oldest)
+            self.stats.evictions += 1
+
+    def __remove(self, key: tuple[str, str]) -> None:
+        if entry := self.__entries.pop(key, None):
+            self.__tracks -= entry.size
+
+    @staticmethod
+    def __cacheable(tracks: wavelink.Search) -> bool:
+        # Live streams are never cached, like wavelink's own LFU cache does.
+        return isinstance(tracks, wavelink.Playlist) or not any(track.is_stream for track in tracks)
+
+    @staticmethod
+    def __encode(tracks: wavelink.Search) -> Optional[dict[str, Any]]:
+        if not tracks:
+            return None
+
+        if isinstance(tracks, wavelink.Playlist):
+            return {
+                'playlist': {
+                    'info': {'name': tracks.name, 'selectedTrack': tracks.selected},
+                    'pluginInfo': {
+                        key: value for key, value in (
+                            ('type', tracks.type),
+                            ('url', tracks.url),
+                            ('artworkUrl', tracks.artwork),
+                            ('author', tracks.author),
+                        ) if value is not None
+                    },
+                },
+                'tracks': [track.raw_data for track in tracks.tracks],
+            }
+
+        return {'playlist': None, 'tracks': [track.raw_data for track in tracks]}
+
+    @staticmethod
+    def __decode(payload: dict[str, Any]) -> wavelink.Search:
+        if payload['playlist'] is not None:
+            return wavelink.Playlist(payload['playlist'] | {'tracks': payload['tracks']})
+
+        return [wavelink.Playable(data) for data in payload['tracks']]
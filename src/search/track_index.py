@@ -0,0 +1,179 @@
+"""
+This module contains the local index of the tracks played in every guild, used to autocomplete /play
+without searching on LavaLink.
+
+Every guild has a fixed number of slots. A track takes a slot, and every trigram of its title and author
+maps to a bitmask of the slots it appears in. The words of a query are prefixes of the words of a track,
+the last one is still being typed: a query is the AND of the masks of the trigrams of its words, padded
+at their start only (" ne", "nev" for "nev"), checked against the text of the few candidates left.
+When a guild is full, the track played least recently gives up its slot.
+"""
+
+import re
+import sys
+import unicodedata
+from collections import OrderedDict
+from typing import Iterable, NamedTuple, Optional
+
+
+_SEPARATORS = re.compile(r'[\W_]+')
+
+
+class IndexedTrack(NamedTuple):
+    title: str
+    author: str
+    uri: Optional[str]
+
+
+def normalize(text: str) -> str:
+    """
+    Lower the case, strip the accents and keep the words only, so "Édith  Piaf!" matches "edith piaf".
+    """
+    text = text.casefold()
+    if not text.isascii():
+        text = ''.join(char for char in unicodedata.normalize('NFKD', text) if not unicodedata.combining(char))
+    return _SEPARATORS.sub(' ', text).strip()
+
+
+def trigrams(text: str) -> set[str]:
+    # Interned, so the guilds share the keys of their masks.
+    padded = f' {text} '
+    return {sys.intern(padded[index:index + 3]) for index in range(len(padded) - 2)}
+
+
+def prefix_trigrams(word: str) -> set[str]:
+    # Nothing for a single letter, the candidates are then only checked against the text.
+    padded = f' {word}'
+    return {padded[index:index + 3] for index in range(len(padded) - 2)}
+
+
+class _Slot:
+    __slots__ = ('key', 'track', 'text', 'grams', 'played')
+
+    def __init__(self, key: str, track: IndexedTrack, text: str, grams: set[str], played: int) -> None:
+        self.key: str = key
+        self.track: IndexedTrack = track
+        self.text: str = text
+        self.grams: set[str] = grams
+        self.played: int = played
+
+
+class GuildTrackIndex:
+    """
+    The trigram index of the tracks played in a guild, bounded to max_tracks.
+    """
+    def __init__(self, max_tracks: int = 200) -> None:
+        self.__max_tracks: int = max_tracks
+        self.__slots: list[_Slot] = []
+        self.__by_key: OrderedDict[str, int] = OrderedDict()
+        self.__masks: dict[str, int] = {}
+        self.__played: int = 0
+
+    def __len__(self) -> int:
+        return len(self.__by_key)
+
+    def add(self, track: IndexedTrack) -> None:
+        """
+        Index a played track, or mark it as the most recently played one if it is already indexed.
+        """
+        text = normalize(f'{track.title} {track.author}')
+        if not text:
+            return
+
+        key = track.uri or text
+        self.__played += 1
+        if (index := self.__by_key.get(key)) is not None:
+            self.__by_key.move_to_end(key)
+            self.__slots[index].played = self.__played
+            return
+
+        if len(self.__slots) < self.__max_tracks:
+            index = len(self.__slots)
+            self.__slots.append(None)
+        else:
+            _, index = self.__by_key.popitem(last=False)
+            self.__unmask(index, self.__slots[index].grams)
+
+        grams = trigrams(text)
+        self.__slots[index] = _Slot(key, track, f' {text}', grams, self.__played)
+        self.__by_key[key] = index
+        bit = 1 << index
+        for gram in grams:
+            self.__masks[gram] = self.__masks.get(gram, 0) | bit
+
+    def __unmask(self, index: int, grams: set[str]) -> None:
+        bit = ~(1 << index)
+        for gram in grams:
+            if mask := self.__masks[gram] & bit:
+                self.__masks[gram] = mask
+            else:
+                del self.__masks[gram]
+
+    def search(self, query: str, limit: int = 25) -> list[IndexedTrack]:
+        """
+        The tracks with a word of the title or author starting with every word of the query,
+        the most recently played first. An empty query returns the last tracks played.
+        """
+        words = [f' {word}' for word in normalize(query).split()]
+        if not words:
+            return [self.__slots[index].track for index in reversed(self.__by_key.values())][:limit]
+
+        mask = (1 << len(self.__slots)) - 1
+        for word in words:
+            for gram in prefix_trigrams(word[1:]):
+                mask &= self.__masks.get(gram, 0)
+                if not mask:
+                    return []
+
+        candidates = []
+        while mask:
+            bit = mask & -mask
+            slot = self.__slots[bit.bit_length() - 1]
+            if all(word in slot.text for word in words):
+                candidates.append(slot)
+            mask ^= bit
+        candidates.sort(key=lambda slot: slot.played, reverse=True)
+        return [slot.track for slot in candidates[:limit]]
+
+
+class TrackIndex:
+    """
+    The indexes of the guilds, bounded to the max_guilds that played a track most recently.
+    """
+    def __init__(self, max_guilds: int = 250, max_tracks: int = 200) -> None:
+        self.__max_guilds: int = max_guilds
+        self.__max_tracks: int = max_tracks
+        self.__guilds: OrderedDict[int, GuildTrackIndex] = OrderedDict()
+
+    def __contains__(self, guild_id: int) -> bool:
+        return guild_id in self.__guilds
+
+    def __guild(self, guild_id: int) -> GuildTrackIndex:
+        if (index := self.__guilds.get(guild_id)) is None:
+            index = self.__guilds[guild_id] = GuildTrackIndex(self.__max_tracks)
+            if len(self.__guilds) > self.__max_guilds:
+                self.__guilds.popitem(last=False)
+        else:
+            self.__guilds.move_to_end(guild_id)
+        return index
+
+    def add(self, guild_id: int, track: IndexedTrack) -> None:
+        self.__guild(guild_id).add(track)
+
+    def add_all(self, guild_id: int, tracks: Iterable[IndexedTrack]) -> None:
+        """
+        Index tracks in the order they were played, the last one being the most recent.
+        """
+        index = self.__guild(guild_id)
+        for track in tracks:
+            index.add(track)
+
+    def search(self, guild_id: int, query: str, limit: int = 25) -> list[IndexedTrack]:
+        index = self.__guilds.get(guild_id)
+        return index.search(query, limit) if index is not None else []
+
+    def stats(self) -> dict[str, int]:
+        return {
+            'guilds': len(self.__guilds),
+            'tracks': sum(len(index) for index in self.__guilds.values()),
+        }
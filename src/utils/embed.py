@@ -1,50 +1,68 @@
-from dis import disco
-from typing import Optional
+from typing import NamedTuple, Optional
 
 import wavelink
 import discord
 from discord import User
-from discord.ext import commands
-from src.utils.utils import convert_time
 from src.utils.utils import convert_time
 
 
-class EmbedFactory:
-    def __init__(self):
-        self.__bot_name = "Susano"
-        self.__icon_url = "https://webcdn.hirezstudios.com/smite/god-icons/susano.jpg"
+BOT_NAME = "Susano"
+BOT_ICON_URL = "https://webcdn.hirezstudios.com/smite/god-icons/susano.jpg"
 
-    def error(self, error: str) -> discord.Embed:
+# Discord rejects embeds with more fields than this.
+MAX_FIELDS = 25
+
+SOURCE_ICONS: dict[str, str] = {
+    "youtube": "https://cdn3.iconfinder.com/data/icons/social-network-30/512/social-06-512.png",
+    "spotify": "https://storage.googleapis.com/pr-newsroom-wp/1/2023/05/Spotify_Primary_Logo_RGB_Green.png",
+}
+
+
+class EmbedTemplate(NamedTuple):
+    """
+    The immutable parts of an embed, resolved once instead of on every message.
+    """
+    title: Optional[str]
+    color: discord.Color
+    author_name: Optional[str] = None
+    author_icon_url: Optional[str] = None
+
+    def build(self, description: Optional[str] = None, title: Optional[str] = None) -> discord.Embed:
         embed = discord.Embed(
-            title=" ",
-            description=f"***{error}***",
-            color=discord.Color.red()
-        )
-        embed.set_author(
-            name=self.__bot_name,
-            icon_url=self.__icon_url
+            title=title if title is not None else self.title,
+            description=description,
+            color=self.color
         )
+        if self.author_name is not None:
+            embed.set_author(
+                name=self.author_name,
+                icon_url=self.author_icon_url
+            )
         return embed
 
+
+ERROR = EmbedTemplate(" ", discord.Color.red(), BOT_NAME, BOT_ICON_URL)
+SEND = EmbedTemplate(" ", discord.Color.green(), BOT_NAME, BOT_ICON_URL)
+NOW_PLAYING = EmbedTemplate("🎶 In Riproduzione", discord.Color.blurple())
+ADDED_PLAYLIST = EmbedTemplate("📀 Playlist aggiunta alla coda", discord.Color.green(), BOT_NAME, BOT_ICON_URL)
+ADDED_TRACKS = EmbedTemplate("📋 Tracce aggiunte alla coda", discord.Color.green(), BOT_NAME, BOT_ICON_URL)
+ADDED_TRACK = EmbedTemplate("📋 Traccia aggiunta alla coda", discord.Color.green(), BOT_NAME, BOT_ICON_URL)
+QUEUE = EmbedTemplate("📋 Coda", discord.Color.green())
+LOOP_LAG = EmbedTemplate("🛠️ Event loop", discord.Color.orange())
+TRACES = EmbedTemplate("🛠️ Latenza dei comandi", discord.Color.orange())
+CLUSTERS = EmbedTemplate("🛠️ Cluster", discord.Color.orange())
+
+
+class EmbedFactory:
+    def error(self, error: str) -> discord.Embed:
+        return ERROR.build(f"***{error}***")
+
     def send(self, message: str) -> discord.Embed:
-        embed = discord.Embed(
-            title=" ",
-            description=f"***{message}***",
-            color=discord.Color.green()
-        )
-        embed.set_author(
-            name=self.__bot_name,
-            icon_url=self.__icon_url
-        )
-        return embed
+        return SEND.build(f"***{message}***")
 
     def now_playing(self, track: wavelink.Playable) -> discord.Embed:
 
-        embed = discord.Embed(
-            title="🎶 In Riproduzione",
-            description=f"> [{track.title}]({track.uri})",
-            color=discord.Color.blurple()
-        )
+        embed = NOW_PLAYING.build(f"> [{track.title}]({track.uri})")
         embed.set_thumbnail(url=track.artwork) if track.artwork else None
         embed.add_field(
             name="👤 Autore:",
@@ -61,35 +79,77 @@ class EmbedFactory:
             inline=True
         ) if track.length else None
 
-        icon_url = None
-
-        if track.source == "youtube":
-            icon_url = "https://cdn3.iconfinder.com/data/icons/social-network-30/512/social-06-512.png"
-        elif track.source == "spotify":
-            icon_url = "https://storage.googleapis.com/pr-newsroom-wp/1/2023/05/Spotify_Primary_Logo_RGB_Green.png"
-
         embed.set_author(
             name=track.source.capitalize(),
-            icon_url=icon_url
+            icon_url=SOURCE_ICONS.get(track.source)
         )
+
+        extras = track.extras
+        requester_name = getattr(extras, "requester_name", None)
         embed.set_footer(
-            text=track.extras.requester_name if "requester_name" in dir(track.extras) else "🌟 Consigliata",
-            icon_url=track.extras.requester_avatar if "requester_avatar" in dir(track.extras) else None
+            text=requester_name if requester_name is not None else "🌟 Consigliata",
+            icon_url=getattr(extras, "requester_avatar", None)
+        )
+
+        return embed
+
+    def loop_lag(self, stats: dict, threshold: float) -> discord.Embed:
+        embed = LOOP_LAG.build(f"***{stats['samples']} campioni***")
+        for name in ('p50', 'p99', 'max'):
+            embed.add_field(name=f"⏱️ Lag {name}:", value=f"***{stats[name] * 1000:.1f} ms***", inline=True)
+        embed.add_field(
+            name=f"🐢 Blocchi oltre {threshold * 1000:.0f} ms:",
+            value=f"***{stats['slow_callbacks']}***",
+            inline=False
         )
+        if stats['recent']:
+            embed.add_field(
+                name="📋 Ultimi blocchi:",
+                value="\n".join(
+                    f"<t:{int(slow.at)}:T> **{slow.duration * 1000:.0f} ms** `{slow.handler.replace('`', '')}`"
+                    for slow in reversed(stats['recent'])
+                )[:1024],
+                inline=False
+            )
+        return embed
+
+    def trace_summary(self, summary: dict[str, dict[str, float]]) -> discord.Embed:
+        if not summary:
+            return TRACES.build("***Nessun comando tracciato***")
 
+        embed = TRACES.build(f"***{summary['total']['count']} comandi***")
+        for stage, stats in list(summary.items())[:MAX_FIELDS]:
+            embed.add_field(
+                name=f"⏱️ {stage}:",
+                value=f"p50 ***{stats['p50'] * 1000:.0f} ms***\np99 ***{stats['p99'] * 1000:.0f} ms***",
+                inline=True
+            )
         return embed
 
-    def added_to_queue(self, tracks: wavelink.Search, author: User, skip_first_track: bool = False) -> discord.Embed:
+    def clusters(self, clusters: dict[int, dict], totals: dict[str, int]) -> discord.Embed:
+        embed = CLUSTERS.build(
+            f"***{totals['clusters']} cluster, {totals['guilds']} server, {totals['players']} player***"
+        )
+        for cluster_id, stats in sorted(clusters.items())[:MAX_FIELDS]:
+            shards = stats['shards']
+            embed.add_field(
+                name=f"🖥️ Cluster {cluster_id}:",
+                value=f"Shard ***{f'{shards[0]}-{shards[-1]}' if shards else '-'}***\n"
+                      f"Server ***{stats['guilds']}***\n"
+                      f"Player ***{stats['players']}***\n"
+                      f"Latenza ***{stats['latency'] * 1000:.0f} ms***",
+                inline=True
+            )
+        return embed
+
+    def added_to_queue(self, tracks: wavelink.Search, author: User, skip_first_track: bool = False,
+                       added: Optional[int] = None) -> discord.Embed:
 
         if isinstance(tracks, wavelink.Playlist):
-            embed = self.__added_to_queue_playlist(tracks, skip_first_track)
+            embed = self.__added_to_queue_playlist(tracks, skip_first_track, added)
         else:
             embed = self.__added_to_queue_list(tracks, skip_first_track)
 
-        embed.set_author(
-            name=self.__bot_name,
-            icon_url=self.__icon_url
-        )
         embed.set_footer(
             text=author.display_name,
             icon_url=author.display_avatar
@@ -97,13 +157,10 @@ class EmbedFactory:
         return embed
 
     @staticmethod
-    def __added_to_queue_playlist(tracks: wavelink.Playlist, skip_first_track: bool) -> discord.Embed:
+    def __added_to_queue_playlist(tracks: wavelink.Playlist, skip_first_track: bool,
+                                  added: Optional[int]) -> discord.Embed:
 
-        embed = discord.Embed(
-            title="📀 Playlist aggiunta alla coda",
-            description=f"> [{tracks.name}]({tracks.url})" if tracks.url else f"> {tracks.name}",
-            color=discord.Color.green()
-        )
+        embed = ADDED_PLAYLIST.build(f"> [{tracks.name}]({tracks.url})" if tracks.url else f"> {tracks.name}")
 
         embed.set_thumbnail(url=tracks.artwork) if tracks.artwork else None
 
@@ -115,9 +172,10 @@ class EmbedFactory:
 
         num_tracks = len(tracks.tracks) if not skip_first_track else len(tracks.tracks) - 1
 
+        count = f"{added}/{num_tracks}" if added is not None and added < num_tracks else num_tracks
         embed.add_field(
             name="🎵 Aggiunte:" if num_tracks > 1 else "🎵 Aggiunta:",
-            value=f"***{num_tracks} {'tracce' if num_tracks > 1 else 'traccia'}***",
+            value=f"***{count} {'tracce' if num_tracks > 1 else 'traccia'}***",
             inline=True
         )
 
@@ -129,33 +187,32 @@ class EmbedFactory:
         if skip_first_track:
             tracks = tracks[1:]
 
-        embed = discord.Embed(
-            title="📋 Tracce aggiunte alla coda" if len(tracks) > 1 else "📋 Traccia aggiunta alla coda",
-            description=f"> [{tracks[0].title}]({tracks[0].uri})" if len(tracks) == 1 else None,
-            color=discord.Color.green()
-        )
+        if len(tracks) > 1:
+            embed = ADDED_TRACKS.build()
+            for index, track in enumerate(tracks[:MAX_FIELDS], start=1):
+                embed.add_field(
+                    name=f"🎵 Traccia {index}:",
+                    value=f"***[{track.title}]({track.uri})***",
+                    inline=False
+                )
+            return embed
 
-        embed.set_thumbnail(url=tracks[0].artwork) if len(tracks) == 1 and tracks[0].artwork else None
+        track = tracks[0]
+        embed = ADDED_TRACK.build(f"> [{track.title}]({track.uri})")
+
+        embed.set_thumbnail(url=track.artwork) if track.artwork else None
 
         embed.add_field(
             name="👤 Autore:",
-            value=f"***{tracks[0].author}***",
+            value=f"***{track.author}***",
             inline=True
-        ) if len(tracks) == 1 and tracks[0].author else None
+        ) if track.author else None
 
         embed.add_field(
             name="⏱️ Durata:",
-            value=f"***{convert_time(tracks[0].length)}***",
+            value=f"***{convert_time(track.length)}***",
             inline=True
-        ) if len(tracks) == 1 else None
-
-        [
-            embed.add_field(
-                name=f"🎵 Traccia {index}:",
-                value=f"***[{track.title}]({track.uri})***",
-                inline=False
-            ) for index, track in enumerate(tracks, start=1)
-        ] if len(tracks) > 1 else None
+        )
 
         return embed
 
@@ -166,13 +223,9 @@ class EmbedQueue:
         self.track_per_page = track_per_page
 
     def queue(self, queue: list[wavelink.Playable], current_page: int) -> discord.Embed:
-        embed = discord.Embed(
-            title="📋 Coda",
-            description=f"**{self.num_tracks} {'tracce' if self.num_tracks > 1 else 'traccia'} nella coda**",
-            color=discord.Color.green()
-        )
+        embed = QUEUE.build(f"**{self.num_tracks} {'tracce' if self.num_tracks > 1 else 'traccia'} nella coda**")
 
-        for index, track in enumerate(queue[:25], start=(current_page - 1) * self.track_per_page + 1):
+        for index, track in enumerate(queue[:MAX_FIELDS], start=(current_page - 1) * self.track_per_page + 1):
             embed.add_field(
                 name=f"{index}. 🎵 {track.title}",
                 value=f"**Autore**: {track.author} | **Durata**: {convert_time(track.length)}{' 🌟 Consigliata' if track.recommended else ''}" ,
@@ -0,0 +1,89 @@
+"""
+This module contains the writer of the JSONL files the bot appends records to while it runs.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+class JsonlWriter:
+    """
+    Buffers the records on the event loop and appends them to the file on a dedicated thread.
+    """
+    def __init__(self, path: str, flush_interval: float = 5, name: str = 'jsonl-writer') -> None:
+        self.__path: str = path
+        self.__flush_interval: float = flush_interval
+
+        self.__executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+        self.__file = None
+        self.__task: Optional[asyncio.Task] = None
+        self.__lines: list[str] = []
+
+        self.written: int = 0
+
+    @property
+    def is_open(self) -> bool:
+        return self.__file is not None
+
+    async def __run(self, function: Callable, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.__executor, function, *args)
+
+    async def open(self) -> None:
+        await self.__run(self.__open)
+        self.__task = asyncio.create_task(self.__flush_loop())
+
+    async def close(self) -> None:
+        if self.__task is not None:
+            self.__task.cancel()
+            self.__task = None
+        if self.__file is None:
+            return
+
+        await self.flush()
+        await self.__run(self.__close)
+        self.__executor.shutdown(wait=False)
+
+    def write(self, record: dict[str, Any]) -> None:
+        """
+        Buffer a record, it must be JSON serializable. Nothing is buffered while the file is closed.
+        """
+        if self.__file is not None:
+            self.__lines.append(json.dumps(record, separators=(',', ':'), ensure_ascii=False))
+            self.written += 1
+
+    async def flush(self) -> None:
+        if self.__file is None or not self.__lines:
+            return
+
+        lines, self.__lines = self.__lines, []
+        await self.__run(self.__write, lines)
+
+    async def __flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.__flush_interval)
+            try:
+                await self.flush()
+            except OSError as error:
+                logger.error('Failed to write %s: %s', self.__path, error)
+
+    # --- Executor thread --- #
+
+    def __open(self) -> None:
+        if directory := os.path.dirname(self.__path):
+            os.makedirs(directory, exist_ok=True)
+        self.__file = open(self.__path, 'a', encoding='utf-8')
+
+    def __write(self, lines: list[str]) -> None:
+        self.__file.write('\n'.join(lines) + '\n')
+        self.__file.flush()
+
+    def __close(self) -> None:
+        self.__file.close()
+        self.__file = None
@@ -0,0 +1,153 @@
+"""
+This module contains the monitor of the event loop the whole bot runs on.
+
+A task wakes up every interval and records how late it was scheduled: the loop lag. A watchdog thread
+checks that the task is not overdue, and when it is, it captures the stack of the loop thread, which
+is the stack of the callback blocking the loop. The stall is logged with that stack once the loop
+runs again, so a callback is reported when it runs for longer than about threshold + interval.
+
+Both sides wake up a few times per second and do constant work, so the monitor is always on.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from types import FrameType
+from typing import NamedTuple, Optional
+
+from src.metrics.metrics import SLOW_CALLBACKS
+
+
+logger = logging.getLogger(__name__)
+
+
+ASYNCIO_DIR = os.path.dirname(asyncio.__file__)
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class SlowCallback(NamedTuple):
+    at: float
+    duration: float
+    handler: str
+    stack: str
+
+
+class LoopMonitor:
+    """
+    Samples the loop lag and reports the callbacks blocking the loop for longer than threshold.
+    """
+    def __init__(self, interval: float = 0.1, threshold: float = 0.1, window: int = 3000, recent: int = 10) -> None:
+        self.__interval: float = interval
+        self.__threshold: float = threshold
+        self.__lags: deque[float] = deque(maxlen=window)
+        self.__recent: deque[SlowCallback] = deque(maxlen=recent)
+
+        self.__task: Optional[asyncio.Task] = None
+        self.__watchdog: Optional[threading.Thread] = None
+        self.__stopped: threading.Event = threading.Event()
+        self.__loop_thread_id: Optional[int] = None
+        # The monotonic time the sampler should wake up at, and the stack captured while it was overdue.
+        self.__expected: Optional[float] = None
+        self.__captured: Optional[tuple[float, str, str]] = None
+
+        self.max_lag: float = 0
+        self.slow_callbacks: int = 0
+
+    @property
+    def threshold(self) -> float:
+        return self.__threshold
+
+    def start(self) -> None:
+        if self.__task is not None:
+            return
+
+        self.__loop_thread_id = threading.get_ident()
+        self.__stopped = threading.Event()
+        self.__task = asyncio.create_task(self.__sample_loop())
+        self.__watchdog = threading.Thread(target=self.__watch, args=(self.__stopped,), name='loop-watchdog',
+                                           daemon=True)
+        self.__watchdog.start()
+
+    def stop(self) -> None:
+        if self.__task is not None:
+            self.__task.cancel()
+            self.__task = None
+        self.__stopped.set()
+        self.__watchdog = None
+        self.__expected = None
+
+    def percentile(self, percent: float) -> float:
+        if not self.__lags:
+            return 0
+        lags = sorted(self.__lags)
+        return lags[min(len(lags) - 1, int(len(lags) * percent / 100))]
+
+    def stats(self) -> dict:
+        return {
+            'samples': len(self.__lags),
+            'p50': self.percentile(50),
+            'p99': self.percentile(99),
+            'max': self.max_lag,
+            'slow_callbacks': self.slow_callbacks,
+            'recent': list(self.__recent),
+        }
+
+    async def __sample_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            self.__expected = loop.time() + self.__interval
+            await asyncio.sleep(self.__interval)
+            lag = max(loop.time() - self.__expected, 0)
+            self.__lags.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+
+            if lag >= self.__threshold:
+                self.__report(lag)
+
+    def __report(self, lag: float) -> None:
+        captured, self.__captured = self.__captured, None
+        handler, stack = (captured[1], captured[2]) if captured else ('unknown', '')
+        self.slow_callbacks += 1
+        SLOW_CALLBACKS.inc()
+        self.__recent.append(SlowCallback(time.time(), lag, handler, stack))
+        logger.warning('Event loop blocked for %.0f ms by %s\n%s', lag * 1000, handler, stack)
+
+    # --- Watchdog thread --- #
+
+    def __watch(self, stopped: threading.Event) -> None:
+        while not stopped.wait(self.__threshold / 2):
+            expected = self.__expected
+            if expected is None or time.monotonic() - expected < self.__threshold:
+                continue
+            if self.__captured is not None and self.__captured[0] == expected:
+                continue
+
+            frame = sys._current_frames().get(self.__loop_thread_id)
+            if frame is not None:
+                self.__captured = (expected, *self.__describe(frame))
+
+    @staticmethod
+    def __describe(frame: FrameType) -> tuple[str, str]:
+        """
+        The name of the callback run by the loop and the stack of the loop thread.
+
+        The handler is the first frame of the bot after the asyncio internals, or the first frame after them
+        when the loop is blocked in a library: discord.py wraps every listener in its own coroutine.
+        """
+        summary = traceback.extract_stack(frame)
+        start = 0
+        for index, entry in enumerate(summary):
+            if entry.filename.startswith(ASYNCIO_DIR):
+                start = index + 1
+        start = min(start, len(summary) - 1)
+        handler = next((
+            entry for entry in summary[start:]
+            if entry.filename.startswith(PROJECT_DIR) and 'site-packages' not in entry.filename
+        ), summary[start])
+        return f'{handler.name} ({handler.filename}:{handler.lineno})', ''.join(traceback.format_list(summary[start:]))
+
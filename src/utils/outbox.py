@@ -0,0 +1,200 @@
+"""
+This module contains the per-guild outbox the bot sends its channel messages through.
+"""
+
+import asyncio
+import logging
+from collections import Counter, deque
+from typing import Awaitable, Callable, Optional
+
+import discord
+
+from src.utils.embed import EmbedFactory
+
+
+logger = logging.getLogger(__name__)
+
+
+Job = Callable[[], Awaitable[None]]
+
+
+class _GuildOutbox:
+    def __init__(self, guild_id: int, max_depth: int, merge_window: float, embed: EmbedFactory,
+                 totals: Counter, on_closed: Callable[['_GuildOutbox'], None]) -> None:
+        self.guild_id: int = guild_id
+        self.__max_depth: int = max_depth
+        self.__merge_window: float = merge_window
+        self.__embed: EmbedFactory = embed
+        self.__totals: Counter = totals
+        self.__on_closed: Callable[['_GuildOutbox'], None] = on_closed
+
+        self.__pending: deque[Job] = deque()
+        self.__now_playing: Optional[Job] = None
+        self.__errors: dict[tuple[int, str], int] = {}
+        self.__timers: dict[tuple[int, str], asyncio.TimerHandle] = {}
+        self.__task: Optional[asyncio.Task] = None
+        self.__closing: bool = False
+
+    def put(self, job: Job) -> None:
+        if len(self.__pending) >= self.__max_depth:
+            self.__pending.popleft()
+            self.__totals['dropped'] += 1
+        self.__pending.append(job)
+        self.__wakeup()
+
+    def put_now_playing(self, job: Job) -> None:
+        if self.__now_playing is not None:
+            self.__totals['superseded'] += 1
+        self.__now_playing = job
+        self.__wakeup()
+
+    def put_error(self, channel: discord.abc.Messageable, message: str) -> None:
+        key = (id(channel), message)
+        if key in self.__errors:
+            self.__errors[key] += 1
+            self.__totals['merged'] += 1
+            return
+
+        self.__errors[key] = 1
+        self.__timers[key] = asyncio.get_running_loop().call_later(
+            self.__merge_window, self.__flush_error, channel, message
+        )
+
+    def __flush_error(self, channel: discord.abc.Messageable, message: str) -> None:
+        key = (id(channel), message)
+        self.__timers.pop(key, None)
+        count = self.__errors.pop(key, 0)
+        if not count:
+            return
+
+        embed = self.__embed.error(message if count == 1 else f'{count} canzoni non riprodotte: {message}')
+        self.put(lambda: channel.send(embed=embed, delete_after=5))
+        self.__close_if_idle()
+
+    def clear(self) -> None:
+        self.__pending.clear()
+        self.__now_playing = None
+        self.__errors.clear()
+        for timer in self.__timers.values():
+            timer.cancel()
+        self.__timers.clear()
+
+    def close(self) -> None:
+        self.__closing = True
+        self.__close_if_idle()
+
+    def is_idle(self) -> bool:
+        return not self.__pending and self.__now_playing is None and not self.__errors \
+            and (self.__task is None or self.__task.done())
+
+    def __close_if_idle(self) -> None:
+        if self.__closing and self.is_idle():
+            self.__on_closed(self)
+
+    def __wakeup(self) -> None:
+        if self.__task is None or self.__task.done():
+            self.__task = asyncio.create_task(self.__run())
+
+    async def __run(self) -> None:
+        while self.__pending or self.__now_playing is not None:
+            if self.__pending:
+                job = self.__pending.popleft()
+            else:
+                job, self.__now_playing = self.__now_playing, None
+
+            try:
+                await job()
+            except Exception as error:
+                logger.warning('Failed to send a message in guild %s: %s', self.guild_id, error)
+
+        if self.__closing and not self.__errors:
+            self.__on_closed(self)
+
+
+class Outbox:
+    """
+    Routes the messages the bot sends on its own (errors, notices, now playing) through a bounded
+    per-guild queue drained by a background task, so event listeners never wait on Discord.
+
+    Identical errors posted within the merge window are sent as a single message,
+    and a now playing update that has not been sent yet is replaced by the newer one.
+    """
+    def __init__(self, max_depth: int = 10, merge_window: float = 3) -> None:
+        self.__max_depth: int = max_depth
+        self.__merge_window: float = merge_window
+        self.__embed = EmbedFactory()
+        self.__guilds: dict[int, _GuildOutbox] = {}
+        self.__totals: Counter = Counter(dropped=0, merged=0, superseded=0)
+
+    def __guild(self, guild_id: int) -> _GuildOutbox:
+        if guild_id not in self.__guilds:
+            self.__guilds[guild_id] = _GuildOutbox(
+                guild_id, self.__max_depth, self.__merge_window, self.__embed, self.__totals, self.__remove
+            )
+        return self.__guilds[guild_id]
+
+    def __remove(self, guild_outbox: _GuildOutbox) -> None:
+        # A guild that queued messages again after closing already has a new outbox.
+        if self.__guilds.get(guild_outbox.guild_id) is guild_outbox:
+            del self.__guilds[guild_outbox.guild_id]
+
+    def send(self, guild_id: int, channel: discord.abc.Messageable, embed: discord.Embed,
+             delete_after: Optional[float] = None) -> None:
+        """
+        Queue a message for the channel.
+
+        Args:
+            guild_id (int): The guild id.
+            channel (discord.abc.Messageable): The channel to send the message to.
+            embed (discord.Embed): The message.
+            delete_after (float): Optional delay after which the message is deleted.
+        """
+        self.__guild(guild_id).put(lambda: channel.send(embed=embed, delete_after=delete_after))
+
+    def error(self, guild_id: int, channel: discord.abc.Messageable, message: str) -> None:
+        """
+        Queue an error message, merged with the identical ones posted within the merge window.
+
+        Args:
+            guild_id (int): The guild id.
+            channel (discord.abc.Messageable): The channel to send the message to.
+            message (str): The error.
+        """
+        self.__guild(guild_id).put_error(channel, message)
+
+    def now_playing(self, guild_id: int, job: Job) -> None:
+        """
+        Queue the now playing update of the guild, replacing the one still waiting to be sent.
+
+        Args:
+            guild_id (int): The guild id.
+            job: The coroutine function that shows the now playing message.
+        """
+        self.__guild(guild_id).put_now_playing(job)
+
+    def close(self, guild_id: int) -> None:
+        """
+        Forget the guild once everything already queued for it has been sent.
+
+        Args:
+            guild_id (int): The guild id.
+        """
+        if guild_outbox := self.__guilds.get(guild_id):
+            guild_outbox.close()
+
+    def discard(self, guild_id: int) -> None:
+        """
+        Drop everything still waiting to be sent for the guild and forget it.
+
+        Args:
+            guild_id (int): The guild id.
+        """
+        if guild_outbox := self.__guilds.get(guild_id):
+            guild_outbox.clear()
+            guild_outbox.close()
+
+    def stats(self) -> dict[str, int]:
+        """
+        The messages dropped, merged and superseded since the start, kept across discarded guilds.
+        """
+        return dict(self.__totals)
@@ -0,0 +1,77 @@
+"""
+This module contains the per-guild cache of the rendered queue pages and now playing embeds.
+"""
+
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional
+
+import discord
+import wavelink
+
+
+class RenderCache:
+    """
+    Keeps the embeds already rendered for a guild, so paging back and forth in the queue
+    and showing the same track again do not build them from scratch.
+
+    Queue pages are keyed by the versions of the queues and dropped as soon as the queues change,
+    now playing embeds are keyed by track. Both are LRU caches bounded to max_entries.
+    The cached embeds are shared, they must not be modified after being rendered.
+    """
+    def __init__(self, max_entries: int = 10) -> None:
+        self.__max_entries: int = max_entries
+        self.__pages: OrderedDict[Hashable, discord.Embed] = OrderedDict()
+        self.__pages_version: Optional[Hashable] = None
+        self.__now_playing: OrderedDict[Hashable, discord.Embed] = OrderedDict()
+
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def queue_page(self, version: Hashable, page: int, track_per_page: int,
+                   render: Callable[[], discord.Embed]) -> discord.Embed:
+        """
+        The embed of a queue page, rendered only if the queues changed since it was cached.
+
+        Args:
+            version: The versions of the queues the page is rendered from.
+            page (int): The page number.
+            track_per_page (int): The number of tracks per page.
+            render: The function rendering the page on a miss.
+        """
+        if version != self.__pages_version:
+            self.__pages.clear()
+            self.__pages_version = version
+        return self.__get(self.__pages, (page, track_per_page), render)
+
+    def now_playing(self, track: wavelink.Playable, render: Callable[[], discord.Embed]) -> discord.Embed:
+        """
+        The now playing embed of a track, rendered only the first time the track is shown.
+
+        Args:
+            track (wavelink.Playable): The track.
+            render: The function rendering the embed on a miss.
+        """
+        key = (
+            track.identifier,
+            track.playlist.name if track.playlist else None,
+            getattr(track.extras, 'requester_name', None),
+        )
+        return self.__get(self.__now_playing, key, render)
+
+    def clear(self) -> None:
+        self.__pages.clear()
+        self.__pages_version = None
+        self.__now_playing.clear()
+
+    def __get(self, entries: OrderedDict[Hashable, discord.Embed], key: Hashable,
+              render: Callable[[], discord.Embed]) -> discord.Embed:
+        if (embed := entries.get(key)) is not None:
+            entries.move_to_end(key)
+            self.hits += 1
+            return embed
+
+        self.misses += 1
+        embed = entries[key] = render()
+        if len(entries) > self.__max_entries:
+            entries.popitem(last=False)
+        return embed
@@ -0,0 +1,85 @@
+"""
+This module contains the opt-in recorder of the interactions and wavelink events handled by the bot,
+written as a JSONL trace that benchmarks/replay.py can play back against the fake Lavalink node.
+
+Every line is a compact JSON object with the seconds since the recording started in "t":
+    {"t": 0, "type": "start", "time": 1700000000.0}
+    {"t": 1.2, "type": "command", "guild": 1, "user": 2, "name": "play", "options": {"search": "..."}}
+    {"t": 3.4, "type": "component", "guild": 1, "user": 2, "name": "Skip"}
+    {"t": 3.5, "type": "event", "guild": 1, "name": "track_end", "track": "dQw4w9WgXcQ", "reason": "replaced"}
+"""
+
+import time
+from typing import Any, Optional
+
+import discord
+
+from src.utils.jsonl_writer import JsonlWriter
+
+
+class TraceRecorder:
+    """
+    Buffers the trace records on the event loop and appends them to the trace file on a dedicated thread.
+    """
+    def __init__(self, path: str, flush_interval: float = 5) -> None:
+        self.__writer: JsonlWriter = JsonlWriter(path, flush_interval, name='trace-recorder')
+        self.__started: float = time.monotonic()
+
+    @property
+    def recorded(self) -> int:
+        return self.__writer.written
+
+    async def open(self) -> None:
+        await self.__writer.open()
+        self.__started = time.monotonic()
+        self.__record({'type': 'start', 'time': time.time()})
+
+    async def close(self) -> None:
+        await self.__writer.close()
+
+    def interaction(self, interaction: discord.Interaction, component: Optional[str] = None) -> None:
+        """
+        Record an app command, or a component interaction.
+
+        Args:
+            interaction (discord.Interaction): The interaction.
+            component (str): The name of the item the component interaction is for, when it is known.
+        """
+        if not self.__writer.is_open or not interaction.guild_id:
+            return
+
+        data: dict[str, Any] = interaction.data or {}
+        record = {'guild': interaction.guild_id, 'user': interaction.user.id}
+
+        if interaction.type is discord.InteractionType.application_command:
+            record.update(
+                type='command',
+                name=data.get('name'),
+                options={option['name']: option.get('value') for option in data.get('options', [])},
+            )
+        elif interaction.type is discord.InteractionType.component:
+            record.update(type='component', name=component or data.get('custom_id'))
+            if 'values' in data:
+                record['values'] = len(data['values'])
+        else:
+            return
+
+        self.__record(record)
+
+    def event(self, name: str, guild_id: Optional[int], **data: Any) -> None:
+        """
+        Record a wavelink event.
+
+        Args:
+            name (str): The event name, without the on_wavelink_ prefix.
+            guild_id (int): The guild of the player, None for the node events.
+            **data: The fields of the event worth replaying, they must be JSON serializable.
+        """
+        if self.__writer.is_open:
+            self.__record({'type': 'event', 'guild': guild_id, 'name': name, **data})
+
+    def __record(self, record: dict[str, Any]) -> None:
+        self.__writer.write({'t': round(time.monotonic() - self.__started, 3), **record})
+
+    async def flush(self) -> None:
+        await self.__writer.flush()
@@ -0,0 +1,239 @@
+"""
+This module contains the latency tracing of the interactions, from the interaction to the first audio.
+
+A trace is started for every app command and made current in a context variable, so the code on the
+path of the command records its stages with span() without being handed the trace. The stages that
+happen later, in other tasks, are waits the trace is suspended on: the dropdown of the search results
+resumes it with resumed(), and the track start event of the guild with Tracer.track_started.
+
+A trace is finished once the command and every task that resumed it returned, and it is not waiting
+for anything. Its spans are kept in a
+ring buffer, observed by the stage histogram of the metrics and, optionally, appended to a JSONL file:
+    {"trace_id": "11b3c5a9e0001", "name": "play", "guild": 1, "status": "ok", "total": 0.412,
+     "spans": [["check_voice_channel", 0.0, 0.0001], ["search", 0.0002, 0.12], ...]}
+Spans are [stage, start, duration] in seconds since the trace started, they overlap when stages nest.
+"""
+
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator, NamedTuple, Optional
+
+import discord
+
+from src.metrics.metrics import INTERACTION_STAGE_LATENCY
+from src.utils.jsonl_writer import JsonlWriter
+
+
+logger = logging.getLogger(__name__)
+
+
+_current: ContextVar[Optional['Trace']] = ContextVar('trace', default=None)
+
+
+class Span(NamedTuple):
+    stage: str
+    start: float
+    duration: float
+
+
+class Trace:
+    def __init__(self, tracer: 'Tracer', trace_id: str, name: str, guild_id: Optional[int]) -> None:
+        self.tracer: Tracer = tracer
+        self.trace_id: str = trace_id
+        self.name: str = name
+        self.guild_id: Optional[int] = guild_id
+        self.started: float = time.perf_counter()
+        self.spans: list[Span] = []
+        self.finished: bool = False
+        # The scopes still recording spans: the command, and the tasks that resumed the trace.
+        self.holds: int = 1
+        # The stage the trace is suspended on and when it started waiting.
+        self.waiting: Optional[str] = None
+        self.__waiting_since: float = 0
+
+    def add(self, stage: str, start: float, end: float) -> None:
+        self.spans.append(Span(stage, start - self.started, end - start))
+
+    def wait(self, stage: str) -> None:
+        self.waiting = stage
+        self.__waiting_since = time.perf_counter()
+
+    def resume(self) -> None:
+        if self.waiting is not None:
+            self.add(self.waiting, self.__waiting_since, time.perf_counter())
+            self.waiting = None
+
+    def as_dict(self, status: str) -> dict[str, Any]:
+        return {
+            'trace_id': self.trace_id,
+            'name': self.name,
+            'guild': self.guild_id,
+            'status': status,
+            'total': round(time.perf_counter() - self.started, 6),
+            'spans': [[span.stage, round(span.start, 6), round(span.duration, 6)] for span in self.spans],
+        }
+
+
+def current() -> Optional[Trace]:
+    return _current.get()
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """
+    Record a stage of the current trace, nothing when there is no trace.
+    """
+    trace = _current.get()
+    if trace is None or trace.finished:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(stage, start, time.perf_counter())
+
+
+def suspend(stage: str) -> Optional[Trace]:
+    """
+    Suspend the current trace until it is resumed, the caller keeps it for the task that resumes it.
+    """
+    if trace := _current.get():
+        trace.wait(stage)
+    return trace
+
+
+def handoff(guild_id: int) -> None:
+    """
+    Suspend the current trace until the next track of the guild starts.
+    """
+    if trace := _current.get():
+        trace.tracer.wait_for_track(guild_id, trace)
+
+
+@contextmanager
+def resumed(trace: Optional[Trace]) -> Iterator[None]:
+    """
+    Make a suspended trace current again, ending the stage it waited on, and release it on exit.
+    """
+    if trace is None:
+        yield
+        return
+
+    trace.resume()
+    trace.holds += 1
+    token = _current.set(trace)
+    try:
+        yield
+    except Exception:
+        trace.tracer.finish(trace, 'error')
+        raise
+    else:
+        trace.tracer.release(trace)
+    finally:
+        _current.reset(token)
+
+
+class Tracer:
+    """
+    Starts the traces of the interactions and exports the finished ones.
+    """
+    def __init__(self, buffer_size: int = 500, path: str = '') -> None:
+        self.__traces: deque[dict[str, Any]] = deque(maxlen=buffer_size)
+        self.__writer: Optional[JsonlWriter] = JsonlWriter(path, name='tracer') if path else None
+        self.__awaiting_track: dict[int, Trace] = {}
+
+    async def open(self) -> None:
+        if self.__writer:
+            await self.__writer.open()
+
+    async def close(self) -> None:
+        if self.__writer:
+            await self.__writer.close()
+
+    def start(self, interaction: discord.Interaction) -> Trace:
+        """
+        Start the trace of an interaction and make it the current one of the task handling it.
+        """
+        name = interaction.command.qualified_name if interaction.command else 'interaction'
+        trace = Trace(self, f'{interaction.id:x}', name, interaction.guild_id)
+        _current.set(trace)
+        return trace
+
+    def wait_for_track(self, guild_id: int, trace: Trace) -> None:
+        if (previous := self.__awaiting_track.get(guild_id)) and previous is not trace:
+            self.finish(previous, 'incomplete')
+        trace.wait('track_start')
+        self.__awaiting_track[guild_id] = trace
+
+    def track_started(self, guild_id: int) -> Optional[Trace]:
+        """
+        End the wait of the trace waiting for the first audio of the guild, then suspend it while
+        the now playing message waits in the outbox.
+        """
+        trace = self.__awaiting_track.pop(guild_id, None)
+        if trace is not None:
+            trace.resume()
+            trace.wait('outbox')
+        return trace
+
+    def discard(self, guild_id: int) -> None:
+        if trace := self.__awaiting_track.pop(guild_id, None):
+            self.finish(trace, 'incomplete')
+
+    def release(self, trace: Optional[Trace] = None) -> None:
+        """
+        Release a scope of a trace, the current one by default, and finish the trace when it was the last
+        one and the trace is not suspended on a later stage.
+        """
+        trace = trace or _current.get()
+        if trace is None:
+            return
+
+        trace.holds -= 1
+        if trace.holds <= 0 and trace.waiting is None:
+            self.finish(trace, 'ok')
+
+    def finish(self, trace: Trace, status: str) -> None:
+        if trace.finished:
+            return
+
+        trace.finished = True
+        record = trace.as_dict(status)
+        self.__traces.append(record)
+        for stage, _, duration in record['spans']:
+            INTERACTION_STAGE_LATENCY.observe(duration, stage=stage)
+        INTERACTION_STAGE_LATENCY.observe(record['total'], stage='total')
+        if self.__writer:
+            self.__writer.write(record)
+        logger.debug('Trace finished', extra={
+            'trace_id': trace.trace_id, 'guild_id': trace.guild_id, 'command': trace.name,
+            'status': status, 'latency': record['total']
+        })
+
+    def traces(self) -> list[dict[str, Any]]:
+        return list(self.__traces)
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """
+        The count, p50 and p99 of every stage over the traces in the ring buffer, and of the whole trace.
+        """
+        durations: dict[str, list[float]] = {}
+        for record in self.__traces:
+            for stage, _, duration in record['spans']:
+                durations.setdefault(stage, []).append(duration)
+            durations.setdefault('total', []).append(record['total'])
+
+        summary = {}
+        for stage, values in durations.items():
+            values.sort()
+            summary[stage] = {
+                'count': len(values),
+                'p50': values[int(len(values) * 0.5)],
+                'p99': values[min(len(values) - 1, int(len(values) * 0.99))],
+            }
+        return summary
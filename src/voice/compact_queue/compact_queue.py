@@ -0,0 +1,277 @@
+"""
+This module contains the compact queue used by the players, which stores the queued tracks
+as small records and only rebuilds wavelink.Playable objects when they are needed.
+"""
+
+import weakref
+from typing import Any, Iterable, Iterator, Optional, SupportsIndex
+
+import wavelink
+
+from src.voice.compact_queue.track_codec import decode_track, TrackDecodeError
+
+
+class TrackContext:
+    """
+    What a track knows besides its encoded string: its extras (the requester), its playlist,
+    whether it was recommended and the plugin info the node returned with it, which is not part
+    of the encoded string. Contexts are interned, so all the tracks queued by the same request
+    share a single one unless their plugin info differs.
+    """
+    __slots__ = ('extras', 'playlist', 'recommended', 'plugin_info', '__weakref__')
+
+    __interned: 'weakref.WeakValueDictionary[tuple, TrackContext]' = weakref.WeakValueDictionary()
+
+    def __init__(self, extras: dict[str, Any], playlist: Optional[wavelink.PlaylistInfo], recommended: bool,
+                 plugin_info: dict[str, Any]) -> None:
+        self.extras: dict[str, Any] = extras
+        self.playlist: Optional[wavelink.PlaylistInfo] = playlist
+        self.recommended: bool = recommended
+        self.plugin_info: dict[str, Any] = plugin_info
+
+    @classmethod
+    def of(cls, track: wavelink.Playable) -> 'TrackContext':
+        return cls.intern(dict(track.extras), track.playlist, track.recommended, track.raw_data.get('pluginInfo') or {})
+
+    @classmethod
+    def intern(cls, extras: dict[str, Any], playlist: Optional[wavelink.PlaylistInfo], recommended: bool,
+               plugin_info: dict[str, Any]) -> 'TrackContext':
+        try:
+            key = (tuple(sorted(extras.items())), id(playlist), recommended, tuple(sorted(plugin_info.items())))
+            hash(key)
+        except TypeError:
+            return cls(extras, playlist, recommended, plugin_info)
+
+        # The context keeps its playlist alive, so the playlist id in the key cannot be reused.
+        if (context := cls.__interned.get(key)) is None:
+            context = cls(extras, playlist, recommended, plugin_info)
+            cls.__interned[key] = context
+        return context
+
+
+class QueueEntry:
+    """
+    A queued track: its encoded string, its length and its shared context.
+    """
+    __slots__ = ('encoded', 'length', 'context')
+
+    def __init__(self, encoded: str, length: int, context: TrackContext) -> None:
+        self.encoded: str = encoded
+        self.length: int = length
+        self.context: TrackContext = context
+
+    @property
+    def extras(self) -> dict[str, Any]:
+        return self.context.extras
+
+    def materialize(self) -> wavelink.Playable:
+        """
+        Rebuild the wavelink.Playable of the entry, decoding the encoded string locally.
+        """
+        data = decode_track(self.encoded)
+        data['pluginInfo'] = self.context.plugin_info
+        track = wavelink.Playable(data, playlist=self.context.playlist)
+        track.extras = self.context.extras
+        track._recommended = self.context.recommended
+        return track
+
+
+Item = QueueEntry | wavelink.Playable
+
+
+class CompactQueue(wavelink.Queue):
+    """
+    A wavelink.Queue that stores QueueEntry records instead of wavelink.Playable objects.
+
+    Tracks are compacted when they are put in the queue and materialized again only when they are
+    read: when the player gets the next track or a page of the queue is rendered.
+    Tracks whose encoded string cannot be decoded locally are kept as they are: they are decoded
+    once when compacted, so materializing an entry never fails.
+    The history of the queue is a CompactQueue too.
+
+    Every change to the queued items bumps the version, so views over the queue can tell when they are stale.
+    """
+    def __init__(self, *, history: bool = True) -> None:
+        super().__init__(history=False)
+        self._history: Optional[CompactQueue] = CompactQueue(history=False) if history else None
+        self.version: int = 0
+
+    def _touch(self) -> None:
+        self.version += 1
+
+    @staticmethod
+    def _decodes(encoded: str) -> bool:
+        try:
+            decode_track(encoded)
+        except TrackDecodeError:
+            return False
+        return True
+
+    @classmethod
+    def _compact(cls, track: wavelink.Playable) -> Item:
+        if not cls._decodes(track.encoded):
+            return track
+        return QueueEntry(track.encoded, track.length, TrackContext.of(track))
+
+    @staticmethod
+    def _materialize(item: Item) -> wavelink.Playable:
+        return item.materialize() if isinstance(item, QueueEntry) else item
+
+    def entries(self) -> list[Item]:
+        """
+        The queued items as stored, without materializing them.
+        """
+        return self._items.copy()
+
+    def __getitem__(self, index: SupportsIndex | slice, /) -> wavelink.Playable | list[wavelink.Playable]:
+        if isinstance(index, slice):
+            return [self._materialize(item) for item in self._items[index]]
+        return self._materialize(self._items[index])
+
+    def __setitem__(self, index: SupportsIndex, value: wavelink.Playable, /) -> None:
+        self._check_compatibility(value)
+        self._items[index] = self._compact(value)
+        self._touch()
+
+    def __delitem__(self, index: int | slice, /) -> None:
+        del self._items[index]
+        self._touch()
+
+    def __contains__(self, other: wavelink.Playable) -> bool:
+        return any(item.encoded == other.encoded for item in self._items)
+
+    def __iter__(self) -> Iterator[wavelink.Playable]:
+        return (self._materialize(item) for item in self._items)
+
+    def __reversed__(self) -> Iterator[wavelink.Playable]:
+        return (self._materialize(item) for item in reversed(self._items))
+
+    def get(self) -> wavelink.Playable:
+        if self.mode is wavelink.QueueMode.loop and self._loaded:
+            return self._loaded
+
+        if self.mode is wavelink.QueueMode.loop_all and not self:
+            self._items.extend(self.history._items)
+            self.history.clear()
+
+        if not self:
+            raise wavelink.QueueEmpty('There are no items currently in this queue.')
+
+        track = self._materialize(self._items.pop(0))
+        self._loaded = track
+        self._touch()
+        return track
+
+    def get_at(self, index: int, /) -> wavelink.Playable:
+        if not self:
+            raise wavelink.QueueEmpty('There are no items currently in this queue.')
+
+        track = self._materialize(self._items.pop(index))
+        self._loaded = track
+        self._touch()
+        return track
+
+    def put_at(self, index: int, value: wavelink.Playable, /) -> None:
+        self._check_compatibility(value)
+        self._items.insert(index, self._compact(value))
+        self._touch()
+        self._wakeup_next()
+
+    def put(self, item: list[wavelink.Playable] | wavelink.Playable | wavelink.Playlist, /, *,
+            atomic: bool = True) -> int:
+        if isinstance(item, Iterable):
+            if atomic:
+                self._check_atomic(item)
+                tracks = list(item)
+            else:
+                tracks = [track for track in item if isinstance(track, wavelink.Playable)]
+        else:
+            self._check_compatibility(item)
+            tracks = [item]
+
+        self._items.extend(self._compact(track) for track in tracks)
+        self._touch()
+        self._wakeup_next()
+        return len(tracks)
+
+    async def put_wait(self, item: list[wavelink.Playable] | wavelink.Playable | wavelink.Playlist, /, *,
+                       atomic: bool = True) -> int:
+        async with self._lock:
+            return self.put(item, atomic=atomic)
+
+    def delete(self, index: int, /) -> None:
+        super().delete(index)
+        self._touch()
+
+    def swap(self, first: int, second: int, /) -> None:
+        self._items[first], self._items[second] = self._items[second], self._items[first]
+        self._touch()
+
+    def shuffle(self) -> None:
+        super().shuffle()
+        self._touch()
+
+    def clear(self) -> None:
+        super().clear()
+        self._touch()
+
+    def replace(self, item: Item, track: wavelink.Playable) -> bool:
+        """
+        Replace a stored item with another track, keeping the context (requester, playlist) of the item.
+
+        Args:
+            item: The item as returned by entries().
+            track (wavelink.Playable): The track replacing it.
+
+        Returns:
+            bool: False if the item is no longer in the queue.
+        """
+        for index, queued in enumerate(self._items):
+            if queued is item:
+                if isinstance(item, QueueEntry) and self._decodes(track.encoded):
+                    context = item.context
+                    context = TrackContext.intern(context.extras, context.playlist, context.recommended,
+                                                  track.raw_data.get('pluginInfo') or {})
+                    self._items[index] = QueueEntry(track.encoded, track.length, context)
+                else:
+                    track.extras = dict(item.extras)
+                    self._items[index] = self._compact(track)
+                self._touch()
+                return True
+        return False
+
+    def discard(self, item: Item) -> bool:
+        """
+        Remove a stored item, as returned by entries().
+
+        Returns:
+            bool: False if the item is no longer in the queue.
+        """
+        for index, queued in enumerate(self._items):
+            if queued is item:
+                del self[index]
+                return True
+        return False
+
+    def index(self, item: wavelink.Playable, /) -> int:
+        for index, queued in enumerate(self._items):
+            if queued.encoded == item.encoded:
+                return index
+        raise ValueError(f'{item!r} is not in the queue')
+
+    def remove(self, item: wavelink.Playable, /, count: int | None = 1) -> int:
+        deleted_count = 0
+        for queued in self._items.copy():
+            if queued.encoded == item.encoded:
+                self._items.remove(queued)
+                deleted_count += 1
+                if count is not None and deleted_count >= count:
+                    break
+        if deleted_count:
+            self._touch()
+        return deleted_count
+
+    def copy(self) -> 'CompactQueue':
+        copy_queue = CompactQueue(history=self.history is not None)
+        copy_queue._items = self._items.copy()
+        return copy_queue
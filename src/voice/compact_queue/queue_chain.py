@@ -0,0 +1,67 @@
+"""
+This module contains the read-only view chaining the queue and the auto queue of a player.
+"""
+
+from typing import SupportsIndex
+
+import wavelink
+
+from src.voice.compact_queue.compact_queue import CompactQueue
+
+
+class QueueChain:
+    """
+    A read-only view over the queue followed by the auto queue, without copying either of them.
+
+    The length is computed in O(1) and a slice only materializes the tracks it contains.
+    The view records the versions of the queues when it is created or refreshed, so a reader can
+    tell whether the queues changed since then instead of holding a snapshot of them.
+    """
+    def __init__(self, queue: CompactQueue, auto_queue: CompactQueue) -> None:
+        self.__queue: CompactQueue = queue
+        self.__auto_queue: CompactQueue = auto_queue
+        self.__versions: tuple[int, int] = self.versions
+
+    def __len__(self) -> int:
+        return len(self.__queue) + len(self.__auto_queue)
+
+    @property
+    def count(self) -> int:
+        return len(self)
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.__queue and not self.__auto_queue
+
+    @property
+    def is_stale(self) -> bool:
+        """
+        Whether one of the queues changed since the view was created or last refreshed.
+        """
+        return self.__versions != self.versions
+
+    @property
+    def versions(self) -> tuple[int, int]:
+        """
+        The current versions of the queue and the auto queue.
+        """
+        return self.__queue.version, self.__auto_queue.version
+
+    def refresh(self) -> None:
+        self.__versions = self.versions
+
+    def __getitem__(self, index: SupportsIndex | slice) -> wavelink.Playable | list[wavelink.Playable]:
+        split = len(self.__queue)
+
+        if not isinstance(index, slice):
+            index = range(len(self))[index]
+            return self.__queue[index] if index < split else self.__auto_queue[index - split]
+
+        start, stop, step = index.indices(len(self))
+        if step != 1:
+            return [self[i] for i in range(start, stop, step)]
+
+        tracks = self.__queue[start:min(stop, split)] if start < split else []
+        if stop > split:
+            tracks += self.__auto_queue[max(start - split, 0):stop - split]
+        return tracks
@@ -0,0 +1,181 @@
+"""
+This module contains a local decoder (and encoder) for the Lavalink encoded track format,
+so queued tracks can be rebuilt without a round trip to the node.
+"""
+
+import base64
+import re
+import struct
+from typing import Any, Optional
+
+
+# Lavaplayer message header: the two high bits are the flags, the others the message size.
+_FLAG_VERSIONED = 1
+_SUPPORTED_VERSIONS = (1, 2, 3)
+_SURROGATES = re.compile('[\ud800-\udfff]')
+
+
+class TrackDecodeError(ValueError):
+    """
+    Raised when an encoded track is not in a format the local decoder understands.
+    """
+
+
+class _Reader:
+    def __init__(self, data: bytes) -> None:
+        self.__data: bytes = data
+        self.__offset: int = 0
+
+    def read(self, size: int) -> bytes:
+        if self.__offset + size > len(self.__data):
+            raise TrackDecodeError('Truncated track')
+        chunk = self.__data[self.__offset:self.__offset + size]
+        self.__offset += size
+        return chunk
+
+    def byte(self) -> int:
+        return self.read(1)[0]
+
+    def boolean(self) -> bool:
+        return self.byte() != 0
+
+    def long(self) -> int:
+        return struct.unpack('>q', self.read(8))[0]
+
+    def utf(self) -> str:
+        size = struct.unpack('>H', self.read(2))[0]
+        return _decode_modified_utf8(self.read(size))
+
+    def nullable_utf(self) -> Optional[str]:
+        return self.utf() if self.boolean() else None
+
+
+def _decode_modified_utf8(data: bytes) -> str:
+    # Java's DataOutput.writeUTF encodes NUL as two bytes and supplementary characters as surrogate pairs.
+    text = data.replace(b'\xc0\x80', b'\x00').decode('utf-8', 'surrogatepass')
+    if not text.isascii() and _SURROGATES.search(text):
+        text = text.encode('utf-16', 'surrogatepass').decode('utf-16')
+    return text
+
+
+def _encode_modified_utf8(text: str) -> bytes:
+    data = text.encode('utf-16-be', 'surrogatepass')
+    units = ''.join(chr(unit) for unit in struct.unpack(f'>{len(data) // 2}H', data))
+    return units.encode('utf-8', 'surrogatepass').replace(b'\x00', b'\xc0\x80')
+
+
+def track_version(encoded: str) -> Optional[int]:
+    """
+    The version of an encoded track, read from its header only.
+
+    Args:
+        encoded (str): The encoded track.
+
+    Returns:
+        Optional[int]: The version, None if the header is not valid.
+    """
+    try:
+        header = base64.b64decode(encoded[:8])
+    except ValueError:
+        return None
+    if len(header) < 5:
+        return None
+
+    flags = struct.unpack('>I', header[:4])[0] >> 30
+    return header[4] if flags & _FLAG_VERSIONED else 1
+
+
+def is_supported(encoded: str) -> bool:
+    return track_version(encoded) in _SUPPORTED_VERSIONS
+
+
+def decode_track(encoded: str) -> dict[str, Any]:
+    """
+    Decode an encoded track into the payload Lavalink would return for it.
+
+    The source specific fields and the plugin info are not part of the decoded payload.
+
+    Args:
+        encoded (str): The encoded track.
+
+    Returns:
+        dict[str, Any]: The track payload, as accepted by wavelink.Playable.
+
+    Raises:
+        TrackDecodeError: If the track cannot be decoded.
+    """
+    try:
+        data = base64.b64decode(encoded)
+    except ValueError as error:
+        raise TrackDecodeError(str(error)) from error
+
+    reader = _Reader(data)
+    header = struct.unpack('>I', reader.read(4))[0]
+    version = reader.byte() if (header >> 30) & _FLAG_VERSIONED else 1
+    if version not in _SUPPORTED_VERSIONS:
+        raise TrackDecodeError(f'Unsupported track version {version}')
+
+    title = reader.utf()
+    author = reader.utf()
+    length = reader.long()
+    identifier = reader.utf()
+    is_stream = reader.boolean()
+    uri = reader.nullable_utf() if version >= 2 else None
+    artwork_url = reader.nullable_utf() if version >= 3 else None
+    isrc = reader.nullable_utf() if version >= 3 else None
+    source_name = reader.utf()
+    # The source specific fields sit in between, the position is always the last field.
+    position = struct.unpack('>q', data[-8:])[0]
+
+    return {
+        'encoded': encoded,
+        'info': {
+            'identifier': identifier,
+            'isSeekable': not is_stream,
+            'author': author,
+            'length': length,
+            'isStream': is_stream,
+            'position': position,
+            'title': title,
+            'uri': uri,
+            'artworkUrl': artwork_url,
+            'isrc': isrc,
+            'sourceName': source_name,
+        },
+        'pluginInfo': {},
+        'userData': {},
+    }
+
+
+def encode_track(info: dict[str, Any]) -> str:
+    """
+    Encode track info in the version 3 format, without source specific fields.
+
+    Args:
+        info (dict[str, Any]): The track info, with the same keys Lavalink uses.
+
+    Returns:
+        str: The encoded track.
+    """
+    def utf(text: str) -> bytes:
+        data = _encode_modified_utf8(text)
+        return struct.pack('>H', len(data)) + data
+
+    def nullable_utf(text: Optional[str]) -> bytes:
+        return b'\x00' if text is None else b'\x01' + utf(text)
+
+    body = b''.join((
+        bytes((3,)),
+        utf(info['title']),
+        utf(info['author']),
+        struct.pack('>q', info['length']),
+        utf(info['identifier']),
+        bytes((int(info['isStream']),)),
+        nullable_utf(info.get('uri')),
+        nullable_utf(info.get('artworkUrl')),
+        nullable_utf(info.get('isrc')),
+        utf(info['sourceName']),
+        struct.pack('>q', info.get('position', 0)),
+    ))
+    header = struct.pack('>I', (_FLAG_VERSIONED << 30) | len(body))
+    return base64.b64encode(header + body).decode()
@@ -1,14 +1,29 @@
+import asyncio
 from typing import Optional
 
 import discord
 
+from src.utils.render_cache import RenderCache
+from src.voice.prefetcher.prefetcher import Prefetcher, TransitionStats
+from src.voice.recommender.recommender import Recommender
 from src.voice.voice_state.voice_player import VoicePlayer
 
 
 class GuildMusicData:
-    def __init__(self, channel_id: int, voice_player: VoicePlayer, auto_queue: bool) -> None:
+    def __init__(self, channel_id: int, voice_player: VoicePlayer, auto_queue: bool,
+                 render_cache_size: int = 10, prefetch_depth: int = 3,
+                 recommender: Optional[Recommender] = None) -> None:
         self.channel_id: int = channel_id
+        self.channel: Optional[discord.abc.Messageable] = None
         self.voice_player: VoicePlayer = voice_player
         self.last_view: Optional[discord.ui.View] = None
         self.last_mess: Optional[discord.Message] = None
+        self.messages_after_last_mess: int = 0
         self.auto_queue: bool = auto_queue
+        self.render_cache: RenderCache = RenderCache(render_cache_size)
+        self.enqueue_task: Optional[asyncio.Task] = None
+        self.prefetcher: Prefetcher = Prefetcher(prefetch_depth)
+        self.transitions: TransitionStats = TransitionStats()
+        self.recommender: Optional[Recommender] = recommender
+        # Set while the player is moved to another node, its old player is torn down meanwhile.
+        self.migrating: bool = False
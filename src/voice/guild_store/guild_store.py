@@ -0,0 +1,192 @@
+"""
+This module contains the SQLite store that persists the guild music state across restarts.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+Snapshot = dict[str, Any]
+
+# How long a write waits, in seconds, for the write lock held by another cluster sharing the database.
+BUSY_TIMEOUT = 30
+
+
+class GuildStore:
+    """
+    Persists a snapshot of every guild music state in a SQLite (WAL) database.
+
+    Writes are write-behind: guilds are only marked dirty on the event loop, their snapshots
+    are taken at the next flush and written in a batch on a dedicated thread.
+    Position updates are tracked separately, so they do not rewrite the whole queue.
+
+    In cluster mode every cluster opens the same database. That is safe: with WAL the readers never
+    block, each cluster only writes the rows of the guilds of its own shards, always from its store
+    thread, and a write waits up to BUSY_TIMEOUT seconds for the write lock held by another cluster.
+    Sharing the file also keeps the guild states when the shards are split differently across clusters.
+    """
+    def __init__(self, path: str, flush_interval: float = 5) -> None:
+        self.__path: str = path
+        self.__flush_interval: float = flush_interval
+
+        self.__executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='guild-store')
+        self.__connection: Optional[sqlite3.Connection] = None
+        self.__snapshot: Optional[Callable[[int], Optional[Snapshot]]] = None
+        self.__task: Optional[asyncio.Task] = None
+
+        self.__dirty: set[int] = set()
+        self.__deleted: set[int] = set()
+        self.__positions: dict[int, int] = {}
+
+    @property
+    def is_open(self) -> bool:
+        return self.__connection is not None
+
+    async def __run(self, function: Callable, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.__executor, function, *args)
+
+    async def open(self, snapshot: Callable[[int], Optional[Snapshot]]) -> None:
+        """
+        Open the database and start the write-behind task.
+
+        Args:
+            snapshot: The function returning the snapshot of a guild, or None if the guild has no state.
+        """
+        self.__snapshot = snapshot
+        await self.__run(self.__open)
+        self.__task = asyncio.create_task(self.__flush_loop())
+
+    async def close(self) -> None:
+        """
+        Flush the pending writes and close the database.
+        """
+        if self.__task is not None:
+            self.__task.cancel()
+            self.__task = None
+        if self.__connection is None:
+            return
+
+        await self.flush()
+        await self.__run(self.__close)
+        self.__executor.shutdown(wait=False)
+
+    def mark(self, guild_id: int) -> None:
+        """
+        Mark the guild state as changed, it will be saved at the next flush.
+        """
+        if self.__connection is not None:
+            self.__deleted.discard(guild_id)
+            self.__dirty.add(guild_id)
+
+    def mark_position(self, guild_id: int, position: int) -> None:
+        if self.__connection is not None:
+            self.__positions[guild_id] = position
+
+    def delete(self, guild_id: int) -> None:
+        if self.__connection is not None:
+            self.__dirty.discard(guild_id)
+            self.__positions.pop(guild_id, None)
+            self.__deleted.add(guild_id)
+
+    async def load(self) -> list[Snapshot]:
+        """
+        Load every saved snapshot.
+        """
+        return await self.__run(self.__load)
+
+    async def flush(self) -> None:
+        """
+        Write the pending changes in a single transaction.
+        """
+        if self.__connection is None or not (self.__dirty or self.__deleted or self.__positions):
+            return
+
+        snapshots: list[Snapshot] = []
+        for guild_id in self.__dirty:
+            if (snapshot := self.__snapshot(guild_id)) is not None:
+                snapshots.append(snapshot)
+            else:
+                self.__deleted.add(guild_id)
+
+        positions = [(position, guild_id) for guild_id, position in self.__positions.items()]
+        deleted = list(self.__deleted)
+
+        self.__dirty = set()
+        self.__deleted = set()
+        self.__positions = {}
+
+        await self.__run(self.__write, snapshots, positions, deleted)
+
+    async def __flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.__flush_interval)
+            try:
+                await self.flush()
+            except sqlite3.Error as error:
+                logger.error('Failed to save the guild states: %s', error)
+            except Exception:
+                # Anything else would end the loop and silently stop saving, cancellation still ends it.
+                logger.exception('Unexpected error while saving the guild states')
+
+    # --- Executor thread --- #
+
+    def __open(self) -> None:
+        if directory := os.path.dirname(self.__path):
+            os.makedirs(directory, exist_ok=True)
+
+        connection = sqlite3.connect(self.__path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS guild_state ('
+            'guild_id INTEGER PRIMARY KEY, '
+            'data TEXT NOT NULL, '
+            'position INTEGER NOT NULL DEFAULT 0, '
+            'saved_at REAL NOT NULL)'
+        )
+        connection.commit()
+        self.__connection = connection
+
+    def __close(self) -> None:
+        self.__connection.close()
+        self.__connection = None
+
+    def __load(self) -> list[Snapshot]:
+        snapshots = []
+        for guild_id, data, position, saved_at in self.__connection.execute(
+            'SELECT guild_id, data, position, saved_at FROM guild_state'
+        ):
+            snapshot = json.loads(data)
+            snapshot['guild_id'] = guild_id
+            snapshot['position'] = position
+            snapshot['saved_at'] = saved_at
+            snapshots.append(snapshot)
+        return snapshots
+
+    def __write(self, snapshots: list[Snapshot], positions: list[tuple[int, int]], deleted: list[int]) -> None:
+        now = time.time()
+        with self.__connection:
+            self.__connection.executemany(
+                'INSERT OR REPLACE INTO guild_state (guild_id, data, position, saved_at) VALUES (?, ?, ?, ?)',
+                [
+                    (snapshot['guild_id'], json.dumps(snapshot, separators=(',', ':')), snapshot['position'], now)
+                    for snapshot in snapshots
+                ]
+            )
+            self.__connection.executemany(
+                'UPDATE guild_state SET position = ?, saved_at = ? WHERE guild_id = ?',
+                [(position, now, guild_id) for position, guild_id in positions]
+            )
+            self.__connection.executemany(
+                'DELETE FROM guild_state WHERE guild_id = ?',
+                [(guild_id,) for guild_id in deleted]
+            )
@@ -1,3 +1,5 @@
+import asyncio
+import logging
 from typing import Optional
 
 import discord
@@ -7,37 +9,72 @@ import wavelink
 
 from src.exceptions.player_exceptions import IllegalState
 from src.exceptions.QueueException import QueueEmpty
+from src.search.search_cache import SearchCache
+from src.search.track_index import IndexedTrack
 from src.utils.embed import EmbedFactory
+from src.utils.render_cache import RenderCache
+from src.utils import tracing
+from src.voice.compact_queue.compact_queue import CompactQueue, QueueEntry
+from src.voice.compact_queue.track_codec import decode_track, TrackDecodeError
+from src.voice.compact_queue.queue_chain import QueueChain
 from src.voice.guild_data.guild_data import GuildMusicData
+from src.voice.guild_store.guild_store import GuildStore, Snapshot
+from src.voice.node_pool.node_pool import NodePool
+from src.voice.recommender.recommender import Recommender
+from src.voice.session_registry.session_registry import SessionRegistry
 from src.voice.voice_state.voice_player import VoicePlayer
 
+
+logger = logging.getLogger(__name__)
+
+
 class GuildVoiceState:
-    def __init__(self):
-        self.__guild_state: dict = {}
+    def __init__(self, node_pool: NodePool, guild_store: GuildStore, saved_history: int = 50,
+                 render_cache_size: int = 10, enqueue_batch_size: int = 50, enqueue_progress_interval: float = 1,
+                 prefetch_depth: int = 3, search_cache: Optional[SearchCache] = None, recommend_depth: int = 22,
+                 recommend_seeds: int = 3, sessions: Optional[SessionRegistry] = None):
+        self.__sessions: SessionRegistry = sessions if sessions is not None else SessionRegistry()
+        self.__node_pool: NodePool = node_pool
+        self.__guild_store: GuildStore = guild_store
+        self.__saved_history: int = saved_history
+        self.__render_cache_size: int = render_cache_size
+        self.__enqueue_batch_size: int = enqueue_batch_size
+        self.__enqueue_progress_interval: float = enqueue_progress_interval
+        self.__prefetch_depth: int = prefetch_depth
+        self.__search_cache: Optional[SearchCache] = search_cache
+        self.__recommend_depth: int = recommend_depth
+        self.__recommend_seeds: int = recommend_seeds
+        self.__failing_over: set[str] = set()
         self.__embed = EmbedFactory()
 
     async def guild_clean_up(self, guild_id):
         if guild_state := self.__get_guild_state(guild_id):
+            self.__cancel_enqueue(guild_state)
+            guild_state.prefetcher.cancel()
+            if guild_state.recommender:
+                guild_state.recommender.cancel()
             if guild_state.last_view and not guild_state.last_view.is_finished():
                 if guild_state.last_mess:
                     await guild_state.last_mess.edit(view=None)
                 guild_state.last_view.stop()
             self.__del_guild_state(guild_id)
+            self.__guild_store.delete(guild_id)
 
 
     def __del_guild_state(self, guild_id: int) -> None:
-        self.__guild_state.pop(guild_id)
+        self.__sessions.unbind(guild_id)
 
-    def __get_guild_state(self, guild_id: int) -> GuildMusicData:
-        return self.__guild_state.get(guild_id)
+    def __get_guild_state(self, guild_id: int) -> Optional[GuildMusicData]:
+        session = self.__sessions.get(guild_id)
+        return session.data if session else None
 
-    def __set_guild_state(self, guild_id: int, data: GuildMusicData) -> None:
-        self.__guild_state[guild_id] = data
+    def __set_guild_state(self, guild_id: int, voice_client: discord.VoiceProtocol, data: GuildMusicData) -> None:
+        self.__sessions.bind(guild_id, voice_client, data)
 
     def __ensure_guild_state(self, guild_id: int) -> GuildMusicData:
-        guild_state = self.__get_guild_state(guild_id)
+        guild_state = self.__sessions.music_data(guild_id)
 
-        if not guild_state or not guild_state.voice_player.is_connected():
+        if not guild_state:
             raise IllegalState
 
         return guild_state
@@ -62,11 +99,14 @@ class GuildVoiceState:
                     "Caricamento in corso...",
                 )
 
-        await self.__play(
-            interaction,
-            guild_state,
-            tracks,
-        )
+        with tracing.span('play'):
+            await self.__play(
+                interaction,
+                guild_state,
+                tracks,
+                progress=bool(current) or len(tracks) > 1
+            )
+        self.__guild_store.mark(interaction.guild_id)
 
         if not current and len(tracks) <= 1:
             await interaction.delete_original_response()
@@ -86,13 +126,61 @@ class GuildVoiceState:
         self.__get_guild_state(guild_id).last_view = view
 
     def set_last_mess(self, guild_id: int, mess: discord.Message) -> None:
-        self.__get_guild_state(guild_id).last_mess = mess
+        guild_state = self.__get_guild_state(guild_id)
+        guild_state.last_mess = mess
+        guild_state.messages_after_last_mess = 0
+
+    def is_last_mess_buried(self, guild_id: int, max_messages: int) -> bool:
+        guild_state = self.__ensure_guild_state(guild_id)
+
+        return guild_state.messages_after_last_mess > max_messages
+
+    def message_sent(self, guild_id: int, channel_id: int) -> None:
+        """
+        Count a message sent in the bound channel after the now playing message.
+        """
+        guild_state = self.__get_guild_state(guild_id)
+        if guild_state and guild_state.last_mess and guild_state.channel_id == channel_id:
+            guild_state.messages_after_last_mess += 1
+
+    def message_deleted(self, guild_id: int, message_id: int) -> None:
+        """
+        Forget the now playing message once it has been deleted.
+        """
+        guild_state = self.__get_guild_state(guild_id)
+        if guild_state and guild_state.last_mess and guild_state.last_mess.id == message_id:
+            guild_state.last_mess = None
+
+    def get_render_cache(self, guild_id: int) -> RenderCache:
+        guild_state = self.__ensure_guild_state(guild_id)
+
+        return guild_state.render_cache
 
     def get_channel_id(self, guild_id: int) -> int:
         guild_state = self.__ensure_guild_state(guild_id)
 
         return guild_state.channel_id
 
+    def get_channel(self, guild_id: int) -> Optional[discord.abc.Messageable]:
+        guild_state = self.__ensure_guild_state(guild_id)
+
+        return guild_state.channel
+
+    def set_channel(self, guild_id: int, channel: discord.abc.Messageable) -> None:
+        self.__get_guild_state(guild_id).channel = channel
+
+    def invalidate_channel(self, guild_id: int, channel_id: Optional[int] = None) -> None:
+        """
+        Drop the cached text channel of a guild, so it is resolved again on the next message.
+
+        Args:
+            guild_id (int): The guild id.
+            channel_id (int): Only invalidate if the guild is bound to this channel, any channel if None.
+        """
+        if guild_state := self.__get_guild_state(guild_id):
+            if channel_id is None or guild_state.channel_id == channel_id:
+                guild_state.channel = None
+
 
     ## ----------------- ##
     ## player UI methods ##
@@ -123,6 +211,7 @@ class GuildVoiceState:
 
     def toggle_loop(self, interaction: Interaction) -> wavelink.QueueMode:
         guild_state = self.__ensure_guild_state(interaction.guild_id)
+        self.__guild_store.mark(interaction.guild_id)
         queue_mode = guild_state.voice_player.get_queue_mode()
 
         if queue_mode == wavelink.QueueMode.normal:
@@ -140,22 +229,20 @@ class GuildVoiceState:
 
         return guild_state.voice_player.get_queue_mode()
 
-    def auto_queue(self, interaction: Interaction) -> wavelink.Queue:
+    def auto_queue(self, interaction: Interaction) -> CompactQueue:
         guild_state = self.__ensure_guild_state(interaction.guild_id)
 
         return guild_state.voice_player.auto_queue()
 
-    def queue(self, interaction: Interaction) -> wavelink.Queue:
+    def queue(self, interaction: Interaction) -> CompactQueue:
         guild_state = self.__ensure_guild_state(interaction.guild_id)
 
         return guild_state.voice_player.queue()
 
-    def queues(self, interaction: Interaction) -> wavelink.Queue:
+    def queues(self, interaction: Interaction) -> QueueChain:
         guild_state = self.__ensure_guild_state(interaction.guild_id)
-        queue: wavelink.Queue = guild_state.voice_player.queue().copy()
-        auto_queue: wavelink.Queue = guild_state.voice_player.auto_queue()
+        queue = QueueChain(guild_state.voice_player.queue(), guild_state.voice_player.auto_queue())
 
-        queue.put(list(auto_queue)) #PROVARE
         if queue.is_empty:
             raise QueueEmpty
 
@@ -175,6 +262,7 @@ class GuildVoiceState:
             vc_player.set_queue_mode(wavelink.QueueMode.loop_all)
 
         await vc_player.play_previous(previous_track)
+        self.__guild_store.mark(interaction.guild_id)
 
     async def skip(self, interaction: Interaction, force: bool = True) -> None:
         guild_state = self.__ensure_guild_state(interaction.guild_id)
@@ -184,6 +272,7 @@ class GuildVoiceState:
             guild_state.voice_player.set_queue_mode(wavelink.QueueMode.loop_all)
         force = False if queue_mode == wavelink.QueueMode.loop_all else force
         await guild_state.voice_player.skip(force)
+        self.__guild_store.mark(interaction.guild_id)
 
     async def reset(self, interaction: Interaction) -> None:
         guild_state = self.__ensure_guild_state(interaction.guild_id)
@@ -192,9 +281,15 @@ class GuildVoiceState:
             guild_state.voice_player.set_queue_mode(wavelink.QueueMode.normal)
         if guild_state.auto_queue and guild_state.voice_player.get_auto_play_mode() != wavelink.AutoPlayMode.partial:
             guild_state.voice_player.set_auto_play_mode(wavelink.AutoPlayMode.partial)
-            print(guild_state.voice_player.get_auto_play_mode())
+            logger.debug('Auto play mode reset', extra={
+                'guild_id': interaction.guild_id, 'mode': guild_state.voice_player.get_auto_play_mode().name
+            })
 
+        self.__cancel_enqueue(guild_state)
+        if guild_state.recommender:
+            guild_state.recommender.cancel()
         await guild_state.voice_player.reset()
+        self.__guild_store.mark(interaction.guild_id)
 
     ## ----------------- ##
     ## ----------------- ##
@@ -202,19 +297,28 @@ class GuildVoiceState:
     async def join(self, interaction: Interaction, inactive_time: int = 180, auto_queue: bool = False) -> None:
         player: wavelink.Player = await interaction.user.voice.channel.connect(
             self_deaf=True,
-            cls=wavelink.Player,
+            cls=wavelink.Player(nodes=[self.__node_pool.best_node()]),
         )
         player.inactive_timeout = inactive_time
         player.autoplay = wavelink.AutoPlayMode.partial if auto_queue else wavelink.AutoPlayMode.partial
 
         self.__set_guild_state(
             interaction.guild_id,
+            player,
             GuildMusicData(
                 interaction.channel_id,
                 VoicePlayer(player),
-                auto_queue
+                auto_queue,
+                self.__render_cache_size,
+                self.__prefetch_depth,
+                self.__new_recommender()
             )
         )
+        self.set_channel(
+            interaction.guild_id,
+            interaction.client.get_channel(interaction.channel_id) or interaction.channel
+        )
+        self.__guild_store.mark(interaction.guild_id)
 
     async def leave(self, interaction: Interaction) -> None:
         guild_state = self.__ensure_guild_state(interaction.guild_id)
@@ -226,6 +330,8 @@ class GuildVoiceState:
 
         if guild_state.auto_queue and guild_state.voice_player.get_auto_play_mode() == wavelink.AutoPlayMode.partial:
             guild_state.voice_player.set_auto_play_mode(wavelink.AutoPlayMode.enabled)
+            self.__guild_store.mark(interaction.guild_id)
+            self.__recommend(guild_state)
 
     def position(self, interaction: Interaction) -> int:
         guild_state = self.__ensure_guild_state(interaction.guild_id)
@@ -237,6 +343,33 @@ class GuildVoiceState:
 
         return guild_state.voice_player.queue_history()
 
+    def played_tracks(self, guild_id: int, limit: Optional[int] = None) -> list[IndexedTrack]:
+        """
+        The last tracks in the history of the guild, the oldest first, read without materializing them.
+
+        Args:
+            guild_id (int): The guild id.
+            limit (Optional[int]): How many tracks to read from the end of the history, all of them by default.
+
+        Returns:
+            list[IndexedTrack]: The played tracks, empty if the bot is not connected in the guild.
+        """
+        guild_state = self.__sessions.music_data(guild_id)
+        if not guild_state:
+            return []
+
+        played = []
+        for item in guild_state.voice_player.queue_history().entries()[-limit if limit else 0:]:
+            if isinstance(item, QueueEntry):
+                try:
+                    info = decode_track(item.encoded)['info']
+                except TrackDecodeError:
+                    continue
+                played.append(IndexedTrack(info['title'], info['author'], info['uri']))
+            else:
+                played.append(IndexedTrack(item.title, item.author, item.uri))
+        return played
+
     async def play_next(self, guild_id: int) -> None:
         guild_state = self.__ensure_guild_state(guild_id)
 
@@ -246,16 +379,321 @@ class GuildVoiceState:
         guild_state = self.__ensure_guild_state(guild_id)
 
         await guild_state.voice_player.inactive_player()
+        self.__guild_store.delete(guild_id)
         # self.__del_guild_state(guild_id)
 
+    async def failover(self, node: wavelink.Node) -> None:
+        """
+        Move every player of a disconnected node to the surviving nodes.
+
+        Args:
+            node (wavelink.Node): The node that went down.
+        """
+        if node.identifier in self.__failing_over:
+            return
+
+        guild_ids = [
+            session.guild_id for session in self.__sessions.music_sessions()
+            if session.data.voice_player.node().identifier == node.identifier
+        ]
+        targets = self.__node_pool.available_nodes(exclude=node)
+        if not guild_ids or not targets:
+            return
+
+        # Spread the players instead of moving all of them onto the node that was the least loaded.
+        penalties = {target.identifier: self.__node_pool.penalty(target) for target in targets}
+        assignments = {}
+        for guild_id in guild_ids:
+            target = min(targets, key=lambda n: penalties[n.identifier])
+            penalties[target.identifier] += 1
+            assignments[guild_id] = target
+
+        self.__failing_over.add(node.identifier)
+        try:
+            await asyncio.gather(*(
+                self.__migrate(guild_id, target) for guild_id, target in assignments.items()
+            ))
+        finally:
+            self.__failing_over.discard(node.identifier)
+
+    async def __migrate(self, guild_id: int, node: wavelink.Node) -> None:
+        guild_state = self.__get_guild_state(guild_id)
+        if not guild_state:
+            return
+
+        guild_state.migrating = True
+        try:
+            await guild_state.voice_player.migrate(node)
+        except Exception as error:
+            logger.error('Failed to move the player of guild %s to node %s: %s', guild_id, node.identifier, error)
+            await self.guild_clean_up(guild_id)
+            try:
+                await guild_state.voice_player.leave()
+            except Exception:
+                pass
+        else:
+            self.__guild_store.mark(guild_id)
+            logger.info('Moved the player of guild %s to node %s', guild_id, node.identifier)
+        finally:
+            guild_state.migrating = False
+
+    def is_migrating(self, guild_id: int) -> bool:
+        guild_state = self.__get_guild_state(guild_id)
+        return bool(guild_state and guild_state.migrating)
+
+    ## ----------------- ##
+    ##    transitions    ##
+    ## ----------------- ##
+
+    def track_ended(self, guild_id: int) -> None:
+        if guild_state := self.__get_guild_state(guild_id):
+            guild_state.transitions.track_ended()
+
+    def track_started(self, guild_id: int) -> Optional[float]:
+        """
+        Record the transition gap of the guild and start checking the next tracks of its queue.
+
+        Returns:
+            Optional[float]: The gap since the previous track ended in seconds, None for the first track.
+        """
+        guild_state = self.__get_guild_state(guild_id)
+        if not guild_state:
+            return None
+
+        self.__prefetch(guild_state)
+        self.__recommend(guild_state)
+        return guild_state.transitions.track_started()
+
+    def transition_stats(self) -> dict[int, dict]:
+        """
+        The transition gaps of every guild.
+        """
+        return {session.guild_id: session.data.transitions.as_dict() for session in self.__sessions.music_sessions()}
+
+    def stats(self) -> dict[str, int]:
+        """
+        The totals of the states of every guild, read by the metrics collector on every scrape.
+        """
+        stats = dict.fromkeys((
+            'guilds', 'queued', 'auto_queued', 'queue_max', 'live_views', 'render_hits', 'render_misses',
+            'prefetch_resolved', 'prefetch_dropped', 'recommended', 'recommend_duplicates'
+        ), 0)
+        for session in self.__sessions.music_sessions():
+            guild_state = session.data
+            stats['guilds'] += 1
+            vc_player = guild_state.voice_player
+            if vc_player.is_connected():
+                queued = len(vc_player.queue())
+                stats['queued'] += queued
+                stats['auto_queued'] += len(vc_player.auto_queue())
+                stats['queue_max'] = max(stats['queue_max'], queued)
+            if guild_state.last_view and not guild_state.last_view.is_finished():
+                stats['live_views'] += 1
+            stats['render_hits'] += guild_state.render_cache.hits
+            stats['render_misses'] += guild_state.render_cache.misses
+            stats['prefetch_resolved'] += guild_state.prefetcher.resolved
+            stats['prefetch_dropped'] += guild_state.prefetcher.dropped
+            if guild_state.recommender:
+                stats['recommended'] += guild_state.recommender.added
+                stats['recommend_duplicates'] += guild_state.recommender.duplicates
+        return stats
+
+    @staticmethod
+    def __prefetch(guild_state: GuildMusicData) -> None:
+        vc_player = guild_state.voice_player
+        if vc_player.is_connected():
+            guild_state.prefetcher.schedule(vc_player.queue(), vc_player.node())
+
+    @staticmethod
+    def __recommend(guild_state: GuildMusicData) -> None:
+        if guild_state.recommender and guild_state.voice_player.is_connected():
+            guild_state.recommender.schedule(guild_state.voice_player)
+
+    def __new_recommender(self) -> Optional[Recommender]:
+        if self.__search_cache is None or self.__recommend_depth <= 0:
+            return None
+        return Recommender(self.__search_cache, self.__recommend_depth, self.__recommend_seeds)
+
+    ## ----------------- ##
+    ##    persistence    ##
+    ## ----------------- ##
+
+    def mark_changed(self, guild_id: int) -> None:
+        self.__guild_store.mark(guild_id)
+
+    def mark_position(self, guild_id: int, position: int) -> None:
+        if self.__get_guild_state(guild_id):
+            self.__guild_store.mark_position(guild_id, position)
+
     @staticmethod
-    async def __play(interaction: Interaction, guild_state: GuildMusicData, tracks: wavelink.Search) -> None:
+    def __encode_track(track: wavelink.Playable | QueueEntry) -> list:
+        return [track.encoded, dict(track.extras)]
+
+    def snapshot(self, guild_id: int) -> Optional[Snapshot]:
+        """
+        Build the persistent snapshot of the guild state, with the tracks as encoded strings.
+
+        Args:
+            guild_id (int): The guild id.
+
+        Returns:
+            Optional[Snapshot]: The snapshot, None if the bot is not connected in the guild.
+        """
+        guild_state = self.__sessions.music_data(guild_id)
+        if not guild_state:
+            return None
+
+        vc_player = guild_state.voice_player
+        current = vc_player.get_current_track()
+        history = vc_player.queue_history().entries()[-self.__saved_history:] if self.__saved_history else []
+
+        return {
+            'guild_id': guild_id,
+            'voice_channel_id': vc_player.channel().id,
+            'channel_id': guild_state.channel_id,
+            'auto_queue': guild_state.auto_queue,
+            'queue_mode': vc_player.get_queue_mode().name,
+            'autoplay': vc_player.get_auto_play_mode().name,
+            'inactive_timeout': vc_player.inactive_timeout(),
+            'current': self.__encode_track(current) if current else None,
+            'position': vc_player.position(),
+            'paused': vc_player.is_paused(),
+            'queue': [self.__encode_track(track) for track in vc_player.queue().entries()],
+            'history': [self.__encode_track(track) for track in history],
+        }
+
+    async def restore(self, client: discord.Client, snapshot: Snapshot) -> bool:
+        """
+        Rejoin the voice channel of a snapshot and rebuild its queues.
+
+        Args:
+            client (discord.Client): The bot.
+            snapshot (Snapshot): The snapshot saved before the restart.
+
+        Returns:
+            bool: Whether the guild has been restored.
+        """
+        guild_id = snapshot['guild_id']
+        guild = client.get_guild(guild_id)
+        channel = guild.get_channel(snapshot['voice_channel_id']) if guild else None
+        if guild_id in self.__sessions or not isinstance(channel, discord.VoiceChannel | discord.StageChannel):
+            return False
+        if not any(not member.bot for member in channel.members):
+            return False
+
+        node = self.__node_pool.best_node()
+        entries = ([snapshot['current']] if snapshot['current'] else []) + snapshot['queue'] + snapshot['history']
+        tracks = await self.__decode_tracks(node, entries)
+
+        current = tracks.pop(0) if snapshot['current'] else None
+        queue, history = tracks[:len(snapshot['queue'])], tracks[len(snapshot['queue']):]
+
+        player: wavelink.Player = await channel.connect(
+            self_deaf=True,
+            cls=wavelink.Player(nodes=[node]),
+        )
+        player.inactive_timeout = snapshot['inactive_timeout']
+        player.autoplay = wavelink.AutoPlayMode[snapshot['autoplay']]
+        player.queue.mode = wavelink.QueueMode[snapshot['queue_mode']]
+
+        voice_player = VoicePlayer(player)
+        self.__set_guild_state(
+            guild_id,
+            player,
+            GuildMusicData(
+                snapshot['channel_id'], voice_player, snapshot['auto_queue'],
+                self.__render_cache_size, self.__prefetch_depth, self.__new_recommender()
+            )
+        )
+        if text_channel := client.get_channel(snapshot['channel_id']):
+            self.set_channel(guild_id, text_channel)
+
+        await voice_player.restore(current, snapshot['position'], snapshot['paused'], queue, history)
+        return True
+
+    @staticmethod
+    async def __decode_tracks(node: wavelink.Node, entries: list[list]) -> list[wavelink.Playable]:
+        if not entries:
+            return []
+
+        payloads = await node.send('POST', path='v4/decodetracks', data=[encoded for encoded, _ in entries])
+
+        tracks = []
+        for payload, (_, extras) in zip(payloads, entries):
+            track = wavelink.Playable(payload)
+            track.extras = extras
+            tracks.append(track)
+        return tracks
+
+    async def __play(self, interaction: Interaction, guild_state: GuildMusicData, tracks: wavelink.Search,
+                     progress: bool) -> None:
+        """
+        Enqueue the tracks, starting the first one right away if nothing is playing.
+
+        The rest of a large playlist is enqueued by a background task in batches that yield to the event loop,
+        updating the added to queue message as they go when progress is True.
+        """
+        extras = {
+            'requester_name': interaction.user.display_name,
+            'requester_avatar': interaction.user.display_avatar.url
+        }
+        # Wait for the previous playlist, so the tracks keep the order they were requested in.
+        if guild_state.enqueue_task and not guild_state.enqueue_task.done():
+            await asyncio.wait([guild_state.enqueue_task])
+
+        current = guild_state.voice_player.get_current_track()
+        tracks_list: list[wavelink.Playable] = list(tracks)
+        head = 1 if not current else self.__enqueue_batch_size
+        self.__enqueue(guild_state, tracks_list[:head], extras)
+
+        if not current:
+            # Registered before playing, the track start event can arrive before the node answers.
+            tracing.handoff(interaction.guild_id)
+            with tracing.span('player.play'):
+                await guild_state.voice_player.play_next()
+        self.__prefetch(guild_state)
+
+        if len(tracks_list) > head:
+            guild_state.enqueue_task = asyncio.create_task(
+                self.__enqueue_rest(interaction, guild_state, tracks, tracks_list, head, extras, progress)
+            )
+
+    @staticmethod
+    def __enqueue(guild_state: GuildMusicData, tracks: list[wavelink.Playable], extras: dict) -> None:
         for track in tracks:
-            track.extras = {
-                'requester_name': interaction.user.display_name,
-                'requester_avatar': interaction.user.display_avatar.url
-            }
+            track.extras = extras
         guild_state.voice_player.put_in_queue(tracks)
 
-        if not guild_state.voice_player.get_current_track():
-            await guild_state.voice_player.play_next()
+    async def __enqueue_rest(self, interaction: Interaction, guild_state: GuildMusicData, tracks: wavelink.Search,
+                             tracks_list: list[wavelink.Playable], start: int, extras: dict, progress: bool) -> None:
+        loop = asyncio.get_running_loop()
+        skip_first_track = start == 1
+        last_update = loop.time()
+
+        for index in range(start, len(tracks_list), self.__enqueue_batch_size):
+            end = min(index + self.__enqueue_batch_size, len(tracks_list))
+            self.__enqueue(guild_state, tracks_list[index:end], extras)
+            self.__guild_store.mark(interaction.guild_id)
+
+            if progress and (end == len(tracks_list) or loop.time() - last_update >= self.__enqueue_progress_interval):
+                last_update = loop.time()
+                progress = await self.__update_enqueue_progress(
+                    interaction, tracks, end - 1 if skip_first_track else end, skip_first_track
+                )
+            await asyncio.sleep(0)
+
+    async def __update_enqueue_progress(self, interaction: Interaction, tracks: wavelink.Search, added: int,
+                                        skip_first_track: bool) -> bool:
+        try:
+            await interaction.edit_original_response(
+                embed=self.__embed.added_to_queue(tracks, interaction.user, skip_first_track, added=added)
+            )
+        except discord.HTTPException:
+            return False
+        return True
+
+    @staticmethod
+    def __cancel_enqueue(guild_state: GuildMusicData) -> None:
+        if guild_state.enqueue_task and not guild_state.enqueue_task.done():
+            guild_state.enqueue_task.cancel()
+        guild_state.enqueue_task = None
@@ -0,0 +1,212 @@
+"""
+This module contains the load-aware selection of LavaLink nodes for new players.
+
+The pool also notices when a node goes down: wavelink 3.4 only reconnects the websocket of a node in the
+background, so the status of every node is checked every health_interval, and the stats of the nodes are
+fetched every refresh_interval. A node is down when its websocket is not connected or it cannot be reached,
+on_node_down is then called once, until its stats can be fetched again.
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+
+import aiohttp
+import wavelink
+
+from src.exceptions.player_exceptions import NoNodeAvailable
+
+
+logger = logging.getLogger(__name__)
+
+
+class NodeLoad:
+    """
+    The last known load of a LavaLink node.
+    """
+    def __init__(self) -> None:
+        self.stats: Optional[wavelink.StatsResponsePayload] = None
+        self.healthy: bool = True
+        self.draining: bool = False
+        self.down: bool = False
+        self.probing: bool = False
+
+    def penalty(self, node: wavelink.Node) -> float:
+        """
+        Compute the penalty of the node, the same way Lavalink clients usually balance their players.
+
+        Args:
+            node (wavelink.Node): The node the load belongs to.
+
+        Returns:
+            float: The penalty, lower is better.
+        """
+        players = len(node.players)
+        if self.stats is None:
+            return players
+
+        penalty = max(players, self.stats.playing)
+        penalty += 1.05 ** (100 * self.stats.cpu.system_load) * 10 - 10
+
+        if frames := self.stats.frames:
+            penalty += 1.03 ** (500 * (frames.deficit / 3000)) * 600 - 600
+            penalty += (1.03 ** (500 * (frames.nulled / 3000)) * 300 - 300) * 2
+
+        return penalty
+
+
+class NodePool:
+    """
+    Keeps track of the load of every connected LavaLink node and picks the least loaded one for new players.
+    """
+    def __init__(self, refresh_interval: float = 30, draining: Optional[list[str]] = None,
+                 health_interval: float = 2,
+                 on_node_down: Optional[Callable[[wavelink.Node], Awaitable[None]]] = None) -> None:
+        self.__refresh_interval: float = refresh_interval
+        self.__health_interval: float = min(health_interval, refresh_interval)
+        self.__on_node_down: Optional[Callable[[wavelink.Node], Awaitable[None]]] = on_node_down
+        self.__loads: dict[str, NodeLoad] = {}
+        self.__task: Optional[asyncio.Task] = None
+        self.__pending: set[asyncio.Task] = set()
+
+        for identifier in draining or []:
+            self.drain(identifier)
+
+    def __load(self, identifier: str) -> NodeLoad:
+        if identifier not in self.__loads:
+            self.__loads[identifier] = NodeLoad()
+        return self.__loads[identifier]
+
+    def start(self) -> None:
+        if self.__task is None or self.__task.done():
+            self.__task = asyncio.create_task(self.__refresh_loop())
+
+    def stop(self) -> None:
+        if self.__task is not None:
+            self.__task.cancel()
+            self.__task = None
+        for task in self.__pending:
+            task.cancel()
+
+    def drain(self, identifier: str) -> None:
+        """
+        Stop assigning new players to a node, the players already on it are left untouched.
+        """
+        self.__load(identifier).draining = True
+
+    def undrain(self, identifier: str) -> None:
+        self.__load(identifier).draining = False
+
+    def is_available(self, node: wavelink.Node) -> bool:
+        load = self.__load(node.identifier)
+        return node.status is wavelink.NodeStatus.CONNECTED and load.healthy and not load.draining
+
+    def penalty(self, node: wavelink.Node) -> float:
+        return self.__load(node.identifier).penalty(node)
+
+    def available_nodes(self, exclude: Optional[wavelink.Node] = None) -> list[wavelink.Node]:
+        """
+        The available nodes, sorted from the least to the most loaded.
+
+        Args:
+            exclude (wavelink.Node): An optional node to leave out.
+
+        Returns:
+            list[wavelink.Node]: The nodes new players can be assigned to.
+        """
+        nodes = [
+            node for node in wavelink.Pool.nodes.values()
+            if self.is_available(node) and (exclude is None or node.identifier != exclude.identifier)
+        ]
+        return sorted(nodes, key=self.penalty)
+
+    def best_node(self) -> wavelink.Node:
+        """
+        The node with the lowest penalty, skipping draining and unhealthy nodes.
+
+        Raises:
+            NoNodeAvailable: If no node can accept a new player.
+        """
+        if nodes := self.available_nodes():
+            return nodes[0]
+        raise NoNodeAvailable
+
+    async def refresh(self) -> None:
+        """
+        Fetch the stats of every node of the wavelink Pool.
+        """
+        await asyncio.gather(*(self.__refresh_node(node) for node in wavelink.Pool.nodes.values()))
+
+    def check_nodes(self) -> None:
+        """
+        Check the status of every node of the wavelink Pool, without any request. A node that is down but
+        connected again has its stats fetched right away, so it gets new players without waiting for the
+        next refresh.
+        """
+        for node in list(wavelink.Pool.nodes.values()):
+            load = self.__load(node.identifier)
+            if self.__check_node(node) and load.down and not load.probing:
+                self.__spawn(self.__probe(node, load))
+
+    async def __probe(self, node: wavelink.Node, load: NodeLoad) -> None:
+        load.probing = True
+        try:
+            await self.__refresh_node(node)
+        finally:
+            load.probing = False
+
+    def __check_node(self, node: wavelink.Node) -> bool:
+        if node.status is wavelink.NodeStatus.CONNECTED:
+            return True
+
+        self.__load(node.identifier).healthy = False
+        self.__node_down(node, f'websocket {node.status.name.lower()}')
+        return False
+
+    async def __refresh_node(self, node: wavelink.Node) -> None:
+        load = self.__load(node.identifier)
+        if not self.__check_node(node):
+            return
+
+        try:
+            load.stats = await asyncio.wait_for(node.fetch_stats(), timeout=self.__refresh_interval)
+        except aiohttp.ClientConnectionError as error:
+            load.healthy = False
+            self.__node_down(node, error)
+        except (
+            wavelink.LavalinkException, wavelink.NodeException, aiohttp.ClientError, asyncio.TimeoutError
+        ) as error:
+            if load.healthy:
+                logger.warning('Node %s is unhealthy: %s', node.identifier, error)
+            load.healthy = False
+        else:
+            if not load.healthy:
+                logger.info('Node %s is healthy again', node.identifier)
+            load.healthy = True
+            load.down = False
+
+    def __node_down(self, node: wavelink.Node, reason: object) -> None:
+        load = self.__load(node.identifier)
+        if load.down:
+            return
+
+        load.down = True
+        logger.warning('Node %s is down: %s', node.identifier, reason)
+        if self.__on_node_down is not None:
+            self.__spawn(self.__on_node_down(node))
+
+    def __spawn(self, coroutine: Awaitable[None]) -> None:
+        task = asyncio.create_task(coroutine)
+        self.__pending.add(task)
+        task.add_done_callback(self.__pending.discard)
+
+    async def __refresh_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        next_refresh = loop.time()
+        while True:
+            if loop.time() >= next_refresh:
+                next_refresh = loop.time() + self.__refresh_interval
+                await self.refresh()
+            else:
+                self.check_nodes()
+            await asyncio.sleep(self.__health_interval)
@@ -0,0 +1,156 @@
+"""
+This module contains the prefetcher that checks the upcoming tracks of a guild while the current one plays,
+and the timing of the transitions between tracks.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Optional
+
+import aiohttp
+import wavelink
+
+from src.metrics.metrics import SEARCH_LATENCY
+from src.voice.compact_queue.compact_queue import CompactQueue, Item, QueueEntry
+from src.voice.compact_queue.track_codec import TrackDecodeError, decode_track
+
+
+logger = logging.getLogger(__name__)
+
+
+class TransitionStats:
+    """
+    The gaps between the end of a track and the start of the next one in a guild.
+    """
+    def __init__(self) -> None:
+        self.__ended_at: Optional[float] = None
+        self.count: int = 0
+        self.last: Optional[float] = None
+        self.max: float = 0
+        self.total: float = 0
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+    def track_ended(self) -> None:
+        self.__ended_at = time.perf_counter()
+
+    def track_started(self) -> Optional[float]:
+        """
+        Record the gap since the last track end.
+
+        Returns:
+            Optional[float]: The gap in seconds, None if no track ended before this one.
+        """
+        if self.__ended_at is None:
+            return None
+
+        gap = time.perf_counter() - self.__ended_at
+        self.__ended_at = None
+        self.count += 1
+        self.last = gap
+        self.max = max(self.max, gap)
+        self.total += gap
+        return gap
+
+    def as_dict(self) -> dict[str, Optional[float]]:
+        return {
+            'count': self.count,
+            'last': self.last,
+            'mean': self.mean,
+            'max': self.max,
+        }
+
+
+class Prefetcher:
+    """
+    Checks that the node accepts the next tracks of the queue while the current one plays, so a track
+    the node can no longer decode is resolved again before its turn instead of failing at the transition.
+
+    The check only proves the format of the encoded tracks, which do not expire: only the tracks the node
+    rejects are searched again by their URI, and dropped from the queue when that fails. The check does not
+    make the transition itself faster, the node still opens the stream when the track is played.
+    """
+    def __init__(self, depth: int = 3) -> None:
+        self.__depth: int = depth
+        self.__validated: set[str] = set()
+        self.__task: Optional[asyncio.Task] = None
+
+        self.resolved: int = 0
+        self.dropped: int = 0
+
+    def schedule(self, queue: CompactQueue, node: wavelink.Node) -> None:
+        """
+        Check the next tracks of the queue in the background, restarting a check still running.
+        """
+        if self.__depth <= 0:
+            return
+        self.cancel()
+        self.__task = asyncio.create_task(self.__prefetch(queue, node))
+
+    def cancel(self) -> None:
+        if self.__task is not None and not self.__task.done():
+            self.__task.cancel()
+        self.__task = None
+
+    async def __prefetch(self, queue: CompactQueue, node: wavelink.Node) -> None:
+        window = queue.entries()[:self.__depth]
+        self.__validated &= {item.encoded for item in window}
+
+        pending = [item for item in window if item.encoded not in self.__validated]
+        if not pending:
+            return
+
+        try:
+            await self.__decode(node, pending)
+        except wavelink.LavalinkException:
+            # A single track the node rejects fails the whole batch, find it.
+            for item in pending:
+                try:
+                    await self.__decode(node, [item])
+                except wavelink.LavalinkException:
+                    await self.__resolve(queue, node, item)
+        except (wavelink.NodeException, aiohttp.ClientError, asyncio.TimeoutError) as error:
+            logger.warning('Failed to prefetch the next tracks on node %s: %s', node.identifier, error)
+
+    async def __decode(self, node: wavelink.Node, items: list[Item]) -> None:
+        await node.send('POST', path='v4/decodetracks', data=[item.encoded for item in items])
+        self.__validated.update(item.encoded for item in items)
+
+    async def __resolve(self, queue: CompactQueue, node: wavelink.Node, item: Item) -> None:
+        """
+        Search a track the node rejects again by its URI: replace it with the track found,
+        or drop it when there is none the node can take.
+        """
+        try:
+            uri = decode_track(item.encoded)['info']['uri'] if isinstance(item, QueueEntry) else item.uri
+        except TrackDecodeError:
+            uri = None
+
+        tracks: wavelink.Search = []
+        if uri:
+            start = time.perf_counter()
+            outcome = 'error'
+            try:
+                tracks = await wavelink.Playable.search(uri, node=node)
+                outcome = 'found' if tracks else 'empty'
+            except wavelink.LavalinkLoadException:
+                pass
+            except wavelink.LavalinkException as error:
+                # The node failed, not the source: the track is left for the next check.
+                logger.warning('Failed to load %s again on node %s: %s', uri, node.identifier, error)
+                return
+            finally:
+                SEARCH_LATENCY.observe(time.perf_counter() - start, outcome=outcome)
+
+        # The same encoded track would be rejected again at the transition.
+        track = tracks[0] if tracks else None
+        if track is not None and track.encoded != item.encoded:
+            if queue.replace(item, track):
+                self.resolved += 1
+                self.__validated.add(track.encoded)
+        elif queue.discard(item):
+            self.dropped += 1
+            logger.warning('Dropped a queued track the node can no longer play: %s', uri)
@@ -0,0 +1,128 @@
+"""
+This module contains the recommender that keeps the auto queue of a guild topped up while the current track plays.
+"""
+
+import asyncio
+import logging
+from typing import Iterable, Optional
+
+import aiohttp
+import wavelink
+
+from src.search.search_cache import SearchCache
+from src.voice.compact_queue.compact_queue import Item, QueueEntry
+from src.voice.compact_queue.track_codec import TrackDecodeError, decode_track
+from src.voice.voice_state.voice_player import VoicePlayer
+
+
+logger = logging.getLogger(__name__)
+
+
+class Recommender:
+    """
+    Fills the auto queue in the background when auto play is enabled, so the next recommendation
+    is already queued when the queue runs dry instead of being searched at the transition.
+
+    Recommendations are seeded from the current track and the last tracks of the history, searched
+    through the search cache (a seed is only searched once while it is cached) and de-duplicated
+    against the queues and their histories.
+    wavelink only skips its own search when the auto queue holds more than 21 tracks, the depth
+    should stay above that.
+    """
+    def __init__(self, search_cache: SearchCache, depth: int = 22, seeds: int = 3, window: int = 100) -> None:
+        self.__search_cache: SearchCache = search_cache
+        self.__depth: int = depth
+        self.__seeds: int = seeds
+        self.__window: int = window
+        self.__task: Optional[asyncio.Task] = None
+
+        self.added: int = 0
+        self.duplicates: int = 0
+
+    def schedule(self, voice_player: VoicePlayer) -> None:
+        """
+        Top up the auto queue in the background, unless it is deep enough or a top up is already running.
+        """
+        if self.__depth <= 0 or voice_player.get_auto_play_mode() is not wavelink.AutoPlayMode.enabled:
+            return
+        if len(voice_player.auto_queue()) >= self.__depth:
+            return
+        if self.__task is not None and not self.__task.done():
+            return
+        self.__task = asyncio.create_task(self.__top_up(voice_player))
+
+    def cancel(self) -> None:
+        if self.__task is not None and not self.__task.done():
+            self.__task.cancel()
+        self.__task = None
+
+    async def __top_up(self, voice_player: VoicePlayer) -> None:
+        auto_queue = voice_player.auto_queue()
+        seen = self.__seen(voice_player)
+
+        for seed in self.__pick_seeds(voice_player):
+            missing = self.__depth - len(auto_queue)
+            if missing <= 0:
+                return
+            if (query := self.__query(seed)) is None:
+                continue
+
+            try:
+                results = await self.__search_cache.search(query, source=None)
+            except (wavelink.LavalinkLoadException, wavelink.LavalinkException, aiohttp.ClientError) as error:
+                logger.warning('Failed to fetch the recommendations for %s: %s', seed.identifier, error)
+                continue
+
+            tracks = []
+            for track in results.tracks if isinstance(results, wavelink.Playlist) else results:
+                if track.identifier in seen:
+                    self.duplicates += 1
+                    continue
+                seen.add(track.identifier)
+                track._recommended = True
+                tracks.append(track)
+                if len(tracks) >= missing:
+                    break
+
+            if tracks:
+                auto_queue.put(tracks)
+                self.added += len(tracks)
+
+    def __pick_seeds(self, voice_player: VoicePlayer) -> list[wavelink.Playable]:
+        seeds = voice_player.queue_history()[-self.__seeds:][::-1] if self.__seeds else []
+        if current := voice_player.get_current_track():
+            seeds.insert(0, current)
+        return seeds
+
+    @staticmethod
+    def __query(seed: wavelink.Playable) -> Optional[str]:
+        # The same queries wavelink uses for its own recommendations.
+        if seed.source == 'youtube':
+            return f'https://music.youtube.com/watch?v={seed.identifier}&list=RD{seed.identifier}'
+        if seed.source == 'spotify':
+            return f'sprec:seed_tracks={seed.identifier}&limit=10'
+        return None
+
+    def __seen(self, voice_player: VoicePlayer) -> set[str]:
+        auto_queue = voice_player.auto_queue()
+        items = [
+            *voice_player.queue().entries(),
+            *voice_player.queue_history().entries()[-self.__window:],
+            *auto_queue.entries(),
+            *auto_queue.history.entries()[-self.__window:],
+        ]
+        seen = set(self.__identifiers(items))
+        if current := voice_player.get_current_track():
+            seen.add(current.identifier)
+        return seen
+
+    @staticmethod
+    def __identifiers(items: Iterable[Item]) -> Iterable[str]:
+        for item in items:
+            if not isinstance(item, QueueEntry):
+                yield item.identifier
+                continue
+            try:
+                yield decode_track(item.encoded)['info']['identifier']
+            except TrackDecodeError:
+                pass
@@ -0,0 +1,112 @@
+"""
+This module contains the registry of the voice sessions of the guilds, the single place the voice
+client, the voice channel and the music data of a guild are looked up from.
+
+GuildVoiceState binds a session when it connects and unbinds it when it cleans the guild up. The voice
+state updates of the bot keep the voice client and its channel in sync with Discord, so a session also
+follows the bot when it is moved or disconnected by someone else.
+"""
+
+from typing import Iterator, Optional
+
+import discord
+
+from src.voice.guild_data.guild_data import GuildMusicData
+
+
+class GuildSession:
+    """
+    The voice client of the bot in a guild, the voice channel it is in and the music data of the guild,
+    which holds the text channel the guild is bound to.
+    """
+    __slots__ = ('guild_id', 'voice_client', 'voice_channel_id', 'data')
+
+    def __init__(self, guild_id: int) -> None:
+        self.guild_id: int = guild_id
+        self.voice_client: Optional[discord.VoiceProtocol] = None
+        self.voice_channel_id: Optional[int] = None
+        self.data: Optional[GuildMusicData] = None
+
+    @property
+    def is_empty(self) -> bool:
+        return self.voice_client is None and self.data is None
+
+
+class SessionRegistry:
+    """
+    The sessions of the guilds, keyed by guild id.
+    """
+    def __init__(self) -> None:
+        self.__sessions: dict[int, GuildSession] = {}
+
+    def __len__(self) -> int:
+        return len(self.__sessions)
+
+    def __contains__(self, guild_id: int) -> bool:
+        return guild_id in self.__sessions
+
+    def get(self, guild_id: int) -> Optional[GuildSession]:
+        return self.__sessions.get(guild_id)
+
+    def music_data(self, guild_id: int) -> Optional[GuildMusicData]:
+        """
+        The music data of the guild, None unless the bot is connected in it.
+        """
+        session = self.__sessions.get(guild_id)
+        if session is None or session.data is None or not session.data.voice_player.is_connected():
+            return None
+        return session.data
+
+    def bind(self, guild_id: int, voice_client: discord.VoiceProtocol, data: GuildMusicData) -> GuildSession:
+        """
+        Bind the voice client the bot just connected with and the music data of the guild.
+        """
+        if (session := self.__sessions.get(guild_id)) is None:
+            session = self.__sessions[guild_id] = GuildSession(guild_id)
+        session.data = data
+        self.__set_voice_client(session, voice_client)
+        return session
+
+    def unbind(self, guild_id: int) -> Optional[GuildMusicData]:
+        """
+        Forget the music data of the guild, the session goes away with it once the bot left the voice channel.
+        """
+        session = self.__sessions.get(guild_id)
+        if session is None:
+            return None
+
+        data, session.data = session.data, None
+        if session.is_empty:
+            del self.__sessions[guild_id]
+        return data
+
+    def voice_state_update(self, guild_id: int, channel_id: Optional[int],
+                           voice_client: Optional[discord.VoiceProtocol]) -> None:
+        """
+        Sync the session with a voice state update of the bot: the voice channel it is now in, None once it is
+        disconnected. The channel comes from the update, the voice client handles it in a task of its own.
+        """
+        session = self.__sessions.get(guild_id)
+        if channel_id is None or voice_client is None:
+            if session is not None:
+                session.voice_client = session.voice_channel_id = None
+                if session.is_empty:
+                    del self.__sessions[guild_id]
+            return
+
+        if session is None:
+            session = self.__sessions[guild_id] = GuildSession(guild_id)
+        session.voice_client = voice_client
+        session.voice_channel_id = channel_id
+
+    def music_sessions(self) -> Iterator[GuildSession]:
+        """
+        The sessions with music data, whether the bot is still connected or not.
+        """
+        return (session for session in list(self.__sessions.values()) if session.data is not None)
+
+    @staticmethod
+    def __set_voice_client(session: GuildSession, voice_client: discord.VoiceProtocol) -> None:
+        channel = getattr(voice_client, 'channel', None)
+        session.voice_client = voice_client
+        session.voice_channel_id = channel.id if channel is not None else None
@@ -1,13 +1,27 @@
 from src.exceptions.player_exceptions import *
 from src.exceptions.QueueException import *
+import asyncio
+import logging
 from typing import Optional
 
+import aiohttp
 import wavelink
 
+from src.voice.compact_queue.compact_queue import CompactQueue
+
+
+logger = logging.getLogger(__name__)
+
 
 class VoicePlayer:
     def __init__(self, player: wavelink.Player) -> None:
         self.__player: wavelink.Player = player
+        if not isinstance(player.queue, CompactQueue):
+            queue = CompactQueue()
+            queue.mode = player.queue.mode
+            player.queue = queue
+        if not isinstance(player.auto_queue, CompactQueue):
+            player.auto_queue = CompactQueue()
         self.__original_queue: Optional[wavelink.Queue] = None
 
     def get_auto_play_mode(self) -> wavelink.AutoPlayMode:
@@ -22,6 +36,15 @@ class VoicePlayer:
     def is_connected(self) -> bool:
         return self.__player.connected
 
+    def node(self) -> wavelink.Node:
+        return self.__player.node
+
+    def channel(self):
+        return self.__player.channel
+
+    def inactive_timeout(self) -> Optional[int]:
+        return self.__player.inactive_timeout
+
     def is_paused(self) -> bool:
         return self.__player.paused
 
@@ -79,10 +102,10 @@ class VoicePlayer:
     def set_queue_mode(self, mode: wavelink.QueueMode) -> None:
         self.__player.queue.mode = mode
 
-    def queue(self) -> wavelink.Queue:
+    def queue(self) -> CompactQueue:
         return self.__player.queue
 
-    def queue_history(self) -> wavelink.Queue:
+    def queue_history(self) -> CompactQueue:
         return self.__player.queue.history
 
     def get_from_queue_history(self, index: int | None):
@@ -90,7 +113,7 @@ class VoicePlayer:
             return self.__player.queue.history.get()
         return self.__player.queue.history.get_at(index)
 
-    def auto_queue(self) -> wavelink.Queue:
+    def auto_queue(self) -> CompactQueue:
         return self.__player.auto_queue
 
     async def play_previous(self, track: wavelink.Playable) -> None:
@@ -118,3 +141,73 @@ class VoicePlayer:
 
     async def inactive_player(self) -> None:
         await self.leave()
+
+    async def migrate(self, node: wavelink.Node) -> None:
+        """
+        Move the player to another node, reconnecting to the same voice channel.
+
+        The queues (with their history and mode) and the autoplay mode are handed over to the new player,
+        the current track is resumed at its last known position.
+
+        Args:
+            node (wavelink.Node): The node to move the player to.
+        """
+        old_player: wavelink.Player = self.__player
+        channel = old_player.channel
+        current = old_player.current
+        position = old_player.position
+        paused = old_player.paused
+        volume = old_player.volume
+
+        await self.__disconnect_dead(old_player)
+        await self.__wait_voice_left(channel.guild)
+
+        player: wavelink.Player = await channel.connect(
+            self_deaf=True,
+            cls=wavelink.Player(nodes=[node]),
+        )
+        player.inactive_timeout = old_player.inactive_timeout
+        player.autoplay = old_player.autoplay
+        player.queue = old_player.queue
+        player.auto_queue = old_player.auto_queue
+
+        self.__player = player
+
+        if current:
+            await player.play(current, start=position, paused=paused, volume=volume, add_history=False)
+
+    async def restore(self, current: Optional[wavelink.Playable], position: int, paused: bool,
+                      queue: list[wavelink.Playable], history: list[wavelink.Playable]) -> None:
+        """
+        Refill a freshly connected player and resume the current track at the given position.
+        """
+        player: wavelink.Player = self.__player
+
+        player.queue.history.put(history)
+        player.queue.put(queue)
+
+        if current:
+            await player.play(current, start=position, paused=paused, add_history=False)
+
+    @staticmethod
+    async def __disconnect_dead(player: wavelink.Player, timeout: float = 5) -> None:
+        """
+        Disconnect a player whose node may be down: wavelink destroys the player on the node before leaving
+        the voice channel, and a dead node fails that request or never answers it.
+        """
+        try:
+            await asyncio.wait_for(player.disconnect(), timeout=timeout)
+        except (
+            wavelink.LavalinkException, wavelink.NodeException, aiohttp.ClientError, asyncio.TimeoutError
+        ) as error:
+            logger.debug('Could not destroy the player on node %s: %s', player.node.identifier, error)
+            await player.guild.change_voice_state(channel=None)
+
+    @staticmethod
+    async def __wait_voice_left(guild, timeout: float = 2) -> None:
+        # The leave voice state update must be processed before connecting again,
+        # otherwise it would be routed to the new player and tear it down.
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while guild.me.voice and guild.me.voice.channel and loop.time() < deadline:
+            await asyncio.sleep(0.05)